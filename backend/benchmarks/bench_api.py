@@ -0,0 +1,380 @@
+# ficheiro: benchmarks/bench_api.py
+# Suite de benchmarks dos endpoints mais usados da API.
+#
+# Popula uma base sintética (ver dados_sinteticos.py), ou usa uma já existente, e
+# executa cada cenário com vários workers em paralelo, através do cliente de
+# testes do Flask ou de um Waitress local. Para cada cenário reporta latências
+# p50/p95/p99, débito, consultas SQL por pedido e acréscimo de memória, num JSON
+# que pode ser guardado e comparado entre commits.
+#
+# Uso (a partir da pasta backend):
+#   python benchmarks/bench_api.py --saida base.json
+#   python benchmarks/bench_api.py --modo waitress --workers 8 --comparar base.json
+#   python benchmarks/bench_api.py --db /tmp/bench.db --cenarios saldos lookup saida
+import io
+import os
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+import tempfile
+import threading
+import subprocess
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import dados_sinteticos
+
+# Cenários pesados executam apenas uma fração dos pedidos
+FRACAO_PEDIDOS_PESADOS = 10
+PEDIDOS_AQUECIMENTO = 3
+LINHAS_LOTE = 100
+
+
+def pico_rss_mb():
+    """Pico de memória residente do processo atual, em MB (apenas Linux/macOS)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / 1024 / 1024 if sys.platform == 'darwin' else pico / 1024
+
+
+def percentil(valores_ordenados, p):
+    if not valores_ordenados:
+        return None
+    indice = min(len(valores_ordenados) - 1, max(0, round(p / 100 * len(valores_ordenados)) - 1))
+    return valores_ordenados[indice]
+
+
+def commit_atual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=dados_sinteticos.PASTA_BACKEND,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ==============================================================================
+# CENÁRIOS
+# ==============================================================================
+# Cada cenário recebe (rng, contexto) e devolve (método, caminho, corpo json ou None, ficheiros ou None).
+
+def cenario_saldos(rng, ctx):
+    return 'GET', '/api/estoque/saldos', None, None
+
+
+def cenario_saldos_pagina(rng, ctx):
+    return 'GET', '/api/estoque/saldos?limit=100&sort=nome', None, None
+
+
+def cenario_produtos(rng, ctx):
+    return 'GET', '/api/produtos', None, None
+
+
+def cenario_produtos_busca(rng, ctx):
+    return 'GET', f"/api/produtos?search={rng.choice(dados_sinteticos.PALAVRAS_NOMES)}", None, None
+
+
+def cenario_lookup(rng, ctx):
+    return 'GET', f"/api/produtos/lookup/789{rng.randint(1, ctx['produtos']):010d}", None, None
+
+
+def cenario_formulario(rng, ctx):
+    return 'GET', f"/api/formularios/produto_data?produto_id={rng.randint(1, ctx['produtos'])}", None, None
+
+
+def cenario_entrada(rng, ctx):
+    return 'POST', '/api/estoque/entrada', {'id_produto': rng.randint(1, ctx['produtos']), 'quantidade': 5}, None
+
+
+def cenario_saida(rng, ctx):
+    dados = {'id_produto': rng.randint(1, ctx['produtos']), 'quantidade': 1, 'motivo_saida': 'Benchmark'}
+    return 'POST', '/api/estoque/saida', dados, None
+
+
+def cenario_lote(rng, ctx):
+    # Uma receção de fornecedor: LINHAS_LOTE entradas de produtos diferentes num só pedido
+    linhas = [{'id_produto': id_produto, 'tipo': 'Entrada', 'quantidade': rng.randint(1, 20)}
+              for id_produto in rng.sample(range(1, ctx['produtos'] + 1), min(LINHAS_LOTE, ctx['produtos']))]
+    return 'POST', '/api/estoque/lote', {'linhas': linhas}, None
+
+
+def cenario_kpis(rng, ctx):
+    return 'GET', '/api/dashboard/kpis', None, None
+
+
+def cenario_relatorio_movimentacoes(rng, ctx):
+    inicio = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
+    return 'GET', f"/api/relatorios/movimentacoes?formato=json&data_inicio={inicio}", None, None
+
+
+def cenario_importar_csv(rng, ctx):
+    # Códigos únicos em cada pedido, para que todas as linhas sejam de facto importadas
+    with ctx['lock']:
+        ctx['importacoes'] += 1
+        numero = ctx['importacoes']
+    linhas = ["codigo;nome;preco;quantidade;fornecedores_nomes;naturezas_nomes"]
+    linhas.extend(
+        f"IMP{numero:04d}{i:05d};Produto importado {numero}-{i};9,90;3;Fornecedor 1;Natureza 1"
+        for i in range(ctx['linhas_importacao'])
+    )
+    conteudo = ("\n".join(linhas) + "\n").encode('utf-8')
+    return 'POST', '/api/produtos/importar', None, {'file': ('bench.csv', conteudo)}
+
+
+# nome -> (função, pesado)
+CENARIOS = {
+    'saldos': (cenario_saldos, True),
+    'saldos_pagina': (cenario_saldos_pagina, False),
+    'produtos': (cenario_produtos, True),
+    'produtos_busca': (cenario_produtos_busca, False),
+    'lookup': (cenario_lookup, False),
+    'formulario': (cenario_formulario, False),
+    'entrada': (cenario_entrada, False),
+    'saida': (cenario_saida, False),
+    'lote': (cenario_lote, True),
+    'kpis': (cenario_kpis, False),
+    'relatorio_movimentacoes': (cenario_relatorio_movimentacoes, True),
+    'importar_csv': (cenario_importar_csv, True),
+}
+
+
+# ==============================================================================
+# CLIENTES (Flask test client ou Waitress local)
+# ==============================================================================
+
+class ClienteFlask:
+    def __init__(self, app, headers):
+        self.cliente = app.app.test_client()
+        self.headers = headers
+
+    def pedir(self, metodo, caminho, corpo, ficheiros):
+        if ficheiros:
+            dados = {nome: (io.BytesIO(conteudo), nome_ficheiro)
+                     for nome, (nome_ficheiro, conteudo) in ficheiros.items()}
+            resposta = self.cliente.open(caminho, method=metodo, headers=self.headers, data=dados,
+                                         content_type='multipart/form-data')
+        else:
+            resposta = self.cliente.open(caminho, method=metodo, headers=self.headers, json=corpo)
+        tamanho = len(resposta.get_data())
+        # O fecho da resposta é que regista o pedido nas estatísticas (ver registar_pedido no app.py)
+        resposta.close()
+        return resposta.status_code, tamanho
+
+    def pedir_json(self, metodo, caminho, corpo=None):
+        """Como pedir, mas devolve (estado, corpo JSON da resposta)."""
+        resposta = self.cliente.open(caminho, method=metodo, headers=self.headers, json=corpo)
+        dados = resposta.get_json(silent=True)
+        resposta.close()
+        return resposta.status_code, dados
+
+    def encerrar(self):
+        pass
+
+
+class ClienteWaitress:
+    """Serve a aplicação num Waitress local (numa thread) e faz os pedidos por HTTP, uma sessão por worker."""
+
+    def __init__(self, app, headers, threads):
+        import requests
+        from waitress.server import create_server
+        self._requests = requests
+        self.servidor = create_server(app.app, host='127.0.0.1', port=0, threads=threads)
+        self.url_base = f"http://127.0.0.1:{self.servidor.effective_port}"
+        self.headers = headers
+        self._local = threading.local()
+        self._thread = threading.Thread(target=self.servidor.run, daemon=True)
+        self._thread.start()
+
+    def _sessao(self):
+        sessao = getattr(self._local, 'sessao', None)
+        if sessao is None:
+            sessao = self._local.sessao = self._requests.Session()
+            sessao.headers.update(self.headers)
+        return sessao
+
+    def pedir(self, metodo, caminho, corpo, ficheiros):
+        resposta = self._sessao().request(metodo, self.url_base + caminho, json=corpo, files=ficheiros, timeout=600)
+        return resposta.status_code, len(resposta.content)
+
+    def pedir_json(self, metodo, caminho, corpo=None):
+        """Como pedir, mas devolve (estado, corpo JSON da resposta)."""
+        resposta = self._sessao().request(metodo, self.url_base + caminho, json=corpo, timeout=600)
+        try:
+            return resposta.status_code, resposta.json()
+        except ValueError:
+            return resposta.status_code, None
+
+    def encerrar(self):
+        self.servidor.close()
+
+
+# ==============================================================================
+# EXECUÇÃO
+# ==============================================================================
+
+def totais_db(estatisticas):
+    return estatisticas.pedidos, estatisticas.consultas, estatisticas.tempo_sql, estatisticas.espera_pool
+
+
+def aguardar_registos(estatisticas, total_pedidos, limite_segundos=5):
+    """O Waitress regista o pedido depois de enviar a resposta: espera que os últimos fiquem contabilizados."""
+    prazo = time.monotonic() + limite_segundos
+    while estatisticas.pedidos < total_pedidos and time.monotonic() < prazo:
+        time.sleep(0.01)
+
+
+def executar_cenario(cliente, estatisticas, nome, funcao, pedidos, workers, ctx, semente):
+    rng_base = random.Random(f"{semente}-{nome}")
+    planos = [funcao(random.Random(rng_base.random()), ctx) for _ in range(pedidos + PEDIDOS_AQUECIMENTO)]
+    registados = estatisticas.pedidos
+    for plano in planos[:PEDIDOS_AQUECIMENTO]:
+        cliente.pedir(*plano)
+
+    def medir(plano):
+        inicio = time.perf_counter()
+        estado, tamanho = cliente.pedir(*plano)
+        return time.perf_counter() - inicio, estado, tamanho
+
+    aguardar_registos(estatisticas, registados + PEDIDOS_AQUECIMENTO)
+    db_antes = totais_db(estatisticas)
+    rss_antes = pico_rss_mb()
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        resultados = list(executor.map(medir, planos[PEDIDOS_AQUECIMENTO:]))
+    duracao_total = time.perf_counter() - inicio
+    rss_depois = pico_rss_mb()
+    aguardar_registos(estatisticas, db_antes[0] + len(resultados))
+    # Inclui as consultas feitas durante o envio das respostas em fluxo
+    pedidos_db, consultas, tempo_sql, espera_pool = (
+        depois - antes for depois, antes in zip(totais_db(estatisticas), db_antes)
+    )
+    pedidos_db = pedidos_db or 1
+
+    latencias = sorted(r[0] * 1000 for r in resultados)
+    erros = [r[1] for r in resultados if r[1] >= 400]
+    return {
+        'cenario': nome,
+        'pedidos': len(resultados),
+        'workers': workers,
+        'erros': len(erros),
+        'estados_erro': sorted(set(erros)),
+        'p50_ms': round(percentil(latencias, 50), 2),
+        'p95_ms': round(percentil(latencias, 95), 2),
+        'p99_ms': round(percentil(latencias, 99), 2),
+        'media_ms': round(sum(latencias) / len(latencias), 2),
+        'max_ms': round(latencias[-1], 2),
+        'pedidos_por_segundo': round(len(resultados) / duracao_total, 1),
+        'bytes_medio': round(sum(r[2] for r in resultados) / len(resultados)),
+        'consultas_media': round(consultas / pedidos_db, 2),
+        'tempo_sql_medio_ms': round(tempo_sql * 1000 / pedidos_db, 2),
+        'espera_pool_media_ms': round(espera_pool * 1000 / pedidos_db, 2),
+        'acrescimo_pico_rss_mb': round(rss_depois - rss_antes, 1) if rss_antes is not None else None,
+    }
+
+
+def comparar(base, atual):
+    """Imprime a variação de cada cenário em relação a um resultado anterior."""
+    anteriores = {c['cenario']: c for c in base['cenarios']}
+    print(f"\nComparação com {base.get('commit') or 'base'} ({base.get('data')}):")
+    print(f"{'cenário':<26}{'p50 ms':>18}{'p95 ms':>18}{'pedidos/s':>20}{'consultas':>14}")
+
+    def variacao(antes, depois):
+        if not antes:
+            return f"{depois}"
+        return f"{depois} ({(depois - antes) / antes * 100:+.0f}%)"
+
+    for cenario in atual['cenarios']:
+        anterior = anteriores.get(cenario['cenario'])
+        if anterior is None:
+            continue
+        print(f"{cenario['cenario']:<26}"
+              f"{variacao(anterior['p50_ms'], cenario['p50_ms']):>18}"
+              f"{variacao(anterior['p95_ms'], cenario['p95_ms']):>18}"
+              f"{variacao(anterior['pedidos_por_segundo'], cenario['pedidos_por_segundo']):>20}"
+              f"{str(anterior['consultas_media']) + ' -> ' + str(cenario['consultas_media']):>14}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos endpoints principais da API.")
+    parser.add_argument('--db', help="Base já populada (caminho SQLite ou URI). Por omissão cria uma base SQLite temporária.")
+    parser.add_argument('--modo', choices=['cliente', 'waitress'], default='cliente',
+                        help="Cliente de testes do Flask (sem rede) ou Waitress local com pedidos HTTP.")
+    parser.add_argument('--workers', type=int, default=4, help="Pedidos em paralelo.")
+    parser.add_argument('--pedidos', type=int, default=200, help="Pedidos por cenário (os pesados fazem 1/10).")
+    parser.add_argument('--linhas-importacao', type=int, default=200, help="Linhas de cada CSV no cenário importar_csv.")
+    parser.add_argument('--cenarios', nargs='+', choices=sorted(CENARIOS), default=list(CENARIOS))
+    parser.add_argument('--saida', help="Grava o resultado JSON neste ficheiro.")
+    parser.add_argument('--comparar', help="Resultado JSON anterior com o qual comparar.")
+    dados_sinteticos.adicionar_argumentos(parser)
+    args = parser.parse_args()
+
+    os.environ.setdefault('ESTOQUE_SERVIDOR_THREADS', str(max(args.workers, 4)))
+    if args.db:
+        app = dados_sinteticos.importar_app(args.db)
+        app.preparar_banco()
+        with app.app.app_context():
+            dimensoes = {'produtos': app.db.session.query(app.db.func.count(app.Produto.id_produto)).scalar()}
+    else:
+        caminho_db = os.path.join(tempfile.mkdtemp(prefix="bench_api_"), 'bench.db')
+        app = dados_sinteticos.importar_app(caminho_db)
+        print("A gerar a base de dados sintética...", file=sys.stderr)
+        inicio = time.perf_counter()
+        dimensoes = dados_sinteticos.popular(app, **dados_sinteticos.argumentos_popular(args))
+        print(f"Base gerada em {time.perf_counter() - inicio:.1f}s: {dimensoes}", file=sys.stderr)
+
+    from flask_jwt_extended import create_access_token
+    with app.app.app_context():
+        administrador = app.Usuario.query.filter_by(permissao='Administrador').first()
+        token = create_access_token(identity=str(administrador.id_usuario),
+                                    additional_claims={'permissao': administrador.permissao})
+        base_dados = app.db.engine.dialect.name
+    headers = {'Authorization': f'Bearer {token}'}
+
+    if args.modo == 'waitress':
+        cliente = ClienteWaitress(app, headers, int(os.environ['ESTOQUE_SERVIDOR_THREADS']))
+    else:
+        cliente = ClienteFlask(app, headers)
+
+    ctx = {'produtos': dimensoes['produtos'], 'linhas_importacao': args.linhas_importacao,
+           'importacoes': 0, 'lock': threading.Lock()}
+    resultados = []
+    try:
+        for nome in args.cenarios:
+            funcao, pesado = CENARIOS[nome]
+            pedidos = max(1, args.pedidos // FRACAO_PEDIDOS_PESADOS) if pesado else args.pedidos
+            print(f"A executar {nome} ({pedidos} pedidos)...", file=sys.stderr)
+            resultados.append(executar_cenario(cliente, app.estatisticas_db, nome, funcao, pedidos, args.workers, ctx, args.semente))
+    finally:
+        cliente.encerrar()
+
+    relatorio = {
+        'commit': commit_atual(),
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'ambiente': {
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'processadores': os.cpu_count(),
+            'base_dados': base_dados,
+        },
+        'parametros': {'modo': args.modo, 'workers': args.workers, 'pedidos': args.pedidos, 'dados': dimensoes},
+        'pico_rss_mb': round(pico_rss_mb(), 1) if pico_rss_mb() is not None else None,
+        'cenarios': resultados,
+    }
+    texto = json.dumps(relatorio, indent=2, ensure_ascii=False)
+    print(texto)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            f.write(texto)
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            comparar(json.load(f), relatorio)
+
+
+if __name__ == '__main__':
+    main()
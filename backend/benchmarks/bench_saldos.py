@@ -0,0 +1,84 @@
+# ficheiro: benchmarks/bench_saldos.py
+# Benchmark de regressão do endpoint /api/estoque/saldos.
+# Cria uma base SQLite temporária, popula catálogos de tamanhos crescentes e
+# verifica que o número de consultas SQL por pedido se mantém constante.
+#
+# Uso (a partir da pasta backend):  python benchmarks/bench_saldos.py
+import os
+import sys
+import json
+import time
+import tempfile
+
+# A base de dados tem de ser definida antes de importar a aplicação
+PASTA_TEMP = tempfile.mkdtemp(prefix="bench_saldos_")
+os.environ['ESTOQUE_DB_URI'] = f"sqlite:///{os.path.join(PASTA_TEMP, 'bench.db')}"
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import event, insert
+from flask_jwt_extended import create_access_token
+from app import app, db, preparar_banco, Produto, SaldoProduto, MovimentacaoEstoque, Usuario
+
+TAMANHOS_CATALOGO = [100, 1000, 5000]
+
+
+def popular_ate(total_produtos, id_usuario):
+    """Acrescenta produtos (com saldo e uma entrada cada) até o catálogo ter total_produtos itens."""
+    existentes = db.session.query(db.func.count(Produto.id_produto)).scalar()
+    novos = range(existentes + 1, total_produtos + 1)
+    if not novos:
+        return
+    db.session.execute(insert(Produto), [
+        {'id_produto': i, 'nome': f"Produto {i}", 'codigo': f"P{i:06d}", 'preco': 1.5} for i in novos
+    ])
+    db.session.execute(insert(MovimentacaoEstoque), [
+        {'id_produto': i, 'id_usuario': id_usuario, 'quantidade': 10, 'tipo': 'Entrada'} for i in novos
+    ])
+    db.session.execute(insert(SaldoProduto), [{'id_produto': i, 'saldo': 10} for i in novos])
+    db.session.commit()
+
+
+def main():
+    preparar_banco()
+    consultas = []
+
+    with app.app_context():
+        usuario = Usuario(nome="Benchmark", login="benchmark", permissao="Administrador")
+        usuario.set_password("benchmark")
+        db.session.add(usuario)
+        db.session.commit()
+        token = create_access_token(identity=str(usuario.id_usuario))
+        id_usuario = usuario.id_usuario
+
+        def contar_consulta(conn, cursor, statement, parameters, context, executemany):
+            consultas.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', contar_consulta)
+
+    cliente = app.test_client()
+    headers = {'Authorization': f'Bearer {token}'}
+    resultados = []
+    for tamanho in TAMANHOS_CATALOGO:
+        with app.app_context():
+            popular_ate(tamanho, id_usuario)
+        consultas.clear()
+        inicio = time.perf_counter()
+        resposta = cliente.get('/api/estoque/saldos', headers=headers)
+        duracao_ms = (time.perf_counter() - inicio) * 1000
+        assert resposta.status_code == 200, resposta.get_data(as_text=True)
+        resultados.append({
+            'produtos': tamanho,
+            'linhas_devolvidas': len(resposta.get_json()),
+            'consultas_sql': len(consultas),
+            'tempo_ms': round(duracao_ms, 2)
+        })
+
+    print(json.dumps(resultados, indent=2))
+    contagens = {r['consultas_sql'] for r in resultados}
+    if len(contagens) != 1:
+        print("FALHA: o número de consultas cresce com o tamanho do catálogo.")
+        sys.exit(1)
+    print(f"OK: {contagens.pop()} consulta(s) por pedido, independentemente do tamanho do catálogo.")
+
+
+if __name__ == '__main__':
+    main()
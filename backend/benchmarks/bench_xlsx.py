@@ -0,0 +1,147 @@
+# ficheiro: benchmarks/bench_xlsx.py
+# Compara a exportação XLSX dos relatórios pelo caminho antigo (lista de dicionários ->
+# pandas.DataFrame -> to_excel em memória) com o escritor em fluxo (openpyxl write-only
+# gravado em ficheiro temporário). Cada exportação corre num processo separado para
+# medir o pico de memória (RSS) de forma isolada.
+#
+# Uso (a partir da pasta backend):  python benchmarks/bench_xlsx.py [--movimentacoes 100000]
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime, timedelta
+
+PASTA_BACKEND = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+MODOS = ['pandas', 'fluxo']
+RELATORIOS = ['movimentacoes', 'inventario']
+
+
+def pico_rss_mb():
+    """Pico de memória residente do processo atual, em MB (apenas Linux/macOS)."""
+    import resource
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux devolve KB, macOS devolve bytes
+    return pico / 1024 / 1024 if sys.platform == 'darwin' else pico / 1024
+
+
+def importar_app(caminho_db):
+    os.environ['ESTOQUE_DB_URI'] = f"sqlite:///{caminho_db}"
+    sys.path.insert(0, PASTA_BACKEND)
+    import app
+    return app
+
+
+def popular(caminho_db, total_produtos, total_movimentacoes):
+    """Cria a base de dados de teste com produtos, saldos e movimentações aleatórias."""
+    app = importar_app(caminho_db)
+    app.preparar_banco()
+    random.seed(42)
+    with app.app.app_context():
+        usuario = app.Usuario(nome="Benchmark", login="benchmark", permissao="Administrador")
+        usuario.set_password("benchmark")
+        app.db.session.add(usuario)
+        app.db.session.commit()
+
+        app.db.session.execute(app.insert(app.Produto), [
+            {'id_produto': i, 'nome': f"Produto {i}", 'codigo': f"P{i:06d}", 'preco': 1.5}
+            for i in range(1, total_produtos + 1)
+        ])
+        app.db.session.execute(app.insert(app.SaldoProduto), [
+            {'id_produto': i, 'saldo': 0} for i in range(1, total_produtos + 1)
+        ])
+        inicio = datetime.now() - timedelta(days=365)
+        for lote in range(0, total_movimentacoes, 50000):
+            app.db.session.execute(app.insert(app.MovimentacaoEstoque), [
+                {
+                    'id_produto': random.randint(1, total_produtos),
+                    'id_usuario': usuario.id_usuario,
+                    'data_hora': inicio + timedelta(seconds=random.randint(0, 365 * 86400)),
+                    'quantidade': random.randint(1, 20),
+                    'tipo': random.choice(['Entrada', 'Saida']),
+                    'motivo_saida': None
+                }
+                for _ in range(min(50000, total_movimentacoes - lote))
+            ])
+        app.db.session.commit()
+        app.reconstruir_saldos()
+
+
+def exportar(caminho_db, modo, relatorio):
+    """Executa uma exportação (no processo filho) e devolve o tempo, o tamanho e o pico de RSS."""
+    import io
+    import pandas as pd  # carregado nos dois modos, para que a memória de base seja igual
+    app = importar_app(caminho_db)
+
+    with app.app.app_context():
+        rss_base = pico_rss_mb()
+        inicio = time.perf_counter()
+        if modo == 'pandas':
+            if relatorio == 'movimentacoes':
+                query = app.consulta_relatorio_movimentacoes(None, None, None)
+                df = pd.DataFrame(list(app.iterar_movimentacoes_relatorio(query)))
+                df = df.rename(columns=dict(app.COLUNAS_RELATORIO_MOVIMENTACOES))
+            else:
+                df = pd.DataFrame([
+                    {'codigo': l.codigo.strip(), 'nome': l.nome, 'saldo_atual': l.saldo_atual, 'preco': l.preco}
+                    for l in app.consulta_saldos_produtos().all()
+                ])
+                df['valor_total'] = df['saldo_atual'] * df['preco']
+            buffer = io.BytesIO()
+            df.to_excel(buffer, index=False, engine='openpyxl')
+            tamanho = buffer.getbuffer().nbytes
+        else:
+            if relatorio == 'movimentacoes':
+                resultado = app.gerar_relatorio_movimentacoes('xlsx', None, None, None)
+            else:
+                resultado = app.gerar_relatorio_inventario('xlsx')
+            tamanho = os.fstat(resultado.conteudo.fileno()).st_size
+            resultado.conteudo.close()
+        duracao = time.perf_counter() - inicio
+
+    return {
+        'relatorio': relatorio,
+        'modo': modo,
+        'tempo_s': round(duracao, 2),
+        'tamanho_kb': round(tamanho / 1024),
+        'pico_rss_mb': round(pico_rss_mb(), 1),
+        'acrescimo_rss_mb': round(pico_rss_mb() - rss_base, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da exportação XLSX dos relatórios.")
+    parser.add_argument('--movimentacoes', type=int, default=100000)
+    parser.add_argument('--produtos', type=int, default=5000)
+    # Usados internamente para correr cada etapa num processo separado
+    parser.add_argument('--popular', metavar='DB', help=argparse.SUPPRESS)
+    parser.add_argument('--filho', nargs=3, metavar=('DB', 'MODO', 'RELATORIO'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.popular:
+        popular(args.popular, args.produtos, args.movimentacoes)
+        return
+    if args.filho:
+        print(json.dumps(exportar(*args.filho)))
+        return
+
+    caminho_db = os.path.join(tempfile.mkdtemp(prefix="bench_xlsx_"), 'bench.db')
+    print(f"A criar {args.produtos} produtos e {args.movimentacoes} movimentações...")
+    subprocess.run([sys.executable, __file__, '--popular', caminho_db,
+                    '--produtos', str(args.produtos), '--movimentacoes', str(args.movimentacoes)],
+                   check=True, stdout=subprocess.DEVNULL)
+
+    resultados = []
+    for relatorio in RELATORIOS:
+        for modo in MODOS:
+            saida = subprocess.run([sys.executable, __file__, '--filho', caminho_db, modo, relatorio],
+                                   check=True, capture_output=True, text=True).stdout
+            resultados.append(json.loads(saida.strip().splitlines()[-1]))
+    print(json.dumps(resultados, indent=2))
+
+
+if __name__ == '__main__':
+    main()
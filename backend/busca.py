@@ -0,0 +1,210 @@
+# ficheiro: busca.py
+# Índice de pesquisa de produtos em memória, baseado em trigramas.
+#
+# Substitui o filtro ILIKE '%termo%' sobre Nome/Codigo/CodigoB/CodigoC, que obriga
+# a base de dados a percorrer a tabela inteira em cada pesquisa. O índice é mantido
+# pelo app.py sempre que um produto é criado, editado, apagado ou importado.
+import heapq
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+
+
+def normalizar(texto):
+    """Converte o texto para minúsculas e remove acentos (ex: 'Ação' -> 'acao')."""
+    if not texto:
+        return ''
+    decomposto = unicodedata.normalize('NFKD', str(texto))
+    sem_acentos = ''.join(c for c in decomposto if not unicodedata.combining(c))
+    return ' '.join(sem_acentos.casefold().split())
+
+
+def trigramas(texto):
+    """Devolve o conjunto de trigramas (substrings de 3 caracteres) de um texto já normalizado."""
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class IndiceBusca:
+    """
+    Índice invertido trigrama -> ids de produto, seguro para uso entre as threads do Waitress.
+
+    Um produto corresponde à pesquisa quando cada palavra do termo aparece (sem acentos e
+    sem distinção de maiúsculas) no nome ou em algum dos códigos. Os resultados são
+    ordenados por relevância: código exato, início de código, início do nome, início de
+    uma palavra do nome e, por fim, qualquer outra ocorrência.
+    """
+
+    def __init__(self, recarregar_apos_segundos=None):
+        self._lock = threading.RLock()
+        self._lock_carga = threading.Lock()
+        self._documentos = {}
+        self._trigramas = defaultdict(set)
+        self._carregado_em = None
+        # Alterações feitas enquanto uma carga está a decorrer: são reaplicadas depois da troca
+        self._alteracoes_durante_carga = None
+        self.recarregar_apos_segundos = recarregar_apos_segundos
+
+    def precisa_carregar(self):
+        """Indica se o índice ainda não foi carregado ou se já passou do prazo de recarga completa."""
+        with self._lock:
+            if self._carregado_em is None:
+                return True
+            if self.recarregar_apos_segundos is None:
+                return False
+            return time.monotonic() - self._carregado_em > self.recarregar_apos_segundos
+
+    def carregar(self, produtos):
+        """
+        Reconstrói o índice a partir de tuplos (id, nome, codigo, codigoB, codigoC). As chamadas a
+        atualizar() e remover() feitas entretanto são reaplicadas ao novo índice, para não se perderem.
+        """
+        with self._lock:
+            registar = self._alteracoes_durante_carga is None
+            if registar:
+                self._alteracoes_durante_carga = []
+        try:
+            documentos = {}
+            indice = defaultdict(set)
+            for id_produto, nome, codigo, codigo_b, codigo_c in produtos:
+                documento = self._criar_documento(nome, codigo, codigo_b, codigo_c)
+                documentos[id_produto] = documento
+                for trigrama in self._trigramas_documento(documento):
+                    indice[trigrama].add(id_produto)
+            with self._lock:
+                self._documentos = documentos
+                self._trigramas = indice
+                for id_produto, documento in self._alteracoes_durante_carga:
+                    self._remover_sem_lock(id_produto)
+                    if documento is not None:
+                        self._adicionar_sem_lock(id_produto, documento)
+                self._carregado_em = time.monotonic()
+        finally:
+            if registar:
+                with self._lock:
+                    self._alteracoes_durante_carga = None
+
+    def garantir_carregado(self, carregador):
+        """Carrega o índice com carregador() se for necessário; apenas uma thread faz a carga de cada vez."""
+        if not self.precisa_carregar():
+            return
+        with self._lock_carga:
+            if not self.precisa_carregar():
+                return
+            # As alterações são registadas desde antes da leitura da base de dados
+            with self._lock:
+                self._alteracoes_durante_carga = []
+            try:
+                self.carregar(carregador())
+            finally:
+                with self._lock:
+                    self._alteracoes_durante_carga = None
+
+    def invalidar(self):
+        """Força uma recarga completa na próxima pesquisa."""
+        with self._lock:
+            self._carregado_em = None
+
+    def atualizar(self, id_produto, nome, codigo, codigo_b=None, codigo_c=None):
+        """Insere ou substitui um produto no índice."""
+        documento = self._criar_documento(nome, codigo, codigo_b, codigo_c)
+        with self._lock:
+            self._remover_sem_lock(id_produto)
+            self._adicionar_sem_lock(id_produto, documento)
+            if self._alteracoes_durante_carga is not None:
+                self._alteracoes_durante_carga.append((id_produto, documento))
+
+    def remover(self, id_produto):
+        """Retira um produto do índice."""
+        with self._lock:
+            self._remover_sem_lock(id_produto)
+            if self._alteracoes_durante_carga is not None:
+                self._alteracoes_durante_carga.append((id_produto, None))
+
+    def pesquisar(self, termo, limite=None):
+        """Devolve os ids dos produtos que correspondem ao termo, do mais para o menos relevante."""
+        termo_normalizado = normalizar(termo)
+        palavras = termo_normalizado.split()
+        if not palavras:
+            return []
+
+        with self._lock:
+            candidatos = None
+            # Interseta as listas de trigramas, começando pelas mais curtas
+            conjuntos = sorted(
+                (self._trigramas.get(t, set()) for palavra in palavras for t in trigramas(palavra)),
+                key=len
+            )
+            for conjunto in conjuntos:
+                candidatos = set(conjunto) if candidatos is None else candidatos & conjunto
+                if not candidatos:
+                    return []
+            if candidatos is None:
+                # Termo só com palavras curtas (< 3 letras): percorre os documentos em memória
+                candidatos = self._documentos.keys()
+
+            documentos = self._documentos
+            resultados = [
+                (self._relevancia(documentos[id_produto], termo_normalizado, palavras[0]), documentos[id_produto][0], id_produto)
+                for id_produto in candidatos
+                if all(palavra in documentos[id_produto][2] for palavra in palavras)
+            ]
+
+        if limite is not None:
+            resultados = heapq.nsmallest(limite, resultados)
+        else:
+            resultados.sort()
+        return [id_produto for _, _, id_produto in resultados]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._documentos)
+
+    # --- Métodos internos ---
+
+    @staticmethod
+    def _criar_documento(nome, codigo, codigo_b, codigo_c):
+        nome_normalizado = normalizar(nome)
+        codigos = tuple(c for c in (normalizar(codigo), normalizar(codigo_b), normalizar(codigo_c)) if c)
+        texto_completo = '\x00'.join((nome_normalizado,) + codigos)
+        return nome_normalizado, codigos, texto_completo, tuple(nome_normalizado.split())
+
+    @staticmethod
+    def _trigramas_documento(documento):
+        _, codigos, _, palavras_nome = documento
+        resultado = set()
+        for palavra in palavras_nome:
+            resultado |= trigramas(palavra)
+        for codigo in codigos:
+            for palavra in codigo.split():
+                resultado |= trigramas(palavra)
+        return resultado
+
+    @staticmethod
+    def _relevancia(documento, termo, primeira_palavra):
+        nome_normalizado, codigos, _, palavras_nome = documento
+        if termo in codigos:
+            return 0
+        if any(codigo.startswith(termo) for codigo in codigos):
+            return 1
+        if nome_normalizado.startswith(termo):
+            return 2
+        if any(palavra.startswith(primeira_palavra) for palavra in palavras_nome):
+            return 3
+        return 4
+
+    def _adicionar_sem_lock(self, id_produto, documento):
+        self._documentos[id_produto] = documento
+        for trigrama in self._trigramas_documento(documento):
+            self._trigramas[trigrama].add(id_produto)
+
+    def _remover_sem_lock(self, id_produto):
+        documento = self._documentos.pop(id_produto, None)
+        if documento is None:
+            return
+        for trigrama in self._trigramas_documento(documento):
+            ids = self._trigramas.get(trigrama)
+            if ids is not None:
+                ids.discard(id_produto)
+                if not ids:
+                    del self._trigramas[trigrama]
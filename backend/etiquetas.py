@@ -0,0 +1,168 @@
+# ficheiro: etiquetas.py
+# Motor de geração de etiquetas de produto em PDF.
+#
+# As etiquetas são desenhadas diretamente no canvas do reportlab (sem o layout de
+# fluxo do platypus) e os códigos de barras já calculados ficam em cache. Lotes
+# grandes são divididos por um pool de processos, cada um gera um intervalo de
+# páginas, e as partes são depois unidas num único PDF.
+import io
+import math
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import repeat
+
+from reportlab.graphics.barcode import code128
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas as pdf_canvas
+
+try:
+    from pypdf import PdfWriter
+except ImportError:  # Sem o pypdf não é possível unir as partes: tudo é gerado num só processo
+    PdfWriter = None
+
+
+Layout = namedtuple('Layout', [
+    'descricao', 'pagina', 'colunas', 'linhas', 'largura', 'altura',
+    'margem_esquerda', 'margem_topo', 'espaco_horizontal', 'espaco_vertical'
+])
+
+LAYOUTS = {
+    # Modo original: cada página é uma etiqueta de 62mm x 100mm (impressora de etiquetas)
+    'individual': Layout('Etiqueta única de 62x100mm por página', (62 * mm, 100 * mm),
+                         1, 1, 62 * mm, 100 * mm, 0, 0, 0, 0),
+    # Folhas A4 autocolantes
+    'a4_2x7': Layout('Folha A4 com 14 etiquetas de 99,1x38,1mm', A4,
+                     2, 7, 99.1 * mm, 38.1 * mm, 4.65 * mm, 15.15 * mm, 2.5 * mm, 0),
+    'a4_3x8': Layout('Folha A4 com 24 etiquetas de 70x37mm', A4,
+                     3, 8, 70 * mm, 37 * mm, 0, 0.5 * mm, 0, 0),
+}
+LAYOUT_PADRAO = 'individual'
+
+# Abaixo deste número de etiquetas não compensa arrancar o pool de processos
+MINIMO_PARA_PARALELO = 1000
+
+_lock_desenho = threading.Lock()
+
+
+@lru_cache(maxsize=4096)
+def codigo_de_barras(codigo, altura_barras, largura_barra):
+    """Devolve o Code128 já codificado para o código (calculado uma única vez por processo)."""
+    return code128.Code128(codigo, barHeight=altura_barras, barWidth=largura_barra, humanReadable=False)
+
+
+def _codigo_de_barras_ajustado(codigo, altura_barras, largura_barra, largura_maxima):
+    """Reduz a largura das barras, se necessário, para o código caber na etiqueta."""
+    barras = codigo_de_barras(codigo, altura_barras, largura_barra)
+    if barras.width > largura_maxima:
+        largura_barra = round(largura_barra * largura_maxima / barras.width, 4)
+        barras = codigo_de_barras(codigo, altura_barras, largura_barra)
+    return barras
+
+
+def _linhas_nome(nome, fonte, tamanho, largura, maximo_linhas):
+    linhas = simpleSplit(nome, fonte, tamanho, largura) or ['']
+    if len(linhas) > maximo_linhas:
+        linhas = linhas[:maximo_linhas]
+        ultima = linhas[-1]
+        while ultima and stringWidth(ultima + '…', fonte, tamanho) > largura:
+            ultima = ultima[:-1]
+        linhas[-1] = ultima + '…'
+    return linhas
+
+
+def desenhar_etiqueta(c, x, y, layout, nome, codigo):
+    """Desenha uma etiqueta (nome, código de barras e código por extenso) com o canto inferior esquerdo em (x, y)."""
+    grande = layout.altura >= 60 * mm
+    padding = 5 * mm if grande else 3 * mm
+    tamanho_nome = 12 if grande else 9
+    tamanho_codigo = 12 if grande else 8
+    largura_util = layout.largura - 2 * padding
+
+    cursor = y + layout.altura - padding
+    c.setFont('Helvetica-Bold', tamanho_nome)
+    for linha in _linhas_nome(nome, 'Helvetica-Bold', tamanho_nome, largura_util, 4 if grande else 2):
+        cursor -= tamanho_nome * 1.17
+        c.drawString(x + padding, cursor, linha)
+
+    cursor -= 8 * mm if grande else 1.5 * mm
+    altura_barras = 20 * mm if grande else layout.altura * 0.38
+    barras = _codigo_de_barras_ajustado(codigo, altura_barras, 0.4 * mm if grande else 0.33 * mm, largura_util)
+    cursor -= barras.height
+    # O flowable guarda o canvas durante o desenho; a instância em cache é partilhada entre threads
+    with _lock_desenho:
+        barras.drawOn(c, x + (layout.largura - barras.width) / 2, cursor)
+
+    cursor -= (2 * mm if grande else 1 * mm) + tamanho_codigo
+    c.setFont('Helvetica', tamanho_codigo)
+    c.drawCentredString(x + layout.largura / 2, cursor, codigo)
+
+
+def desenhar_paginas(etiquetas, nome_layout):
+    """Gera o PDF de uma lista de (nome, codigo), preenchendo as páginas pela ordem, e devolve os bytes."""
+    layout = LAYOUTS[nome_layout]
+    por_pagina = layout.colunas * layout.linhas
+    altura_pagina = layout.pagina[1]
+    buffer = io.BytesIO()
+    c = pdf_canvas.Canvas(buffer, pagesize=layout.pagina, pageCompression=1)
+    c.setTitle("Etiquetas")
+    for indice, (nome, codigo) in enumerate(etiquetas):
+        posicao = indice % por_pagina
+        if indice and posicao == 0:
+            c.showPage()
+        coluna, linha = posicao % layout.colunas, posicao // layout.colunas
+        x = layout.margem_esquerda + coluna * (layout.largura + layout.espaco_horizontal)
+        y = altura_pagina - layout.margem_topo - (linha + 1) * layout.altura - linha * layout.espaco_vertical
+        desenhar_etiqueta(c, x, y, layout, nome, codigo)
+    c.save()
+    return buffer.getvalue()
+
+
+class GeradorEtiquetas:
+    """Gera PDFs de etiquetas, dividindo os lotes grandes por um pool de processos criado na primeira utilização."""
+
+    def __init__(self, processos=None, minimo_para_paralelo=MINIMO_PARA_PARALELO):
+        self.processos = processos or min(4, os.cpu_count() or 1)
+        self.minimo_para_paralelo = minimo_para_paralelo
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def gerar(self, etiquetas, nome_layout=LAYOUT_PADRAO):
+        """Recebe uma lista de (nome, codigo) e devolve um io.BytesIO com o PDF."""
+        if nome_layout not in LAYOUTS:
+            raise ValueError(f"Layout de etiqueta desconhecido: '{nome_layout}'.")
+        if len(etiquetas) < self.minimo_para_paralelo or self.processos < 2 or PdfWriter is None:
+            return io.BytesIO(desenhar_paginas(etiquetas, nome_layout))
+
+        # Cada processo recebe um intervalo de páginas completas
+        layout = LAYOUTS[nome_layout]
+        por_pagina = layout.colunas * layout.linhas
+        paginas_por_bloco = math.ceil(math.ceil(len(etiquetas) / por_pagina) / self.processos)
+        tamanho_bloco = paginas_por_bloco * por_pagina
+        blocos = [etiquetas[i:i + tamanho_bloco] for i in range(0, len(etiquetas), tamanho_bloco)]
+        partes = self._obter_pool().map(desenhar_paginas, blocos, repeat(nome_layout))
+
+        writer = PdfWriter()
+        for parte in partes:
+            writer.append(io.BytesIO(parte))
+        resultado = io.BytesIO()
+        writer.write(resultado)
+        resultado.seek(0)
+        return resultado
+
+    def encerrar(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+    def _obter_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.processos)
+            return self._pool
@@ -0,0 +1,123 @@
+# ficheiro: instrumentacao.py
+# Medição do acesso à base de dados por pedido HTTP.
+#
+# Conta as consultas executadas, o tempo gasto no SQL e o tempo de espera por uma
+# ligação livre no pool. Os contadores são mantidos por thread (cada pedido do
+# Waitress corre numa só thread) e somados num agregado global no fim de cada pedido.
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as TimeoutPool
+from sqlalchemy.pool import QueuePool
+
+_local = threading.local()
+
+
+class ContadoresDb:
+    """Contadores de um pedido (ou de uma thread de trabalho) desde o último reinício."""
+    __slots__ = ('consultas', 'tempo_sql', 'espera_pool')
+
+    def __init__(self):
+        self.consultas = 0
+        self.tempo_sql = 0.0
+        self.espera_pool = 0.0
+
+
+def contadores_thread():
+    """Devolve os contadores da thread atual, criando-os se necessário."""
+    contadores = getattr(_local, 'contadores', None)
+    if contadores is None:
+        contadores = _local.contadores = ContadoresDb()
+    return contadores
+
+
+def reiniciar_contadores():
+    _local.contadores = ContadoresDb()
+    return _local.contadores
+
+
+class PoolInstrumentado(QueuePool):
+    """QueuePool que mede quanto tempo cada checkout esperou por uma ligação (e conta os esgotamentos)."""
+
+    esgotamentos = 0
+    _lock_esgotamentos = threading.Lock()  # partilhado por todas as threads do Waitress
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        except TimeoutPool:
+            with PoolInstrumentado._lock_esgotamentos:
+                PoolInstrumentado.esgotamentos += 1
+            raise
+        finally:
+            contadores_thread().espera_pool += time.perf_counter() - inicio
+
+
+def instalar_eventos(engine):
+    """Regista no engine os eventos que contam as consultas e o tempo de SQL."""
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def antes_consulta(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('inicio_consultas', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def depois_consulta(conn, cursor, statement, parameters, context, executemany):
+        registar_consulta(conn.info['inicio_consultas'].pop())
+
+    @event.listens_for(engine, 'handle_error')
+    def erro_consulta(contexto):
+        # Uma instrução que falha não passa pelo after_cursor_execute; o conn.info sobrevive aos
+        # checkouts do pool, pelo que o início tem de ser retirado aqui
+        inicios = contexto.connection.info.get('inicio_consultas') if contexto.connection is not None else None
+        if inicios and contexto.execution_context is not None:
+            registar_consulta(inicios.pop())
+
+
+def registar_consulta(inicio):
+    contadores = contadores_thread()
+    contadores.consultas += 1
+    contadores.tempo_sql += time.perf_counter() - inicio
+
+
+class EstatisticasDb:
+    """Agregado de todos os pedidos desde o arranque do servidor."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.pedidos = 0
+        self.consultas = 0
+        self.tempo_sql = 0.0
+        self.espera_pool = 0.0
+        self.espera_pool_maxima = 0.0
+
+    def registar(self, contadores):
+        with self._lock:
+            self.pedidos += 1
+            self.consultas += contadores.consultas
+            self.tempo_sql += contadores.tempo_sql
+            self.espera_pool += contadores.espera_pool
+            self.espera_pool_maxima = max(self.espera_pool_maxima, contadores.espera_pool)
+
+    def resumo(self, pool=None):
+        with self._lock:
+            pedidos = self.pedidos or 1
+            dados = {
+                'pedidos': self.pedidos,
+                'consultas': self.consultas,
+                'consultas_por_pedido': round(self.consultas / pedidos, 2),
+                'tempo_sql_ms': round(self.tempo_sql * 1000, 1),
+                'tempo_sql_medio_ms': round(self.tempo_sql * 1000 / pedidos, 2),
+                'espera_pool_ms': round(self.espera_pool * 1000, 1),
+                'espera_pool_maxima_ms': round(self.espera_pool_maxima * 1000, 1),
+                'pool_esgotado': PoolInstrumentado.esgotamentos
+            }
+        if isinstance(pool, QueuePool):
+            dados['pool'] = {
+                'tamanho': pool.size(),
+                'em_uso': pool.checkedout(),
+                'livres': pool.checkedin(),
+                'overflow': pool.overflow()
+            }
+        return dados
@@ -0,0 +1,144 @@
+# ficheiro: metricas.py
+# Métricas da API no formato de texto do Prometheus (servidas em /metrics).
+#
+# Para não criar um ponto de contenção entre as threads do Waitress, cada thread
+# escreve apenas no seu próprio fragmento (um dict), sem locks. Os fragmentos só
+# são somados quando as métricas são lidas; o lock serve apenas para registar o
+# fragmento de uma thread nova.
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Limites (em segundos) dos histogramas de latência; 0.15 corresponde ao orçamento de leitura do terminal
+LIMITES_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.15, 0.25, 0.5, 1, 2.5, 5, 10)
+LIMITES_RELATORIOS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+CONTADOR = 'counter'
+MEDIDOR = 'gauge'
+HISTOGRAMA = 'histogram'
+
+
+def _formatar_etiquetas(etiquetas):
+    if not etiquetas:
+        return ''
+    pares = []
+    for chave, valor in etiquetas:
+        valor = str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pares.append(f'{chave}="{valor}"')
+    return '{' + ','.join(pares) + '}'
+
+
+def _formatar_valor(valor):
+    if valor == float('inf'):
+        return '+Inf'
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return repr(valor) if isinstance(valor, float) else str(valor)
+
+
+class RegistoMetricas:
+    """Contadores, medidores e histogramas com etiquetas, atualizados sem locks por cada thread."""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._fragmentos = []
+        self._definicoes = {}   # nome -> (tipo, ajuda, limites)
+        self._coletores = []
+
+    def contador(self, nome, ajuda):
+        self._definicoes[nome] = (CONTADOR, ajuda, None)
+
+    def medidor(self, nome, ajuda):
+        """Medidor mantido por incrementos (+1/-1), ex: pedidos em curso."""
+        self._definicoes[nome] = (MEDIDOR, ajuda, None)
+
+    def histograma(self, nome, ajuda, limites=LIMITES_LATENCIA):
+        self._definicoes[nome] = (HISTOGRAMA, ajuda, tuple(limites))
+
+    def coletor(self, funcao):
+        """
+        Regista uma função chamada a cada leitura, para valores que já existem noutro sítio
+        (ex: estado do pool). Deve devolver tuplos (nome, tipo, ajuda, [(etiquetas, valor), ...]).
+        """
+        self._coletores.append(funcao)
+
+    def incrementar(self, nome, valor=1, **etiquetas):
+        chave = (nome, tuple(sorted(etiquetas.items())))
+        fragmento = self._fragmento()
+        fragmento[chave] = fragmento.get(chave, 0) + valor
+
+    def observar(self, nome, valor, **etiquetas):
+        limites = self._definicoes[nome][2]
+        chave = (nome, tuple(sorted(etiquetas.items())))
+        fragmento = self._fragmento()
+        baldes = fragmento.get(chave)
+        if baldes is None:
+            # Contagem por intervalo (não cumulativa), seguida da soma dos valores
+            baldes = fragmento[chave] = [0] * (len(limites) + 1) + [0.0]
+        baldes[bisect_left(limites, valor)] += 1
+        baldes[-1] += valor
+
+    @contextmanager
+    def cronometro(self, nome, **etiquetas):
+        """Observa no histograma `nome` a duração do bloco `with`."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(nome, time.perf_counter() - inicio, **etiquetas)
+
+    def exportar(self):
+        """Soma os fragmentos de todas as threads e devolve o texto no formato do Prometheus."""
+        with self._lock:
+            fragmentos = list(self._fragmentos)
+        totais = {}
+        for fragmento in fragmentos:
+            # A cópia de um dict é atómica no CPython; a thread dona pode continuar a escrever
+            for chave, valor in dict(fragmento).items():
+                if isinstance(valor, list):
+                    acumulado = totais.setdefault(chave, [0] * len(valor))
+                    for i, parcela in enumerate(valor):
+                        acumulado[i] += parcela
+                else:
+                    totais[chave] = totais.get(chave, 0) + valor
+
+        linhas = []
+        for nome, (tipo, ajuda, limites) in self._definicoes.items():
+            linhas.append(f"# HELP {nome} {ajuda}")
+            linhas.append(f"# TYPE {nome} {tipo}")
+            for (nome_chave, etiquetas), valor in sorted(totais.items(), key=lambda item: item[0]):
+                if nome_chave != nome:
+                    continue
+                if tipo == HISTOGRAMA:
+                    linhas.extend(self._linhas_histograma(nome, etiquetas, limites, valor))
+                else:
+                    linhas.append(f"{nome}{_formatar_etiquetas(etiquetas)} {_formatar_valor(valor)}")
+
+        for coletor in self._coletores:
+            for nome, tipo, ajuda, amostras in coletor():
+                linhas.append(f"# HELP {nome} {ajuda}")
+                linhas.append(f"# TYPE {nome} {tipo}")
+                for etiquetas, valor in amostras:
+                    linhas.append(f"{nome}{_formatar_etiquetas(sorted(etiquetas.items()))} {_formatar_valor(valor)}")
+        return '\n'.join(linhas) + '\n'
+
+    # --- Métodos internos ---
+
+    def _fragmento(self):
+        fragmento = getattr(self._local, 'fragmento', None)
+        if fragmento is None:
+            fragmento = self._local.fragmento = {}
+            with self._lock:
+                self._fragmentos.append(fragmento)
+        return fragmento
+
+    @staticmethod
+    def _linhas_histograma(nome, etiquetas, limites, baldes):
+        acumulado = 0
+        for limite, contagem in zip(limites + (float('inf'),), baldes[:-1]):
+            acumulado += contagem
+            yield f"{nome}_bucket{_formatar_etiquetas(etiquetas + (('le', _formatar_valor(float(limite))),))} {acumulado}"
+        yield f"{nome}_sum{_formatar_etiquetas(etiquetas)} {_formatar_valor(baldes[-1])}"
+        yield f"{nome}_count{_formatar_etiquetas(etiquetas)} {acumulado}"
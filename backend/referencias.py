@@ -0,0 +1,99 @@
+# ficheiro: referencias.py
+# Cache em memória das tabelas de referência (fornecedores e naturezas).
+#
+# São tabelas pequenas que mudam raramente, mas que eram lidas por completo em cada
+# listagem de produtos, formulário e importação. O app.py invalida a tabela depois
+# de cada escrita; por segurança, os dados são também recarregados ao fim de
+# ttl_segundos (ex: alterações feitas diretamente na base de dados).
+import threading
+import time
+from collections import namedtuple
+
+from busca import normalizar
+
+# Fotografia imutável de uma tabela: pode ser partilhada entre threads sem cópias.
+# `ordenados` é a lista de (id, nome) por ordem alfabética (sem distinção de acentos e maiúsculas).
+Referencia = namedtuple('Referencia', ['por_id', 'por_nome', 'ordenados'])
+
+
+class CacheReferencias:
+    """Mapas id -> nome e nome -> id por tabela, carregados a pedido e seguros entre as threads do Waitress."""
+
+    def __init__(self, ttl_segundos=None):
+        self.ttl_segundos = ttl_segundos
+        self._lock = threading.Lock()
+        self._carregadores = {}
+        self._tabelas = {}        # nome -> (Referencia, carregada_em)
+        self._geracoes = {}       # incrementada a cada invalidação
+        self._locks_carga = {}
+        self._estatisticas = {}
+
+    def registar(self, nome, carregador):
+        """Regista a função que devolve os tuplos (id, nome) da tabela."""
+        with self._lock:
+            self._carregadores[nome] = carregador
+            self._geracoes[nome] = 0
+            self._locks_carga[nome] = threading.Lock()
+            self._estatisticas[nome] = {'acertos': 0, 'falhas': 0, 'invalidacoes': 0}
+
+    def obter(self, nome):
+        """Devolve a Referencia da tabela, carregando-a da base de dados se necessário."""
+        referencia = self._valida(nome)
+        if referencia is not None:
+            with self._lock:
+                self._estatisticas[nome]['acertos'] += 1
+            return referencia
+
+        # Só uma thread carrega; as outras esperam e usam o resultado
+        with self._locks_carga[nome]:
+            referencia = self._valida(nome)
+            if referencia is not None:
+                with self._lock:
+                    self._estatisticas[nome]['acertos'] += 1
+                return referencia
+            with self._lock:
+                self._estatisticas[nome]['falhas'] += 1
+                geracao = self._geracoes[nome]
+            referencia = self._montar(self._carregadores[nome]())
+            with self._lock:
+                # Se a tabela foi invalidada durante a leitura, os dados podem já estar desatualizados
+                if self._geracoes[nome] == geracao:
+                    self._tabelas[nome] = (referencia, time.monotonic())
+            return referencia
+
+    def invalidar(self, nome=None):
+        """Descarta a tabela indicada (ou todas). Deve ser chamada depois do commit."""
+        with self._lock:
+            for tabela in ([nome] if nome else list(self._carregadores)):
+                self._tabelas.pop(tabela, None)
+                self._geracoes[tabela] += 1
+                self._estatisticas[tabela]['invalidacoes'] += 1
+
+    def estatisticas(self):
+        """Contadores de acertos, falhas e invalidações por tabela (para monitorização)."""
+        with self._lock:
+            return {
+                nome: dict(contadores, entradas=len(self._tabelas[nome][0].por_id) if nome in self._tabelas else 0)
+                for nome, contadores in self._estatisticas.items()
+            }
+
+    # --- Métodos internos ---
+
+    def _valida(self, nome):
+        with self._lock:
+            guardada = self._tabelas.get(nome)
+        if guardada is None:
+            return None
+        referencia, carregada_em = guardada
+        if self.ttl_segundos is not None and time.monotonic() - carregada_em > self.ttl_segundos:
+            return None
+        return referencia
+
+    @staticmethod
+    def _montar(linhas):
+        linhas = [(id_linha, nome) for id_linha, nome in linhas]
+        return Referencia(
+            por_id={id_linha: nome for id_linha, nome in linhas},
+            por_nome={nome: id_linha for id_linha, nome in linhas},
+            ordenados=sorted(linhas, key=lambda linha: (normalizar(linha[1]), linha[0]))
+        )
@@ -1,3 +1,10 @@
-from waitress import serve
-from app import app
-serve(app, host='0.0.0.0', port=5000)
\ No newline at end of file
+# A proteção é necessária porque o gerador de etiquetas usa um pool de processos,
+# que no Windows volta a importar este módulo em cada processo filho; os imports do
+# servidor ficam dentro dela para que os processos filhos não carreguem a aplicação inteira
+if __name__ == '__main__':
+    from waitress import serve
+    from app import app, preparar_banco, SERVIDOR_THREADS
+
+    preparar_banco()
+    # O número de threads acompanha o tamanho do pool de ligações (ver ESTOQUE_SERVIDOR_THREADS em app.py)
+    serve(app, host='0.0.0.0', port=5000, threads=SERVIDOR_THREADS)
@@ -0,0 +1,85 @@
+# ficheiro: serializacao.py
+# Serialização JSON das respostas da API.
+#
+# ProvedorJson substitui o provedor por omissão do Flask (usado pelo jsonify e pelo
+# request.get_json) pelo orjson, quando está instalado: nas listagens grandes a
+# serialização fica várias vezes mais rápida. O resultado é equivalente ao JSON que o
+# Flask produz (chaves ordenadas, datas em formato HTTP, Decimal como texto), mas os
+# caracteres não ASCII seguem em UTF-8 em vez de escapes \uXXXX; sem o orjson, ou em
+# modo debug (JSON indentado), é usado o provedor do Flask.
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # O orjson é opcional
+    orjson = None
+
+
+class ProvedorJson(DefaultJSONProvider):
+
+    def _opcoes_orjson(self):
+        # As datas passam pelo default do Flask, para manter o formato das respostas existentes
+        opcoes = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            opcoes |= orjson.OPT_SORT_KEYS
+        return opcoes
+
+    def _para_bytes(self, obj):
+        """Serializa com o orjson; devolve None se o objeto não for suportado (ex: inteiros com mais de 64 bits)."""
+        try:
+            return orjson.dumps(obj, default=self.default, option=self._opcoes_orjson())
+        except orjson.JSONEncodeError:
+            return None
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and 'indent' not in kwargs:
+            dados = self._para_bytes(obj)
+            if dados is not None:
+                return dados.decode('utf-8')
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        # Escreve os bytes do orjson diretamente no corpo, sem passar por str
+        if orjson is not None and not ((self.compact is None and self._app.debug) or self.compact is False):
+            dados = self._para_bytes(self._prepare_response_obj(args, kwargs))
+            if dados is not None:
+                return self._app.response_class(dados + b"\n", mimetype=self.mimetype)
+        return super().response(*args, **kwargs)
+
+
+# --- FORMATO COLUNAR DAS LISTAGENS ---
+# ?shape=columns devolve {"colunas": [...], "valores": [[valores da 1ª coluna], ...]}
+# ?shape=rows devolve {"colunas": [...], "linhas": [[valores da 1ª linha], ...]}
+# Os nomes das colunas são enviados uma só vez e os números (ex: preço) seguem como números.
+FORMATO_OBJETOS = 'objects'
+FORMATO_COLUNAS = 'columns'
+FORMATO_LINHAS = 'rows'
+FORMATOS_TABELA = (FORMATO_OBJETOS, FORMATO_COLUNAS, FORMATO_LINHAS)
+
+
+def validar_formato_tabela(formato):
+    """Normaliza o valor de ?shape. Levanta ValueError se não for um dos formatos aceites."""
+    formato = (formato or FORMATO_OBJETOS).lower()
+    if formato not in FORMATOS_TABELA:
+        raise ValueError(f"Formato inválido: '{formato}'. Use um de: {', '.join(FORMATOS_TABELA)}.")
+    return formato
+
+
+def numero(valor):
+    """Decimal da base de dados -> float, para o formato colunar (None mantém-se)."""
+    return float(valor) if valor is not None else None
+
+
+def corpo_tabela(colunas, linhas, formato):
+    """Monta o corpo da resposta a partir de linhas (tuplos pela ordem de `colunas`) no formato pedido."""
+    if formato == FORMATO_COLUNAS:
+        valores = [list(coluna) for coluna in zip(*linhas)] if linhas else [[] for _ in colunas]
+        return {'colunas': list(colunas), 'valores': valores}
+    if formato == FORMATO_LINHAS:
+        return {'colunas': list(colunas), 'linhas': linhas}
+    return [dict(zip(colunas, linha)) for linha in linhas]
@@ -0,0 +1,184 @@
+# ficheiro: tarefas.py
+# Execução de tarefas demoradas (importações e relatórios) fora das threads do Waitress.
+#
+# O pedido HTTP apenas submete a tarefa e devolve o seu id; o trabalho corre num
+# pool de workers próprio e o cliente consulta o estado até poder descarregar o
+# resultado. Os resultados ficam guardados durante ttl_segundos após a conclusão.
+# O registo é mantido em memória, pelo que só é válido com um único processo
+# servidor (o caso do Waitress).
+import atexit
+import os
+import shutil
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+# Resultado de uma tarefa que produz um ficheiro. `conteudo` pode ser bytes ou
+# um objeto tipo ficheiro (ex: io.BytesIO); é gravado em disco pelo gestor.
+ResultadoFicheiro = namedtuple('ResultadoFicheiro', ['conteudo', 'nome_ficheiro', 'mimetype'])
+
+PENDENTE = 'pendente'
+EM_EXECUCAO = 'em_execucao'
+CONCLUIDA = 'concluida'
+ERRO = 'erro'
+
+
+class Tarefa:
+    """Estado de uma tarefa submetida ao GestorTarefas."""
+
+    def __init__(self, tipo, id_usuario):
+        self.id_tarefa = uuid.uuid4().hex
+        self.tipo = tipo
+        self.id_usuario = id_usuario
+        self.estado = PENDENTE
+        self.progresso = 0
+        self.mensagem = 'Na fila de execução.'
+        self.criada_em = time.time()
+        self.concluida_em = None
+        self.resultado = None         # dict serializável em JSON
+        self.caminho_ficheiro = None  # resultado em ficheiro (ver ResultadoFicheiro)
+        self.nome_ficheiro = None
+        self.mimetype = None
+
+    @property
+    def terminada(self):
+        return self.estado in (CONCLUIDA, ERRO)
+
+    def para_dict(self):
+        return {
+            'id_tarefa': self.id_tarefa,
+            'tipo': self.tipo,
+            'estado': self.estado,
+            'progresso': self.progresso,
+            'mensagem': self.mensagem,
+            'criada_em': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.criada_em)),
+            'tem_ficheiro': self.caminho_ficheiro is not None,
+            'nome_ficheiro': self.nome_ficheiro
+        }
+
+
+class GestorTarefas:
+    """
+    Pool de workers com registo de tarefas, progresso e resultados com prazo de validade.
+
+    `contexto` é uma fábrica de context managers (ex: app.app_context) dentro do qual
+    cada tarefa é executada.
+    """
+
+    def __init__(self, max_workers=2, ttl_segundos=3600, contexto=None, diretorio=None):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='tarefa')
+        self._lock = threading.Lock()
+        self._tarefas = {}
+        self.ttl_segundos = ttl_segundos
+        self._contexto = contexto
+        # Sem diretório indicado, a pasta temporária só é criada quando uma tarefa gravar um
+        # ficheiro, e é apagada quando o processo termina
+        self._diretorio = diretorio
+
+    def submeter(self, tipo, id_usuario, funcao, *args, **kwargs):
+        """
+        Agenda funcao(progresso, *args, **kwargs) e devolve a Tarefa criada.
+        `progresso(percentual, mensagem=None)` permite à função reportar o andamento.
+        """
+        self.limpar_expiradas()
+        tarefa = Tarefa(tipo, id_usuario)
+        with self._lock:
+            self._tarefas[tarefa.id_tarefa] = tarefa
+        self._executor.submit(self._executar, tarefa, funcao, args, kwargs)
+        return tarefa
+
+    def obter(self, id_tarefa, id_usuario=None):
+        """Devolve a tarefa, ou None se não existir, tiver expirado ou pertencer a outro utilizador."""
+        self.limpar_expiradas()
+        with self._lock:
+            tarefa = self._tarefas.get(id_tarefa)
+        if tarefa is None or (id_usuario is not None and tarefa.id_usuario != id_usuario):
+            return None
+        return tarefa
+
+    def limpar_expiradas(self):
+        """Remove as tarefas terminadas há mais de ttl_segundos, incluindo os ficheiros gerados."""
+        limite = time.time() - self.ttl_segundos
+        with self._lock:
+            expiradas = [t for t in self._tarefas.values()
+                         if t.terminada and t.concluida_em is not None and t.concluida_em < limite]
+            for tarefa in expiradas:
+                del self._tarefas[tarefa.id_tarefa]
+        for tarefa in expiradas:
+            self._apagar_ficheiro(tarefa)
+        return len(expiradas)
+
+    def encerrar(self):
+        """Termina o pool de workers e apaga todos os resultados guardados."""
+        self._executor.shutdown(wait=True)
+        if self._diretorio:
+            shutil.rmtree(self._diretorio, ignore_errors=True)
+
+    # --- Métodos internos ---
+
+    def _executar(self, tarefa, funcao, args, kwargs):
+        def progresso(percentual, mensagem=None):
+            tarefa.progresso = max(0, min(100, int(percentual)))
+            if mensagem:
+                tarefa.mensagem = mensagem
+
+        tarefa.estado = EM_EXECUCAO
+        tarefa.mensagem = 'Em execução.'
+        try:
+            if self._contexto is not None:
+                with self._contexto():
+                    resultado = funcao(progresso, *args, **kwargs)
+            else:
+                resultado = funcao(progresso, *args, **kwargs)
+
+            if isinstance(resultado, ResultadoFicheiro):
+                self._gravar_ficheiro(tarefa, resultado)
+            else:
+                tarefa.resultado = resultado
+            tarefa.progresso = 100
+            tarefa.mensagem = 'Concluída.'
+            estado_final = CONCLUIDA
+        except Exception as e:
+            traceback.print_exc()
+            tarefa.mensagem = str(e)
+            estado_final = ERRO
+        # concluida_em tem de existir antes de a tarefa passar a terminada (ver limpar_expiradas)
+        tarefa.concluida_em = time.time()
+        tarefa.estado = estado_final
+
+    def _pasta_resultados(self):
+        with self._lock:
+            if self._diretorio is None:
+                self._diretorio = tempfile.mkdtemp(prefix='estoque_tarefas_')
+                atexit.register(shutil.rmtree, self._diretorio, True)
+            return self._diretorio
+
+    def _gravar_ficheiro(self, tarefa, resultado):
+        caminho = os.path.join(self._pasta_resultados(), tarefa.id_tarefa)
+        if isinstance(resultado.conteudo, (bytes, bytearray)):
+            with open(caminho, 'wb') as destino:
+                destino.write(resultado.conteudo)
+        else:
+            # Ficheiros temporários (ex: XLSX e PDF dos relatórios): fechados logo após a cópia,
+            # para não ficarem no disco até à recolha de lixo (no Windows não são apagados antes)
+            try:
+                with open(caminho, 'wb') as destino:
+                    resultado.conteudo.seek(0)
+                    shutil.copyfileobj(resultado.conteudo, destino)
+            finally:
+                resultado.conteudo.close()
+        tarefa.caminho_ficheiro = caminho
+        tarefa.nome_ficheiro = resultado.nome_ficheiro
+        tarefa.mimetype = resultado.mimetype
+
+    @staticmethod
+    def _apagar_ficheiro(tarefa):
+        if tarefa.caminho_ficheiro:
+            try:
+                os.remove(tarefa.caminho_ficheiro)
+            except OSError:
+                pass
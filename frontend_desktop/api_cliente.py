@@ -0,0 +1,102 @@
+# ficheiro: api_cliente.py
+# Camada de acesso à API partilhada por todos os ecrãs do cliente desktop.
+#
+# Todos os pedidos passam por uma única requests.Session: as ligações TCP ficam
+# abertas (keep-alive) e são reutilizadas entre ecrãs, em vez de uma ligação nova
+# por pedido. A sessão define também os tempos limite por omissão, as novas
+# tentativas dos pedidos idempotentes, a compressão e o token de autenticação.
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry, make_headers
+
+from config import SERVER_IP
+
+API_BASE_URL = f"http://{SERVER_IP}:5000"
+# (ligação, leitura) em segundos, para os pedidos que não indicam outro valor
+TIMEOUT_PADRAO = (5, 30)
+# Ligações mantidas abertas ao servidor (ecrã principal + workers em segundo plano)
+LIGACOES_MAXIMAS = 10
+TENTATIVAS = 3
+
+
+class ClienteApi:
+    """Sessão HTTP com o servidor: keep-alive, timeouts, novas tentativas e token num só sítio."""
+
+    def __init__(self, url_base=API_BASE_URL, timeout=TIMEOUT_PADRAO, tentativas=TENTATIVAS):
+        self.url_base = url_base
+        self.timeout = timeout
+        self.token = None
+        self.sessao = requests.Session()
+        # gzip/deflate e, se o pacote Brotli estiver instalado, br (o corpo é descomprimido pelo requests)
+        self.sessao.headers['Accept-Encoding'] = make_headers(accept_encoding=True)['accept-encoding']
+        novas_tentativas = Retry(
+            total=tentativas,
+            backoff_factor=0.3,  # 0s, 0.6s, 1.2s...
+            status_forcelist=(502, 503, 504),
+            # Erros de ligação repetem-se sempre (o pedido não chegou ao servidor); erros de leitura e
+            # respostas 5xx só nos métodos idempotentes. DELETE fica de fora: repetido, responderia 404.
+            allowed_methods=frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT'}),
+            raise_on_status=False,
+        )
+        adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=LIGACOES_MAXIMAS, max_retries=novas_tentativas)
+        self.sessao.mount('http://', adaptador)
+        self.sessao.mount('https://', adaptador)
+
+    def definir_token(self, token):
+        self.token = token
+
+    def pedido(self, metodo, caminho, **kwargs):
+        """Envia um pedido para url_base + caminho, com o token e o timeout por omissão."""
+        kwargs.setdefault('timeout', self.timeout)
+        headers = dict(kwargs.pop('headers', None) or {})
+        if self.token and 'Authorization' not in headers:
+            headers['Authorization'] = f'Bearer {self.token}'
+        return self.sessao.request(metodo, self.url_base + caminho, headers=headers, **kwargs)
+
+    def get(self, caminho, **kwargs):
+        return self.pedido('GET', caminho, **kwargs)
+
+    def post(self, caminho, **kwargs):
+        return self.pedido('POST', caminho, **kwargs)
+
+    def put(self, caminho, **kwargs):
+        return self.pedido('PUT', caminho, **kwargs)
+
+    def delete(self, caminho, **kwargs):
+        return self.pedido('DELETE', caminho, **kwargs)
+
+
+class CacheCondicional:
+    """
+    Guarda as últimas respostas das listagens com ETag e revalida-as com If-None-Match.
+    Se o servidor responder 304, é devolvida a resposta guardada (sem voltar a descarregar os dados).
+    """
+    def __init__(self, cliente, max_entradas=32):
+        self.cliente = cliente
+        self.max_entradas = max_entradas
+        self._respostas = {}
+        self._lock = threading.Lock()
+    def get(self, caminho, params=None, **kwargs):
+        chave = (caminho, tuple(sorted((params or {}).items())))
+        with self._lock:
+            guardada = self._respostas.get(chave)
+        headers = dict(kwargs.pop('headers', None) or {})
+        if guardada is not None:
+            headers['If-None-Match'] = guardada.headers['ETag']
+        response = self.cliente.get(caminho, headers=headers, params=params, **kwargs)
+        if response.status_code == 304 and guardada is not None:
+            return guardada
+        if response.status_code == 200 and response.headers.get('ETag'):
+            response.content  # lê o corpo já, para que a resposta possa ser reutilizada
+            with self._lock:
+                self._respostas.pop(chave, None)
+                self._respostas[chave] = response
+                while len(self._respostas) > self.max_entradas:
+                    self._respostas.pop(next(iter(self._respostas)))
+        return response
+
+
+api = ClienteApi()
+cache_condicional = CacheCondicional(api)
@@ -0,0 +1,266 @@
+# ficheiro: catalogo_local.py
+# Catálogo local de produtos e saldos do cliente desktop.
+#
+# Os produtos (códigos, nome, descrição, preço) e os saldos ficam guardados numa base
+# SQLite no perfil do utilizador e em memória. As leituras de códigos e as pesquisas do
+# inventário são respondidas a partir da memória, sem ir à rede. A sincronização corre em
+# segundo plano e pede ao servidor apenas o que mudou desde a última vez
+# (/api/catalogo/alteracoes); ao abrir a aplicação, o catálogo guardado fica logo disponível,
+# mesmo antes de o servidor responder.
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# O mesmo índice de trigramas usado pelo servidor (pasta backend, no sys.path desde o run.py)
+from busca import IndiceBusca, normalizar
+
+from config import SERVER_IP
+
+COLUNAS_CATALOGO = ('id_produto', 'codigo', 'nome', 'descricao', 'preco', 'codigoB', 'codigoC', 'saldo_atual')
+BUSCA_MAX_RESULTADOS = 1000
+# (ligação, leitura): a primeira sincronização descarrega o catálogo completo
+TIMEOUT_SINCRONIZACAO = (5, 120)
+
+
+def caminho_dados_locais(nome):
+    """Ficheiro SQLite no perfil do utilizador (pasta SistemaEstoque), um por servidor."""
+    base = os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), '.local', 'share')
+    servidor = re.sub(r'[^A-Za-z0-9_.-]', '_', SERVER_IP)
+    return os.path.join(base, 'SistemaEstoque', f'{nome}_{servidor}.sqlite3')
+
+
+def linhas_colunares(corpo):
+    """Converte uma resposta colunar ({'colunas', 'valores'}) numa lista de dicts."""
+    return [dict(zip(corpo['colunas'], valores)) for valores in zip(*corpo['valores'])]
+
+
+class CatalogoLocal:
+    """
+    Cópia local do catálogo, segura para uso entre a thread da interface (leituras) e a
+    thread da sincronização (escritas). Os produtos são dicts com os mesmos campos que a
+    resposta de /api/produtos/lookup.
+    """
+
+    def __init__(self, caminho=None):
+        self.caminho = caminho or caminho_dados_locais('catalogo')
+        self.versao = None
+        self.carregado = False
+        self.sincronizado_em = None  # time.time() da última sincronização com o servidor
+        self._lock = threading.RLock()
+        self._lock_escrita = threading.RLock()
+        self._ligacao = None
+        self._produtos = {}
+        self._codigos = {}  # código -> {id_produto: prioridade}; 0 = Codigo, 1 = CodigoB, 2 = CodigoC
+        self._indice = IndiceBusca()
+        self._ordem_nome = None
+
+    # --- Leituras (thread da interface) ---
+    def por_codigo(self, codigo, apenas_principal=False):
+        """
+        Produto com este código (Codigo, CodigoB ou CodigoC; em caso de repetição prevalece o
+        código principal), ou None. Com apenas_principal só procura no campo Codigo.
+        """
+        with self._lock:
+            candidatos = self._codigos.get(codigo.strip())
+            if not candidatos:
+                return None
+            prioridade, id_produto = min((prioridade, id_produto) for id_produto, prioridade in candidatos.items())
+            if apenas_principal and prioridade != 0:
+                return None
+            return dict(self._produtos[id_produto])
+
+    def listagem(self, termo_busca=None):
+        """
+        Produtos e saldos no formato colunar (como /api/estoque/saldos?shape=columns): todos, por
+        nome, ou os que correspondem à pesquisa, por relevância.
+        """
+        with self._lock:
+            if termo_busca and termo_busca.strip():
+                ids = self._indice.pesquisar(termo_busca, limite=BUSCA_MAX_RESULTADOS)
+            else:
+                if self._ordem_nome is None:
+                    self._ordem_nome = sorted(
+                        self._produtos, key=lambda id_produto: (normalizar(self._produtos[id_produto]['nome']), id_produto)
+                    )
+                ids = self._ordem_nome
+            produtos = [self._produtos[id_produto] for id_produto in ids]
+        return {'colunas': list(COLUNAS_CATALOGO),
+                'valores': [[produto[coluna] for produto in produtos] for coluna in COLUNAS_CATALOGO]}
+
+    def __len__(self):
+        with self._lock:
+            return len(self._produtos)
+
+    # --- Escritas ---
+    # As escritas (thread da sincronização) são serializadas por _lock_escrita: a base SQLite e a
+    # construção dos novos mapas correm sem _lock, que só é adquirido para trocar as referências,
+    # para que as leituras da interface nunca esperem por uma sincronização completa.
+    def abrir(self):
+        """Abre (ou cria) a base local e carrega o catálogo guardado para memória. Devolve o número de produtos."""
+        with self._lock_escrita:
+            if self.carregado:
+                return len(self)
+            os.makedirs(os.path.dirname(self.caminho), exist_ok=True)
+            ligacao = sqlite3.connect(self.caminho, check_same_thread=False)
+            ligacao.execute("PRAGMA journal_mode=WAL")
+            ligacao.execute("PRAGMA synchronous=NORMAL")
+            with ligacao:
+                ligacao.execute(
+                    "CREATE TABLE IF NOT EXISTS produto (id_produto INTEGER PRIMARY KEY, codigo TEXT, nome TEXT, "
+                    "descricao TEXT, preco NUMERIC, codigoB TEXT, codigoC TEXT, saldo_atual INTEGER)"
+                )
+                ligacao.execute("CREATE TABLE IF NOT EXISTS meta (chave TEXT PRIMARY KEY, valor TEXT)")
+            linha = ligacao.execute("SELECT valor FROM meta WHERE chave = 'versao'").fetchone()
+            cursor = ligacao.execute(f"SELECT {', '.join(COLUNAS_CATALOGO)} FROM produto")
+            produtos = [dict(zip(COLUNAS_CATALOGO, linha_produto)) for linha_produto in cursor]
+            self._ligacao = ligacao
+            self.versao = linha[0] if linha else None
+            self._substituir_em_memoria(produtos)
+            self.carregado = True
+            return len(produtos)
+
+    def sincronizar(self, cliente):
+        """
+        Corre em segundo plano: pede ao servidor as alterações desde a última versão e aplica-as.
+        Devolve True se o catálogo mudou. Os erros de rede e HTTP são propagados.
+        """
+        self.abrir()
+        params = {'shape': 'columns'}
+        if self.versao:
+            params['desde'] = self.versao
+        response = cliente.get("/api/catalogo/alteracoes", params=params, timeout=TIMEOUT_SINCRONIZACAO)
+        if response.status_code == 400 and 'desde' in params:
+            # Versão que o servidor não reconhece: recomeça com o catálogo completo
+            del params['desde']
+            response = cliente.get("/api/catalogo/alteracoes", params=params, timeout=TIMEOUT_SINCRONIZACAO)
+        response.raise_for_status()
+        return self.aplicar_alteracoes(response.json())
+
+    def aplicar_alteracoes(self, dados):
+        """Aplica uma resposta de /api/catalogo/alteracoes (formato colunar) à base local e à memória."""
+        produtos = linhas_colunares(dados['produtos'])
+        saldos = linhas_colunares(dados['saldos'])
+        removidos, novos_saldos = [], []
+        with self._lock_escrita:
+            # Só esta thread altera os mapas, que podem ser lidos aqui sem _lock
+            with self._ligacao:
+                if dados['completo']:
+                    self._ligacao.execute("DELETE FROM produto")
+                    self._gravar_produtos(produtos)
+                else:
+                    self._gravar_produtos(produtos)
+                    novos = {produto['id_produto']: produto for produto in produtos}
+                    removidos = [id_produto for id_produto in dados['removidos']
+                                 if id_produto in self._produtos or id_produto in novos]
+                    self._ligacao.executemany("DELETE FROM produto WHERE id_produto = ?",
+                                              [(id_produto,) for id_produto in removidos])
+                    # Os saldos recentes são reenviados durante uma margem de tempo: só contam os que mudaram
+                    for saldo in saldos:
+                        atual = novos.get(saldo['id_produto']) or self._produtos.get(saldo['id_produto'])
+                        if atual is not None and atual['saldo_atual'] != saldo['saldo_atual']:
+                            novos_saldos.append((saldo['saldo_atual'], saldo['id_produto']))
+                    self._gravar_saldos(novos_saldos)
+                self._ligacao.execute("INSERT OR REPLACE INTO meta (chave, valor) VALUES ('versao', ?)", (dados['versao'],))
+
+            if dados['completo']:
+                self._substituir_em_memoria(produtos)
+                alterado = True
+            else:
+                for produto in produtos:
+                    self._guardar_em_memoria(produto)
+                for id_produto in removidos:
+                    self._retirar_da_memoria(id_produto)
+                self._saldos_em_memoria(novos_saldos)
+                alterado = bool(produtos or removidos or novos_saldos)
+            self.versao = dados['versao']
+            self.sincronizado_em = time.time()
+        return alterado
+
+    def atualizar_saldo(self, id_produto, saldo):
+        """Guarda o novo saldo devolvido pelo servidor depois de uma movimentação feita neste posto."""
+        if saldo is None:
+            return
+        with self._lock_escrita:
+            if not self.carregado or id_produto not in self._produtos:
+                return
+            with self._ligacao:
+                self._gravar_saldos([(saldo, id_produto)])
+            self._saldos_em_memoria([(saldo, id_produto)])
+
+    def atualizar_produto(self, produto):
+        """Guarda um produto lido diretamente do servidor (ex: resposta de /api/produtos/lookup)."""
+        produto = {coluna: produto.get(coluna) for coluna in COLUNAS_CATALOGO}
+        with self._lock_escrita:
+            if not self.carregado:
+                return
+            with self._ligacao:
+                self._gravar_produtos([produto])
+            self._guardar_em_memoria(produto)
+
+    # --- Métodos internos (com _lock_escrita adquirido) ---
+    def _gravar_produtos(self, produtos):
+        self._ligacao.executemany(
+            f"INSERT OR REPLACE INTO produto ({', '.join(COLUNAS_CATALOGO)}) VALUES ({', '.join('?' * len(COLUNAS_CATALOGO))})",
+            [tuple(produto[coluna] for coluna in COLUNAS_CATALOGO) for produto in produtos]
+        )
+
+    def _gravar_saldos(self, saldos):
+        self._ligacao.executemany("UPDATE produto SET saldo_atual = ? WHERE id_produto = ?", saldos)
+
+    def _saldos_em_memoria(self, saldos):
+        with self._lock:
+            for saldo, id_produto in saldos:
+                if id_produto in self._produtos:
+                    self._produtos[id_produto]['saldo_atual'] = saldo
+
+    def _substituir_em_memoria(self, produtos):
+        """Constrói os novos mapas e o novo índice sem _lock e só troca as referências com ele."""
+        novos_produtos = {}
+        novos_codigos = {}
+        for produto in produtos:
+            novos_produtos[produto['id_produto']] = produto
+            self._indexar_codigos(novos_codigos, produto)
+        novo_indice = IndiceBusca()
+        novo_indice.carregar(
+            (p['id_produto'], p['nome'], p['codigo'], p['codigoB'], p['codigoC']) for p in produtos
+        )
+        with self._lock:
+            self._produtos = novos_produtos
+            self._codigos = novos_codigos
+            self._indice = novo_indice
+            self._ordem_nome = None
+
+    def _guardar_em_memoria(self, produto):
+        id_produto = produto['id_produto']
+        with self._lock:
+            if id_produto in self._produtos:
+                self._retirar_da_memoria(id_produto)
+            self._produtos[id_produto] = produto
+            self._indexar_codigos(self._codigos, produto)
+            self._indice.atualizar(id_produto, produto['nome'], produto['codigo'], produto['codigoB'], produto['codigoC'])
+            self._ordem_nome = None
+
+    def _retirar_da_memoria(self, id_produto):
+        with self._lock:
+            produto = self._produtos.pop(id_produto)
+            for codigo in (produto['codigo'], produto['codigoB'], produto['codigoC']):
+                candidatos = self._codigos.get((codigo or '').strip())
+                if candidatos:
+                    candidatos.pop(id_produto, None)
+                    if not candidatos:
+                        del self._codigos[codigo.strip()]
+            self._indice.remover(id_produto)
+            self._ordem_nome = None
+
+    @staticmethod
+    def _indexar_codigos(codigos, produto):
+        for prioridade, codigo in enumerate((produto['codigo'], produto['codigoB'], produto['codigoC'])):
+            codigo = (codigo or '').strip()
+            if codigo:
+                candidatos = codigos.setdefault(codigo, {})
+                candidatos[produto['id_produto']] = min(prioridade, candidatos.get(produto['id_produto'], prioridade))
+
+
+catalogo_local = CatalogoLocal()
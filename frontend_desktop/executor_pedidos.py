@@ -0,0 +1,157 @@
+# ficheiro: executor_pedidos.py
+# Execução dos pedidos à API fora da thread da interface.
+#
+# Cada pedido corre numa thread de um QThreadPool partilhado; o resultado, o erro e o
+# progresso voltam à thread da interface por sinais Qt, pelo que os ecrãs continuam a
+# responder enquanto o servidor não responde. Pedidos com a mesma chave substituem-se:
+# ao lançar uma nova pesquisa, o resultado da anterior (já desatualizado) é descartado.
+import threading
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+from api_cliente import LIGACOES_MAXIMAS
+
+# Pedidos lançados e ainda não terminados: o QRunnable tem de continuar vivo do lado
+# do Python enquanto corre numa thread do pool.
+_em_execucao = set()
+_lock_em_execucao = threading.Lock()
+
+
+def pool_pedidos():
+    """Pool de threads dos pedidos: tantas threads quantas as ligações da sessão HTTP."""
+    pool = QThreadPool.globalInstance()
+    if pool.maxThreadCount() != LIGACOES_MAXIMAS:
+        pool.setMaxThreadCount(LIGACOES_MAXIMAS)
+    return pool
+
+
+class SinaisPedido(QObject):
+    concluido = Signal(object, object)  # (pedido, resultado)
+    falhou = Signal(object, object)     # (pedido, exceção)
+    progresso = Signal(object, int, str)
+    terminado = Signal(object)
+
+
+class PedidoAssincrono(QRunnable):
+    """
+    Executa funcao(*args, **kwargs) numa thread do pool. Com com_controlo=True a função
+    recebe também pedido=self, para informar o progresso e parar a meio se for cancelada.
+    """
+
+    def __init__(self, funcao, args, kwargs, com_controlo=False):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.funcao = funcao
+        self.args = args
+        self.kwargs = dict(kwargs, pedido=self) if com_controlo else kwargs
+        self.sinais = SinaisPedido()
+        self._cancelado = threading.Event()
+        self.chave = None
+        self.ao_concluir = None
+        self.ao_falhar = None
+        self.ao_progresso = None
+
+    def cancelar(self):
+        """O pedido HTTP em curso não é interrompido, mas o seu resultado é descartado."""
+        self._cancelado.set()
+
+    def cancelado(self):
+        return self._cancelado.is_set()
+
+    def informar_progresso(self, percentual, mensagem=""):
+        if not self.cancelado():
+            self.sinais.progresso.emit(self, percentual, mensagem)
+
+    def run(self):
+        try:
+            if self.cancelado():
+                return
+            try:
+                resultado = self.funcao(*self.args, **self.kwargs)
+            except Exception as e:
+                self.sinais.falhou.emit(self, e)
+            else:
+                self.sinais.concluido.emit(self, resultado)
+        finally:
+            self.sinais.terminado.emit(self)
+            with _lock_em_execucao:
+                _em_execucao.discard(self)
+
+
+class ExecutorPedidos(QObject):
+    """
+    Lança pedidos em segundo plano em nome de um ecrã. Os callbacks correm sempre na
+    thread da interface e nunca para pedidos cancelados ou substituídos.
+    O sinal ocupado(bool) serve para mostrar/esconder os indicadores de carregamento.
+    """
+    ocupado = Signal(bool)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pool = pool_pedidos()
+        self._ativos = set()
+        self._por_chave = {}
+
+    def executar(self, funcao, *args, chave=None, ao_concluir=None, ao_falhar=None,
+                 ao_progresso=None, com_controlo=False, **kwargs):
+        """Lança funcao(*args, **kwargs); um pedido anterior com a mesma chave é cancelado."""
+        if chave is not None:
+            self.cancelar(chave)
+        pedido = PedidoAssincrono(funcao, args, kwargs, com_controlo)
+        pedido.chave = chave
+        pedido.ao_concluir = ao_concluir
+        pedido.ao_falhar = ao_falhar
+        pedido.ao_progresso = ao_progresso
+        # Ligações a métodos deste objeto (que vive na thread da interface): os sinais
+        # emitidos pelas threads do pool chegam em fila à thread da interface
+        pedido.sinais.concluido.connect(self._concluido)
+        pedido.sinais.falhou.connect(self._falhou)
+        pedido.sinais.progresso.connect(self._progresso)
+        pedido.sinais.terminado.connect(self._terminado)
+        if chave is not None:
+            self._por_chave[chave] = pedido
+        self._ativos.add(pedido)
+        if len(self._ativos) == 1:
+            self.ocupado.emit(True)
+        with _lock_em_execucao:
+            _em_execucao.add(pedido)
+        self.pool.start(pedido)
+        return pedido
+
+    def em_curso(self, chave):
+        return chave in self._por_chave
+
+    def cancelar(self, chave):
+        pedido = self._por_chave.pop(chave, None)
+        if pedido is not None:
+            pedido.cancelar()
+            self._retirar(pedido)
+
+    def cancelar_todos(self):
+        for pedido in list(self._ativos):
+            pedido.cancelar()
+            self._retirar(pedido)
+        self._por_chave.clear()
+
+    def _retirar(self, pedido):
+        if pedido in self._ativos:
+            self._ativos.discard(pedido)
+            if not self._ativos:
+                self.ocupado.emit(False)
+
+    def _concluido(self, pedido, resultado):
+        if not pedido.cancelado() and pedido.ao_concluir:
+            pedido.ao_concluir(resultado)
+
+    def _falhou(self, pedido, erro):
+        if not pedido.cancelado() and pedido.ao_falhar:
+            pedido.ao_falhar(erro)
+
+    def _progresso(self, pedido, percentual, mensagem):
+        if not pedido.cancelado() and pedido.ao_progresso:
+            pedido.ao_progresso(percentual, mensagem)
+
+    def _terminado(self, pedido):
+        if self._por_chave.get(pedido.chave) is pedido:
+            del self._por_chave[pedido.chave]
+        self._retirar(pedido)
@@ -0,0 +1,165 @@
+# ficheiro: fila_movimentacoes.py
+# Fila local das movimentações de estoque por enviar ao servidor.
+#
+# Cada movimentação recebe no cliente uma chave de idempotência. Se o servidor não responder
+# (rede instável, servidor desligado), a movimentação fica guardada numa base SQLite no perfil
+# do utilizador e o operador continua a trabalhar. Quando a ligação volta, a fila é enviada em
+# segundo plano, por ordem, em lotes (/api/estoque/lote). O servidor guarda as chaves já
+# gravadas, pelo que um reenvio (ex: a resposta perdeu-se a meio) nunca duplica movimentações.
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+import requests
+
+from catalogo_local import caminho_dados_locais
+
+CABECALHO_IDEMPOTENCIA = 'Idempotency-Key'
+# Linhas por pedido ao reenviar a fila (o servidor aceita até 1000)
+LOTE_ENVIO = 200
+# (ligação, leitura): com a rede instável, desistir depressa e guardar na fila
+TIMEOUT_ENVIO = (3, 15)
+# Respostas que indicam um problema passageiro do servidor: a movimentação fica na fila
+ESTADOS_TEMPORARIOS = (502, 503, 504)
+
+PENDENTE = 'pendente'
+RECUSADA = 'recusada'
+
+
+class FilaMovimentacoes:
+    """
+    Fila persistente das movimentações por enviar, por utilizador (cada movimentação é enviada
+    com o token de quem a fez). Segura para uso entre a thread da interface e a do envio.
+    """
+
+    def __init__(self, caminho=None):
+        self.caminho = caminho or caminho_dados_locais('fila')
+        self.id_usuario = None
+        self._lock = threading.RLock()
+        self._ligacao = None
+
+    def definir_usuario(self, id_usuario):
+        self.id_usuario = id_usuario
+
+    def registar(self, cliente, id_produto, tipo, quantidade, motivo_saida=None, codigo=None, nome=None):
+        """
+        Envia a movimentação já, com uma chave de idempotência nova. Sem ligação ao servidor, ou com
+        movimentações mais antigas ainda por enviar (para manter a ordem), guarda-a na fila.
+        Devolve (response, dados) da API, ou (None, None) se a movimentação ficou na fila.
+        """
+        chave = uuid.uuid4().hex
+        if not self.pendentes(limite=1):
+            dados = {'id_produto': id_produto, 'quantidade': quantidade}
+            if tipo == 'Saida':
+                dados['motivo_saida'] = motivo_saida
+            endpoint = "/api/estoque/entrada" if tipo == 'Entrada' else "/api/estoque/saida"
+            try:
+                response = cliente.post(endpoint, json=dados, headers={CABECALHO_IDEMPOTENCIA: chave},
+                                        timeout=TIMEOUT_ENVIO)
+            except requests.exceptions.RequestException:
+                # Sem resposta não se sabe se foi gravada: o reenvio com a mesma chave resolve
+                pass
+            else:
+                if response.status_code not in ESTADOS_TEMPORARIOS:
+                    try:
+                        return response, response.json()
+                    except ValueError:
+                        return response, None
+        self.adicionar(chave, id_produto, tipo, quantidade, motivo_saida, codigo, nome)
+        return None, None
+
+    def adicionar(self, chave, id_produto, tipo, quantidade, motivo_saida=None, codigo=None, nome=None):
+        with self._lock, self._abrir():
+            self._ligacao.execute(
+                "INSERT INTO movimentacao (chave, id_usuario, id_produto, tipo, quantidade, motivo_saida, codigo, nome, "
+                "criada_em, estado) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (chave, self.id_usuario, id_produto, tipo, quantidade, motivo_saida, codigo, nome, time.time(), PENDENTE)
+            )
+
+    def pendentes(self, limite=LOTE_ENVIO):
+        """As movimentações mais antigas por enviar do utilizador atual, por ordem de registo."""
+        return self._consultar(PENDENTE, limite)
+
+    def recusadas(self):
+        """Movimentações que o servidor recusou no reenvio (ex: estoque insuficiente), por mostrar ao operador."""
+        return self._consultar(RECUSADA, None)
+
+    def contar(self):
+        with self._lock, self._abrir():
+            return self._ligacao.execute(
+                "SELECT COUNT(*) FROM movimentacao WHERE estado = ? AND id_usuario IS ?", (PENDENTE, self.id_usuario)
+            ).fetchone()[0]
+
+    def descartar(self, chaves):
+        with self._lock, self._abrir():
+            self._ligacao.executemany("DELETE FROM movimentacao WHERE chave = ?", [(chave,) for chave in chaves])
+
+    def enviar(self, cliente):
+        """
+        Corre em segundo plano: envia o lote mais antigo da fila (modo melhor_esforco, para que uma
+        linha recusada não bloqueie as seguintes). Devolve (enviadas, recusadas, por enviar), em que
+        enviadas é uma lista de (id_produto, novo_saldo). Os erros de rede são propagados.
+        """
+        lote = self.pendentes()
+        if not lote:
+            return [], [], 0
+        linhas = []
+        for movimentacao in lote:
+            linha = {'id_produto': movimentacao['id_produto'], 'tipo': movimentacao['tipo'],
+                     'quantidade': movimentacao['quantidade'], 'chave_idempotencia': movimentacao['chave']}
+            if movimentacao['tipo'] == 'Saida':
+                linha['motivo_saida'] = movimentacao['motivo_saida']
+            linhas.append(linha)
+        response = cliente.post("/api/estoque/lote", json={'modo': 'melhor_esforco', 'linhas': linhas},
+                                timeout=TIMEOUT_ENVIO)
+        dados = response.json() if response.status_code in (201, 400) else None
+        if not dados or 'resultados' not in dados:
+            # Lote recusado por inteiro (sessão expirada, conflito, erro do servidor): tenta mais tarde
+            raise requests.exceptions.HTTPError(
+                f"Erro {response.status_code} ao enviar a fila de movimentações.", response=response)
+
+        enviadas, recusadas = [], []
+        with self._lock, self._abrir():
+            for movimentacao, resultado in zip(lote, dados['resultados']):
+                if resultado.get('aplicada'):
+                    enviadas.append((movimentacao['id_produto'], resultado.get('novo_saldo')))
+                    self._ligacao.execute("DELETE FROM movimentacao WHERE chave = ?", (movimentacao['chave'],))
+                else:
+                    movimentacao['erro'] = resultado.get('erro', 'Erro desconhecido.')
+                    recusadas.append(movimentacao)
+                    self._ligacao.execute("UPDATE movimentacao SET estado = ?, erro = ? WHERE chave = ?",
+                                          (RECUSADA, movimentacao['erro'], movimentacao['chave']))
+        return enviadas, recusadas, self.contar()
+
+    # --- Métodos internos ---
+    def _abrir(self):
+        """Ligação à base da fila (criada na primeira utilização); serve de gestor de transação."""
+        if self._ligacao is None:
+            os.makedirs(os.path.dirname(self.caminho), exist_ok=True)
+            self._ligacao = sqlite3.connect(self.caminho, check_same_thread=False)
+            self._ligacao.row_factory = sqlite3.Row
+            # A fila tem de sobreviver a uma falha de energia: cada registo é gravado no disco
+            self._ligacao.execute("PRAGMA journal_mode=WAL")
+            self._ligacao.execute("PRAGMA synchronous=FULL")
+            with self._ligacao:
+                self._ligacao.execute(
+                    "CREATE TABLE IF NOT EXISTS movimentacao (ordem INTEGER PRIMARY KEY AUTOINCREMENT, "
+                    "chave TEXT NOT NULL UNIQUE, id_usuario INTEGER, id_produto INTEGER NOT NULL, tipo TEXT NOT NULL, "
+                    "quantidade INTEGER NOT NULL, motivo_saida TEXT, codigo TEXT, nome TEXT, criada_em REAL NOT NULL, "
+                    "estado TEXT NOT NULL, erro TEXT)"
+                )
+        return self._ligacao
+
+    def _consultar(self, estado, limite):
+        with self._lock, self._abrir():
+            consulta = "SELECT * FROM movimentacao WHERE estado = ? AND id_usuario IS ? ORDER BY ordem"
+            parametros = (estado, self.id_usuario)
+            if limite is not None:
+                consulta += " LIMIT ?"
+                parametros += (limite,)
+            return [dict(linha) for linha in self._ligacao.execute(consulta, parametros)]
+
+
+fila_movimentacoes = FilaMovimentacoes()
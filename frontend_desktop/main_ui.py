@@ -10,37 +10,53 @@ import random
 import webbrowser
 import winsound
 import threading
+import time
+from urllib.parse import quote
 
 from PySide6.QtWidgets import (
     QApplication, QWidget, QLabel, QLineEdit, QPushButton, QVBoxLayout,
     QMessageBox, QMainWindow, QHBoxLayout, QStackedWidget, QTableWidget,
-    QTableWidgetItem, QHeaderView, QSizePolicy, QDialog, QFormLayout,
+    QTableWidgetItem, QTableView, QHeaderView, QSizePolicy, QDialog, QFormLayout,
     QDialogButtonBox, QListWidget, QListWidgetItem, QAbstractItemView,
     QComboBox, QFileDialog, QFrame, QDateEdit, QCalendarWidget, QMenu,
-    QTextEdit
+    QTextEdit, QProgressBar, QCheckBox, QInputDialog
 )
 from PySide6.QtGui import (
-    QPixmap, QAction, QDoubleValidator, QKeySequence, QIcon
+    QPixmap, QAction, QDoubleValidator, QKeySequence, QIcon, QColor
 )
 from PySide6.QtCore import (
-    Qt, QTimer, Signal, QDate, QEvent, QObject, QThread, QUrl
+    Qt, QTimer, Signal, QDate, QEvent, QObject, QUrl
 )
 from PySide6.QtMultimedia import QSoundEffect
 from packaging.version import parse as parse_version
 
-from config import SERVER_IP
+from api_cliente import api, cache_condicional
+from executor_pedidos import ExecutorPedidos
+from modelos_tabela import Coluna, ModeloTabelaColunar, chave_data_hora, formatar_preco
+from catalogo_local import catalogo_local
+from fila_movimentacoes import fila_movimentacoes
 
 # ==============================================================================
 # 2. FUNÇÕES AUXILIARES E VARIÁVEIS GLOBAIS
 # ==============================================================================
-access_token = None
-API_BASE_URL = f"http://{SERVER_IP}:5000"
 APP_VERSION = "2.2"
+# Tempo máximo aceitável (ms) entre a leitura de um código no terminal e o produto aparecer no ecrã
+ORCAMENTO_LEITURA_MS = 150
+# Linhas pedidas de cada vez nas listagens paginadas (inventário e histórico)
+TAMANHO_PAGINA_TABELAS = 500
+# Intervalo entre sincronizações do catálogo local com o servidor
+INTERVALO_SINCRONIZACAO_MS = 30000
+# Intervalo entre tentativas de envio das movimentações guardadas sem ligação ao servidor
+INTERVALO_ENVIO_FILA_MS = 10000
 
 class SignalHandler(QObject):
     """Um gestor central para sinais globais da aplicação."""
     fornecedores_atualizados = Signal()
     naturezas_atualizadas = Signal()
+    # Produtos ou saldos alterados neste posto: o catálogo local deve sincronizar já
+    catalogo_desatualizado = Signal()
+    # Movimentação guardada na fila local (sem ligação ao servidor): tentar enviá-la já
+    movimentacoes_em_fila = Signal()
 
 signal_handler = SignalHandler()
 
@@ -63,14 +79,85 @@ def show_connection_error_message(parent):
         "3. O endereço IP no ficheiro 'config.py' está correto."
     )
 
-def check_for_updates():
-    """Contacta a API para verificar se existe uma nova versão da aplicação."""
-    print("A verificar atualizações...")
+def avisar_movimentacao_em_fila(parent, descricao):
+    """A movimentação ficou na fila local (sem ligação ao servidor, ou com outras ainda por enviar)."""
+    signal_handler.movimentacoes_em_fila.emit()
+    QMessageBox.information(parent, "Movimentação em Fila",
+        f"{descricao} foi guardada neste computador e será enviada ao servidor automaticamente.\n\n"
+        "(Sem ligação ao servidor, ou com movimentações anteriores ainda por enviar.)")
+
+def mostrar_erro_pedido(parent, erro):
+    """Tratamento por omissão das falhas dos pedidos feitos em segundo plano."""
+    if isinstance(erro, requests.exceptions.RequestException):
+        show_connection_error_message(parent)
+    else:
+        QMessageBox.critical(parent, "Erro", f"Ocorreu um erro inesperado: {erro}")
+
+def pedido_json(funcao, caminho, **kwargs):
+    """Faz o pedido e lê o corpo JSON ainda na thread do pedido. Devolve (response, dados ou None)."""
+    response = funcao(caminho, **kwargs)
     try:
-        global access_token
-        headers = {'Authorization': f'Bearer {access_token}'}
-        response = requests.get(f"{API_BASE_URL}/api/versao", headers=headers, timeout=5)
+        dados = response.json()
+    except ValueError:
+        dados = None
+    return response, dados
+
+def descarregar_para_ficheiro(funcao, caminho, destino, pedido, **kwargs):
+    """
+    Descarrega a resposta em blocos para o ficheiro destino, informando o progresso.
+    Se o pedido for cancelado a meio, o ficheiro incompleto é apagado. Devolve a resposta.
+    """
+    response = funcao(caminho, stream=True, **kwargs)
+    if response.status_code != 200:
+        return response
+    # Com compressão o Content-Length refere-se ao corpo comprimido: o total fica desconhecido (-1)
+    total = 0 if response.headers.get('Content-Encoding') else int(response.headers.get('Content-Length') or 0)
+    recebidos = 0
+    with open(destino, 'wb') as f:
+        for chunk in response.iter_content(chunk_size=65536):
+            if pedido.cancelado():
+                break
+            f.write(chunk)
+            recebidos += len(chunk)
+            pedido.informar_progresso(recebidos * 100 // total if total else -1, f"{recebidos // 1024} KB recebidos")
+    if pedido.cancelado():
+        response.close()
+        os.remove(destino)
+    return response
 
+def criar_tabela_virtual(modelo):
+    """QTableView só de leitura sobre um ModeloTabelaColunar, com linhas de altura fixa e ordenação pelo cabeçalho."""
+    tabela = QTableView()
+    tabela.setModel(modelo)
+    tabela.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+    tabela.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+    tabela.setAlternatingRowColors(True)
+    tabela.setWordWrap(False)
+    # Com altura fixa a vista não precisa de medir o conteúdo de todas as linhas
+    tabela.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+    # Sem coluna indicada, a tabela fica pela ordem em que os dados chegam
+    tabela.horizontalHeader().setSortIndicator(-1, Qt.SortOrder.AscendingOrder)
+    tabela.setSortingEnabled(True)
+    return tabela
+
+class IndicadorCarregamento(QProgressBar):
+    """Barra de progresso indeterminada, visível enquanto o executor tem pedidos em curso."""
+    def __init__(self, executor, parent=None):
+        super().__init__(parent)
+        self.setRange(0, 0)
+        self.setTextVisible(False)
+        self.setMaximumHeight(6)
+        self.setVisible(False)
+        executor.ocupado.connect(self.setVisible)
+
+def check_for_updates(executor):
+    """Contacta a API, em segundo plano, para verificar se existe uma nova versão da aplicação."""
+    print("A verificar atualizações...")
+    executor.executar(api.get, "/api/versao", timeout=5, chave='versao',
+                      ao_concluir=mostrar_resultado_versao, ao_falhar=falha_verificacao_versao)
+
+def mostrar_resultado_versao(response):
+    try:
         if response.status_code == 200:
             dados_versao = response.json()
             versao_servidor = dados_versao.get("versao")
@@ -94,44 +181,170 @@ def check_for_updates():
             print(f"Não foi possível verificar a versão. Erro da API: {response.status_code}")
             QMessageBox.warning(None, "Verificação de Versão", f"Não foi possível contactar o servidor de atualizações (Erro: {response.status_code}).")
 
-    except requests.exceptions.RequestException:
-        show_connection_error_message(None)
     except Exception as e:
-        print(f"Ocorreu um erro ao verificar atualizações: {e}")
-        QMessageBox.critical(None, "Erro na Verificação de Versão", f"Ocorreu um erro inesperado ao tentar verificar por novas versões:\n\n{e}")
+        falha_verificacao_versao(e)
+
+def falha_verificacao_versao(erro):
+    if isinstance(erro, requests.exceptions.RequestException):
+        show_connection_error_message(None)
+        return
+    print(f"Ocorreu um erro ao verificar atualizações: {erro}")
+    QMessageBox.critical(None, "Erro na Verificação de Versão", f"Ocorreu um erro inesperado ao tentar verificar por novas versões:\n\n{erro}")
 
 # ==============================================================================
 # 3. JANELAS DE DIÁLOGO E WORKERS
 # ==============================================================================
 
-class FormDataLoader(QObject):
-    finished = Signal(dict)
-    def __init__(self, produto_id):
-        super().__init__()
-        self.produto_id = produto_id
-    def run(self):
-        results = {'status': 'success'}
-        try:
-            global access_token
-            headers = {'Authorization': f'Bearer {access_token}'}
-            timeout = 10
-            params = {}
-            if self.produto_id:
-                params['produto_id'] = self.produto_id
-            response = requests.get(f"{API_BASE_URL}/api/formularios/produto_data", headers=headers, params=params, timeout=timeout)
-            response.raise_for_status()
-            data = response.json()
-            results['fornecedores'] = data.get('fornecedores', [])
-            results['naturezas'] = data.get('naturezas', [])
-            if data.get('produto'):
-                results['produto'] = data['produto']
-        except requests.exceptions.RequestException:
-            results['status'] = 'error'
-            results['message'] = "connection_error"
-        except Exception as e:
-            results['status'] = 'error'
-            results['message'] = f"Ocorreu um erro inesperado: {e}"
-        self.finished.emit(results)
+def carregar_dados_formulario_produto(produto_id):
+    """Corre em segundo plano: listas de apoio e (na edição) os dados do produto, num só pedido."""
+    results = {'status': 'success'}
+    try:
+        timeout = 10
+        params = {}
+        if produto_id:
+            params['produto_id'] = produto_id
+        response = cache_condicional.get("/api/formularios/produto_data", params=params, timeout=timeout)
+        response.raise_for_status()
+        data = response.json()
+        results['fornecedores'] = data.get('fornecedores', [])
+        results['naturezas'] = data.get('naturezas', [])
+        if data.get('produto'):
+            results['produto'] = data['produto']
+    except requests.exceptions.RequestException:
+        results['status'] = 'error'
+        results['message'] = "connection_error"
+    except Exception as e:
+        results['status'] = 'error'
+        results['message'] = f"Ocorreu um erro inesperado: {e}"
+    return results
+
+class AcompanhadorTarefa(QObject):
+    """Consulta periodicamente o estado de uma tarefa em segundo plano do servidor até ela terminar."""
+    progresso = Signal(int, str)
+    concluida = Signal(dict)
+    falhou = Signal(str)
+    INTERVALO_MS = 1000
+    def __init__(self, id_tarefa, parent=None):
+        super().__init__(parent)
+        self.id_tarefa = id_tarefa
+        self.timer = QTimer(self)
+        self.timer.setInterval(self.INTERVALO_MS)
+        self.timer.timeout.connect(self.consultar)
+        self.executor = ExecutorPedidos(self)
+    def iniciar(self):
+        self.timer.start()
+    def consultar(self):
+        # Uma consulta de cada vez: se o servidor estiver lento, este ciclo é saltado.
+        # As falhas de ligação são ignoradas (tenta novamente no próximo ciclo).
+        if self.executor.em_curso('estado'):
+            return
+        self.executor.executar(api.get, f"/api/tarefas/{self.id_tarefa}", timeout=5, chave='estado',
+                               ao_concluir=self.estado_recebido)
+    def estado_recebido(self, response):
+        if not self.timer.isActive():
+            return
+        if response.status_code != 200:
+            self.timer.stop()
+            self.falhou.emit(f"Erro {response.status_code}: {response.text}")
+            return
+        estado = response.json()
+        self.progresso.emit(estado.get('progresso', 0), estado.get('mensagem', ''))
+        if estado.get('estado') == 'concluida':
+            self.timer.stop()
+            self.concluida.emit(estado)
+        elif estado.get('estado') == 'erro':
+            self.timer.stop()
+            self.falhou.emit(estado.get('mensagem', 'Erro desconhecido.'))
+
+class SincronizacaoCatalogo(QObject):
+    """
+    Mantém o catálogo local atualizado: sincroniza ao entrar, a cada INTERVALO_SINCRONIZACAO_MS
+    e sempre que um ecrã altera produtos ou saldos (signal_handler.catalogo_desatualizado).
+    """
+    catalogo_atualizado = Signal()
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pendente = False
+        self.timer = QTimer(self)
+        self.timer.setInterval(INTERVALO_SINCRONIZACAO_MS)
+        self.timer.timeout.connect(self.sincronizar_agora)
+        self.executor = ExecutorPedidos(self)
+    def iniciar(self):
+        # O catálogo guardado no disco fica disponível antes da primeira resposta do servidor
+        self.executor.executar(catalogo_local.abrir, chave='abrir',
+                               ao_concluir=self.catalogo_aberto, ao_falhar=self.falha_sincronizacao)
+        self.timer.start()
+    def parar(self):
+        self.timer.stop()
+        self.executor.cancelar_todos()
+    def catalogo_aberto(self, produtos):
+        if produtos:
+            self.catalogo_atualizado.emit()
+        self.sincronizar_agora()
+    def sincronizar_agora(self):
+        if self.executor.em_curso('sincronizar'):
+            # Volta a sincronizar quando a sincronização em curso terminar
+            self.pendente = True
+            return
+        self.pendente = False
+        self.executor.executar(catalogo_local.sincronizar, api, chave='sincronizar',
+                               ao_concluir=self.sincronizado, ao_falhar=self.falha_sincronizacao)
+    def sincronizado(self, alterado):
+        if alterado:
+            self.catalogo_atualizado.emit()
+        if self.pendente:
+            QTimer.singleShot(0, self.sincronizar_agora)
+    def falha_sincronizacao(self, erro):
+        # Sem servidor continua-se com o catálogo local; o próximo ciclo tenta de novo
+        print(f"AVISO: não foi possível sincronizar o catálogo local: {erro}")
+
+class EnvioFilaMovimentacoes(QObject):
+    """
+    Envia em segundo plano as movimentações guardadas na fila local, por ordem e em lotes: logo que
+    uma entra na fila (signal_handler.movimentacoes_em_fila) e a cada INTERVALO_ENVIO_FILA_MS.
+    """
+    fila_alterada = Signal(int)               # movimentações por enviar
+    movimentacoes_enviadas = Signal(list)     # [(id_produto, novo_saldo)]
+    movimentacoes_recusadas = Signal(list)    # movimentações da fila recusadas pelo servidor
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.timer = QTimer(self)
+        self.timer.setInterval(INTERVALO_ENVIO_FILA_MS)
+        self.timer.timeout.connect(self.enviar_agora)
+        self.executor = ExecutorPedidos(self)
+    def iniciar(self):
+        recusadas = fila_movimentacoes.recusadas()
+        if recusadas:
+            # Recusadas numa sessão anterior e ainda não vistas pelo operador
+            self.movimentacoes_recusadas.emit(recusadas)
+        self.fila_alterada.emit(fila_movimentacoes.contar())
+        self.timer.start()
+        self.enviar_agora()
+    def parar(self):
+        self.timer.stop()
+        self.executor.cancelar_todos()
+    def enviar_agora(self):
+        self.fila_alterada.emit(fila_movimentacoes.contar())
+        # Um envio de cada vez; cada envio lê da fila as movimentações mais antigas
+        if self.executor.em_curso('enviar'):
+            return
+        self.executor.executar(fila_movimentacoes.enviar, api, chave='enviar',
+                               ao_concluir=self.lote_enviado, ao_falhar=self.falha_envio)
+    def lote_enviado(self, resultado):
+        enviadas, recusadas, por_enviar = resultado
+        for id_produto, novo_saldo in enviadas:
+            catalogo_local.atualizar_saldo(id_produto, novo_saldo)
+        if enviadas:
+            self.movimentacoes_enviadas.emit(enviadas)
+        if recusadas:
+            self.movimentacoes_recusadas.emit(recusadas)
+        self.fila_alterada.emit(por_enviar)
+        if por_enviar:
+            QTimer.singleShot(0, self.enviar_agora)
+    def falha_envio(self, erro):
+        # Ainda sem ligação (ou sessão expirada): as movimentações ficam na fila até ao próximo ciclo
+        print(f"AVISO: não foi possível enviar a fila de movimentações: {erro}")
+        self.fila_alterada.emit(fila_movimentacoes.contar())
 
 class FormularioProdutoDialog(QDialog):
     produto_atualizado = Signal(int, dict)
@@ -168,6 +381,7 @@ class FormularioProdutoDialog(QDialog):
         self.verificacao_timer = QTimer(self)
         self.verificacao_timer.setSingleShot(True)
         self.verificacao_timer.timeout.connect(self.verificar_codigo_produto)
+        self.executor = ExecutorPedidos(self)
         layout_codigo = QHBoxLayout()
         layout_codigo.addWidget(self.input_codigo)
         layout_codigo.addWidget(self.label_status_codigo)
@@ -200,15 +414,8 @@ class FormularioProdutoDialog(QDialog):
         self.iniciar_carregamento_assincrono()
     def iniciar_carregamento_assincrono(self):
         self.definir_estado_carregamento(True)
-        self.thread = QThread()
-        self.worker = FormDataLoader(self.produto_id)
-        self.worker.moveToThread(self.thread)
-        self.thread.started.connect(self.worker.run)
-        self.worker.finished.connect(self.preencher_dados_formulario)
-        self.worker.finished.connect(self.thread.quit)
-        self.worker.finished.connect(self.worker.deleteLater)
-        self.thread.finished.connect(self.thread.deleteLater)
-        self.thread.start()
+        self.executor.executar(carregar_dados_formulario_produto, self.produto_id,
+                               ao_concluir=self.preencher_dados_formulario)
     def definir_estado_carregamento(self, a_carregar):
         for widget in self.findChildren(QWidget):
             if isinstance(widget, (QLineEdit, QListWidget, QPushButton)):
@@ -261,23 +468,24 @@ class FormularioProdutoDialog(QDialog):
     def verificar_codigo_produto(self):
         codigo = self.input_codigo.text().strip()
         if not codigo:
+            self.executor.cancelar('codigo')
             self.label_status_codigo.setText("")
             return
-        global access_token
-        headers = {'Authorization': f'Bearer {access_token}'}
-        try:
-            response = requests.get(f"{API_BASE_URL}/api/produtos/codigo/{codigo}", headers=headers)
-            if response and response.status_code == 404:
-                self.label_status_codigo.setText("✅ Disponível")
-                self.label_status_codigo.setStyleSheet("color: #28a745;")
-            elif response and response.status_code == 200:
-                self.label_status_codigo.setText("❌ Já existe!")
-                self.label_status_codigo.setStyleSheet("color: #dc3545;")
-            else:
-                self.label_status_codigo.setText("")
-        except requests.exceptions.RequestException:
-            self.label_status_codigo.setText("⚠️ Erro")
-            self.label_status_codigo.setStyleSheet("color: #ffc107;")
+        # Cada nova verificação substitui a anterior (o utilizador continuou a escrever)
+        self.executor.executar(api.get, f"/api/produtos/codigo/{codigo}", chave='codigo',
+                               ao_concluir=self.mostrar_estado_codigo, ao_falhar=self.falha_verificacao_codigo)
+    def mostrar_estado_codigo(self, response):
+        if response.status_code == 404:
+            self.label_status_codigo.setText("✅ Disponível")
+            self.label_status_codigo.setStyleSheet("color: #28a745;")
+        elif response.status_code == 200:
+            self.label_status_codigo.setText("❌ Já existe!")
+            self.label_status_codigo.setStyleSheet("color: #dc3545;")
+        else:
+            self.label_status_codigo.setText("")
+    def falha_verificacao_codigo(self, erro):
+        self.label_status_codigo.setText("⚠️ Erro")
+        self.label_status_codigo.setStyleSheet("color: #ffc107;")
     def adicionar_rapido_fornecedor(self):
         dialog = QuickAddDialog(self, "Adicionar Novo Fornecedor", "/api/fornecedores")
         dialog.item_adicionado.connect(self.carregar_listas_de_apoio_refreshed)
@@ -293,16 +501,14 @@ class FormularioProdutoDialog(QDialog):
     def carregar_listas_de_apoio(self):
         self.lista_fornecedores.clear()
         self.lista_naturezas.clear()
-        global access_token
-        headers = {'Authorization': f'Bearer {access_token}'}
         try:
-            response_forn = requests.get(f"{API_BASE_URL}/api/fornecedores", headers=headers)
+            response_forn = cache_condicional.get("/api/fornecedores")
             if response_forn and response_forn.status_code == 200:
                 for forn in response_forn.json():
                     item = QListWidgetItem(forn['nome'])
                     item.setData(Qt.UserRole, forn['id'])
                     self.lista_fornecedores.addItem(item)
-            response_nat = requests.get(f"{API_BASE_URL}/api/naturezas", headers=headers)
+            response_nat = cache_condicional.get("/api/naturezas")
             if response_nat and response_nat.status_code == 200:
                 for nat in response_nat.json():
                     item = QListWidgetItem(nat['nome'])
@@ -327,8 +533,6 @@ class FormularioProdutoDialog(QDialog):
         if not nome or not codigo:
             QMessageBox.warning(self, "Campos Obrigatórios", "Por favor, preencha os campos: Código e Nome.")
             return
-        global access_token
-        headers = {'Authorization': f'Bearer {access_token}'}
         preco_str = self.input_preco.text().strip().replace(',', '.')
         dados_produto = {
             "codigo": codigo, "nome": nome, "preco": preco_str if preco_str else "0.00",
@@ -339,20 +543,20 @@ class FormularioProdutoDialog(QDialog):
         ids_naturezas_selecionadas = [self.lista_naturezas.item(i).data(Qt.UserRole) for i in range(self.lista_naturezas.count()) if self.lista_naturezas.item(i).isSelected()]
         try:
             if self.produto_id is None:
-                response_produto = requests.post(f"{API_BASE_URL}/api/produtos", headers=headers, json=dados_produto)
+                response_produto = api.post("/api/produtos", json=dados_produto)
                 if not response_produto or response_produto.status_code != 201:
                     raise Exception(response_produto.json().get('erro', 'Erro ao criar produto'))
                 produto_salvo_id = response_produto.json().get('id_produto_criado')
                 dados_produto['fornecedores_ids'] = ids_fornecedores_selecionados
                 dados_produto['naturezas_ids'] = ids_naturezas_selecionadas
-                response_update = requests.put(f"{API_BASE_URL}/api/produtos/{produto_salvo_id}", headers=headers, json=dados_produto)
+                response_update = api.put(f"/api/produtos/{produto_salvo_id}", json=dados_produto)
                 if not response_update or response_update.status_code != 200:
                     raise Exception(response_update.json().get('erro', 'Produto criado, mas falha ao salvar associações'))
                 super().accept()
             else:
                 dados_produto['fornecedores_ids'] = ids_fornecedores_selecionados
                 dados_produto['naturezas_ids'] = ids_naturezas_selecionadas
-                response = requests.put(f"{API_BASE_URL}/api/produtos/{self.produto_id}", headers=headers, json=dados_produto)
+                response = api.put(f"/api/produtos/{self.produto_id}", json=dados_produto)
                 if not response or response.status_code != 200:
                     raise Exception(response.json().get('erro', 'Erro ao atualizar produto'))
                 dados_atualizados = response.json()
@@ -379,10 +583,8 @@ class FormularioFornecedorDialog(QDialog):
         if self.fornecedor_id:
             self.carregar_dados_fornecedor()
     def carregar_dados_fornecedor(self):
-        global access_token
-        headers = {'Authorization': f'Bearer {access_token}'}
         try:
-            response = requests.get(f"{API_BASE_URL}/api/fornecedores/{self.fornecedor_id}", headers=headers)
+            response = api.get(f"/api/fornecedores/{self.fornecedor_id}")
             if response.status_code == 200:
                 self.input_nome.setText(response.json().get('nome'))
             else:
@@ -390,18 +592,16 @@ class FormularioFornecedorDialog(QDialog):
         except requests.exceptions.RequestException:
             show_connection_error_message(self)
     def accept(self):
-        global access_token
-        headers = {'Authorization': f'Bearer {access_token}'}
         dados = {"nome": self.input_nome.text()}
         try:
             if self.fornecedor_id is None:
-                response = requests.post(f"{API_BASE_URL}/api/fornecedores", headers=headers, json=dados)
+                response = api.post("/api/fornecedores", json=dados)
                 if response.status_code == 201:
                     QMessageBox.information(self, "Sucesso", "Fornecedor adicionado com sucesso!")
                     super().accept()
                 else: raise Exception(response.json().get('erro', 'Erro desconhecido'))
             else:
-                response = requests.put(f"{API_BASE_URL}/api/fornecedores/{self.fornecedor_id}", headers=headers, json=dados)
+                response = api.put(f"/api/fornecedores/{self.fornecedor_id}", json=dados)
                 if response.status_code == 200:
                     QMessageBox.information(self, "Sucesso", "Fornecedor atualizado com sucesso!")
                     super().accept()
@@ -426,10 +626,8 @@ class FormularioNaturezaDialog(QDialog):
         if self.natureza_id:
             self.carregar_dados_natureza()
     def carregar_dados_natureza(self):
-        global access_token
-        headers = {'Authorization': f'Bearer {access_token}'}
         try:
-            response = requests.get(f"{API_BASE_URL}/api/naturezas/{self.natureza_id}", headers=headers)
+            response = api.get(f"/api/naturezas/{self.natureza_id}")
             if response.status_code == 200:
                 self.input_nome.setText(response.json().get('nome'))
             else:
@@ -437,18 +635,16 @@ class FormularioNaturezaDialog(QDialog):
         except requests.exceptions.RequestException:
             show_connection_error_message(self)
     def accept(self):
-        global access_token
-        headers = {'Authorization': f'Bearer {access_token}'}
         dados = {"nome": self.input_nome.text()}
         try:
             if self.natureza_id is None:
-                response = requests.post(f"{API_BASE_URL}/api/naturezas", headers=headers, json=dados)
+                response = api.post("/api/naturezas", json=dados)
                 if response.status_code == 201:
                     QMessageBox.information(self, "Sucesso", "Natureza adicionada com sucesso!")
                     super().accept()
                 else: raise Exception(response.json().get('erro', 'Erro desconhecido'))
             else:
-                response = requests.put(f"{API_BASE_URL}/api/naturezas/{self.natureza_id}", headers=headers, json=dados)
+                response = api.put(f"/api/naturezas/{self.natureza_id}", json=dados)
                 if response.status_code == 200:
                     QMessageBox.information(self, "Sucesso", "Natureza atualizada com sucesso!")
                     super().accept()
@@ -479,11 +675,9 @@ class QuickAddDialog(QDialog):
         if not nome:
             QMessageBox.warning(self, "Erro", "O campo de nome não pode estar vazio.")
             return
-        global access_token
-        headers = {'Authorization': f'Bearer {access_token}'}
         dados = {"nome": nome}
         try:
-            response = requests.post(f"{API_BASE_URL}{self.endpoint}", headers=headers, json=dados)
+            response = api.post(self.endpoint, json=dados)
             if response.status_code == 201:
                 QMessageBox.information(self, "Sucesso", "Item adicionado com sucesso!")
                 self.item_adicionado.emit()
@@ -523,10 +717,8 @@ class FormularioUsuarioDialog(QDialog):
         if self.usuario_id:
             self.carregar_dados_usuario()
     def carregar_dados_usuario(self):
-        global access_token
-        headers = {'Authorization': f'Bearer {access_token}'}
         try:
-            response = requests.get(f"{API_BASE_URL}/api/usuarios/{self.usuario_id}", headers=headers)
+            response = api.get(f"/api/usuarios/{self.usuario_id}")
             if response.status_code == 200:
                 dados = response.json()
                 self.input_nome.setText(dados.get('nome', ''))
@@ -539,7 +731,6 @@ class FormularioUsuarioDialog(QDialog):
             show_connection_error_message(self)
             self.reject()
     def accept(self):
-        global access_token
         if not self.input_nome.text().strip() or not self.input_login.text().strip():
             QMessageBox.warning(self, "Campos Obrigatórios", "Os campos Nome e Login são obrigatórios.")
             return
@@ -549,14 +740,13 @@ class FormularioUsuarioDialog(QDialog):
         elif self.usuario_id is None:
             QMessageBox.warning(self, "Campo Obrigatório", "A senha é obrigatória para novos usuários.")
             return
-        headers = {'Authorization': f'Bearer {access_token}'}
         try:
             if self.usuario_id is None:
-                response = requests.post(f"{API_BASE_URL}/api/usuarios", headers=headers, json=dados)
+                response = api.post("/api/usuarios", json=dados)
                 mensagem_sucesso = "Usuário adicionado com sucesso!"
                 status_esperado = 201
             else:
-                response = requests.put(f"{API_BASE_URL}/api/usuarios/{self.usuario_id}", headers=headers, json=dados)
+                response = api.put(f"/api/usuarios/{self.usuario_id}", json=dados)
                 mensagem_sucesso = "Usuário atualizado com sucesso!"
                 status_esperado = 200
             if response.status_code == status_esperado:
@@ -600,11 +790,9 @@ class MudarSenhaDialog(QDialog):
         if nova_senha != confirmacao:
             QMessageBox.warning(self, "Erro", "A nova senha e a confirmação não correspondem.")
             return
-        global access_token
-        headers = {'Authorization': f'Bearer {access_token}'}
         dados = {"senha_atual": senha_atual, "nova_senha": nova_senha, "confirmacao_nova_senha": confirmacao}
         try:
-            response = requests.post(f"{API_BASE_URL}/api/usuario/mudar-senha", headers=headers, json=dados)
+            response = api.post("/api/usuario/mudar-senha", json=dados)
             if response and response.status_code == 200:
                 QMessageBox.information(self, "Sucesso", "Senha alterada com sucesso!")
                 super().accept()
@@ -619,6 +807,7 @@ class QuantidadeDialog(QDialog):
     def __init__(self, parent, produto_id, produto_nome, produto_codigo, operacao):
         super().__init__(parent)
         self.produto_id = produto_id
+        self.produto_nome = produto_nome
         self.produto_codigo = produto_codigo
         self.operacao = operacao
         acao_texto = "Adicionar" if operacao == "Entrada" else "Remover"
@@ -639,37 +828,60 @@ class QuantidadeDialog(QDialog):
         self.layout.addWidget(self.botoes)
         self.botoes.accepted.connect(self.accept)
         self.botoes.rejected.connect(self.reject)
+        self.executor = ExecutorPedidos(self)
+        self.a_registar = False
         self.input_quantidade.setFocus()
     def accept(self):
+        if self.a_registar:
+            return
         quantidade_str = self.input_quantidade.text()
         if not quantidade_str or int(quantidade_str) <= 0:
             QMessageBox.warning(self, "Erro", "Por favor, insira uma quantidade válida maior que zero.")
             return
-        dados = { "id_produto": self.produto_id, "quantidade": int(quantidade_str) }
-        endpoint = "/api/estoque/entrada"
+        motivo = None
         if self.operacao == "Saida":
             motivo = self.input_motivo.text().strip()
             if not motivo:
                 QMessageBox.warning(self, "Erro", "O motivo é obrigatório para saídas de estoque.")
                 return
-            dados["motivo_saida"] = motivo
-            endpoint = "/api/estoque/saida"
-        global access_token
-        headers = {'Authorization': f'Bearer {access_token}'}
-        try:
-            response = requests.post(f"{API_BASE_URL}{endpoint}", headers=headers, json=dados)
-            if response and response.status_code == 201:
-                self.estoque_modificado.emit(self.produto_codigo)
-                super().accept()
-            else:
-                QMessageBox.warning(self, "Erro na API", response.json().get('erro', 'Ocorreu um erro.'))
-        except requests.exceptions.RequestException:
-            show_connection_error_message(self)
+        self.a_registar = True
+        self.botoes.setEnabled(False)
+        # Sem ligação ao servidor a movimentação fica na fila local e é enviada mais tarde
+        self.executor.executar(fila_movimentacoes.registar, api, self.produto_id, self.operacao, int(quantidade_str), motivo,
+                               codigo=self.produto_codigo, nome=self.produto_nome,
+                               ao_concluir=self.movimentacao_registada, ao_falhar=self.falha_registo)
+    def reject(self):
+        # Com o pedido em curso a movimentação pode já ter sido gravada: espera pela resposta
+        if not self.a_registar:
+            super().reject()
+    def movimentacao_registada(self, resposta):
+        self.a_registar = False
+        self.botoes.setEnabled(True)
+        response, dados = resposta
+        if response is None:
+            avisar_movimentacao_em_fila(self, "A movimentação")
+            super().accept()
+        elif response.status_code == 201:
+            catalogo_local.atualizar_saldo(self.produto_id, dados.get('novo_saldo'))
+            signal_handler.catalogo_desatualizado.emit()
+            self.estoque_modificado.emit(self.produto_codigo)
+            super().accept()
+        else:
+            QMessageBox.warning(self, "Erro na API", (dados or {}).get('erro', 'Ocorreu um erro.'))
+    def falha_registo(self, erro):
+        self.a_registar = False
+        self.botoes.setEnabled(True)
+        mostrar_erro_pedido(self, erro)
 
 # ==============================================================================
 # 4. WIDGETS DE CONTEÚDO (AS "TELAS" PRINCIPAIS)
 # ==============================================================================
 
+def enviar_ficheiro_importacao(caminho_ficheiro):
+    with open(caminho_ficheiro, 'rb') as f:
+        files = {'file': (os.path.basename(caminho_ficheiro), f, 'text/csv')}
+        return api.post("/api/tarefas/produtos/importar", files=files, timeout=60)
+
 class ImportacaoWidget(QWidget):
     produtos_importados_sucesso = Signal()
     def __init__(self):
@@ -696,6 +908,10 @@ class ImportacaoWidget(QWidget):
         self.btn_importar = QPushButton("🚀 Iniciar Importação")
         self.btn_importar.setObjectName("btnPositive")
         self.btn_importar.setEnabled(False)
+        self.barra_progresso = QProgressBar()
+        self.barra_progresso.setVisible(False)
+        self.acompanhador = None
+        self.executor = ExecutorPedidos(self)
         label_resultados = QLabel("Resultados da Importação:")
         self.text_resultados = QTextEdit()
         self.text_resultados.setReadOnly(True)
@@ -703,6 +919,7 @@ class ImportacaoWidget(QWidget):
         self.layout.addWidget(instrucoes)
         self.layout.addLayout(layout_selecao)
         self.layout.addWidget(self.btn_importar)
+        self.layout.addWidget(self.barra_progresso)
         self.layout.addWidget(label_resultados)
         self.layout.addWidget(self.text_resultados)
         self.btn_selecionar.clicked.connect(self.selecionar_ficheiro)
@@ -717,38 +934,79 @@ class ImportacaoWidget(QWidget):
     def iniciar_importacao(self):
         if not self.caminho_ficheiro:
             return
-        self.text_resultados.setText("A importar... Por favor, aguarde.")
-        QApplication.processEvents()
-        global access_token
-        headers = {'Authorization': f'Bearer {access_token}'}
-        try:
-            with open(self.caminho_ficheiro, 'rb') as f:
-                files = {'file': (os.path.basename(self.caminho_ficheiro), f, 'text/csv')}
-                response = requests.post(f"{API_BASE_URL}/api/produtos/importar", headers=headers, files=files)
-            if response.status_code == 200:
-                dados = response.json()
-                resultado_texto = f"{dados.get('mensagem', '')}\n"
-                resultado_texto += f"Produtos importados com sucesso: {dados.get('produtos_importados', 0)}\n\n"
-                erros = dados.get('erros', [])
-                if erros:
-                    resultado_texto += "Erros encontrados:\n"
-                    resultado_texto += "\n".join(erros)
-                self.text_resultados.setText(resultado_texto)
-                if dados.get('produtos_importados', 0) > 0:
-                    self.produtos_importados_sucesso.emit()
-            else:
-                self.text_resultados.setText(f"Erro na API: {response.text}")
-        except requests.exceptions.RequestException:
-            show_connection_error_message(self)
-        except Exception as e:
-            self.text_resultados.setText(f"Ocorreu um erro crítico: {e}")
+        self.text_resultados.setText("A enviar o ficheiro... Por favor, aguarde.")
         self.btn_importar.setEnabled(False)
+        self.btn_selecionar.setEnabled(False)
+        # A importação corre no servidor em segundo plano; aqui apenas enviamos o ficheiro e acompanhamos o progresso
+        self.executor.executar(enviar_ficheiro_importacao, self.caminho_ficheiro,
+                               ao_concluir=self.ficheiro_enviado, ao_falhar=self.envio_falhou)
+    def ficheiro_enviado(self, response):
+        if response.status_code == 202:
+            self.text_resultados.setText("A importar... Por favor, aguarde.")
+            self.barra_progresso.setValue(0)
+            self.barra_progresso.setVisible(True)
+            self.acompanhador = AcompanhadorTarefa(response.json()['id_tarefa'], self)
+            self.acompanhador.progresso.connect(self.atualizar_progresso)
+            self.acompanhador.concluida.connect(self.mostrar_resultado)
+            self.acompanhador.falhou.connect(self.importacao_falhou)
+            self.acompanhador.iniciar()
+        else:
+            self.btn_selecionar.setEnabled(True)
+            self.text_resultados.setText(f"Erro na API: {response.text}")
+    def envio_falhou(self, erro):
+        self.btn_selecionar.setEnabled(True)
+        if isinstance(erro, requests.exceptions.RequestException):
+            self.text_resultados.clear()
+            show_connection_error_message(self)
+        else:
+            self.text_resultados.setText(f"Ocorreu um erro crítico: {erro}")
+    def atualizar_progresso(self, percentual, mensagem):
+        self.barra_progresso.setValue(percentual)
+        if mensagem:
+            self.text_resultados.setText(f"A importar... {mensagem}")
+    def mostrar_resultado(self, estado):
+        self.finalizar_acompanhamento()
+        self.executor.executar(pedido_json, api.get, f"/api/tarefas/{estado['id_tarefa']}/resultado", timeout=30,
+                               ao_concluir=self.resultado_recebido, ao_falhar=lambda erro: mostrar_erro_pedido(self, erro))
+    def resultado_recebido(self, resposta):
+        response, dados = resposta
+        if response.status_code == 200:
+            resultado_texto = f"{dados.get('mensagem', '')}\n"
+            resultado_texto += f"Produtos importados com sucesso: {dados.get('produtos_importados', 0)}\n\n"
+            erros = dados.get('erros', [])
+            if erros:
+                resultado_texto += "Erros encontrados:\n"
+                resultado_texto += "\n".join(erros)
+            self.text_resultados.setText(resultado_texto)
+            if dados.get('produtos_importados', 0) > 0:
+                self.produtos_importados_sucesso.emit()
+        else:
+            self.text_resultados.setText(f"Erro na API: {response.text}")
+    def importacao_falhou(self, mensagem):
+        self.finalizar_acompanhamento()
+        self.text_resultados.setText(f"A importação falhou: {mensagem}")
+    def finalizar_acompanhamento(self):
+        self.barra_progresso.setVisible(False)
+        self.btn_selecionar.setEnabled(True)
+        if self.acompanhador:
+            self.acompanhador.deleteLater()
+            self.acompanhador = None
+
+COLUNAS_INVENTARIO = (
+    Coluna('codigo', "Código", ordem_servidor='codigo'),
+    Coluna('nome', "Nome do Produto", ordem_servidor='nome'),
+    Coluna('descricao', "Descrição"),
+    Coluna('saldo_atual', "Saldo", Qt.AlignmentFlag.AlignCenter, ordem_servidor='saldo'),
+    Coluna('preco', "Preço (R$)", Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter, formatar_preco, ordem_servidor='preco'),
+    Coluna('codigoB', "Código B"),
+    Coluna('codigoC', "Código C"),
+)
 
 class InventarioWidget(QWidget):
     def __init__(self):
         super().__init__()
         self.layout = QVBoxLayout(self)
-        self.dados_exibidos = []
+        self.params_listagem = {}
         self.sort_qtd_desc = True
         self.titulo = QLabel("Inventário Completo")
         self.titulo.setStyleSheet("font-size: 24px; font-weight: bold;")
@@ -778,20 +1036,18 @@ class InventarioWidget(QWidget):
         self.btn_ordenar_qtd.setObjectName("btnIcon")
         controles_layout_2.addWidget(self.btn_ordenar_nome)
         controles_layout_2.addWidget(self.btn_ordenar_qtd)
-        self.tabela_inventario = QTableWidget()
+        self.modelo = ModeloTabelaColunar(COLUNAS_INVENTARIO, campo_id='id_produto', parent=self)
+        self.tabela_inventario = criar_tabela_virtual(self.modelo)
         self.tabela_inventario.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
-        self.tabela_inventario.setColumnCount(7)
-        self.tabela_inventario.setHorizontalHeaderLabels(["Código", "Nome do Produto", "Descrição", "Saldo", "Preço (R$)", "Código B", "Código C"])
-        self.tabela_inventario.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
-        self.tabela_inventario.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
-        self.tabela_inventario.setAlternatingRowColors(True)
-        self.tabela_inventario.setWordWrap(True)
         header = self.tabela_inventario.horizontalHeader()
         header.setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
         header.setSectionResizeMode(2, QHeaderView.ResizeMode.Stretch)
+        self.executor = ExecutorPedidos(self)
+        self.indicador_carregamento = IndicadorCarregamento(self.executor)
         self.layout.addWidget(self.titulo)
         self.layout.addLayout(controles_layout_1)
         self.layout.addLayout(controles_layout_2)
+        self.layout.addWidget(self.indicador_carregamento)
         self.layout.addWidget(self.tabela_inventario)
         self.search_timer = QTimer(self)
         self.search_timer.setSingleShot(True)
@@ -803,103 +1059,120 @@ class InventarioWidget(QWidget):
         self.btn_gerar_etiquetas.clicked.connect(self.gerar_etiquetas_selecionadas)
         self.btn_ordenar_nome.clicked.connect(self.ordenar_por_nome)
         self.btn_ordenar_qtd.clicked.connect(self.ordenar_por_quantidade)
+        self.modelo.mais_linhas_pedidas.connect(self.carregar_mais_inventario)
+        self.modelo.ordenacao_pedida.connect(lambda ordem, direcao: self.carregar_dados_inventario())
         self.carregar_dados_inventario()
     def iniciar_busca_timer(self):
         self.search_timer.stop()
         self.search_timer.start(300)
-    def carregar_dados_inventario(self):
-        global access_token
-        params = {}
+    def parametros_inventario(self):
+        # A pesquisa devolve poucos resultados, por relevância, de uma só vez; a listagem completa vem às páginas
+        params = {'shape': 'columns'}
         termo_busca = self.input_pesquisa.text()
         if termo_busca:
             params['search'] = termo_busca
-        headers = {'Authorization': f'Bearer {access_token}'}
-        try:
-            response = requests.get(f"{API_BASE_URL}/api/estoque/saldos", headers=headers, params=params)
-            if response and response.status_code == 200:
-                self.dados_exibidos = response.json()
-                self.popular_tabela(self.dados_exibidos)
-            else:
-                QMessageBox.warning(self, "Erro", "Não foi possível carregar os dados do inventário.")
-        except requests.exceptions.RequestException:
-            show_connection_error_message(self)
-    def popular_tabela(self, dados):
-        self.tabela_inventario.setRowCount(0)
-        self.tabela_inventario.setRowCount(len(dados))
-        for linha, item in enumerate(dados):
-            item_codigo = QTableWidgetItem(item['codigo'])
-            item_codigo.setData(Qt.UserRole, item['id_produto'])
-            self.tabela_inventario.setItem(linha, 0, item_codigo)
-            self.tabela_inventario.setItem(linha, 1, QTableWidgetItem(item['nome']))
-            self.tabela_inventario.setItem(linha, 2, QTableWidgetItem(item.get('descricao', '')))
-            saldo_item = QTableWidgetItem(str(item['saldo_atual']))
-            saldo_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-            self.tabela_inventario.setItem(linha, 3, saldo_item)
-            preco_item = QTableWidgetItem(str(item.get('preco', '0.00')))
-            preco_item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
-            self.tabela_inventario.setItem(linha, 4, preco_item)
-            self.tabela_inventario.setItem(linha, 5, QTableWidgetItem(item['codigoB']))
-            self.tabela_inventario.setItem(linha, 6, QTableWidgetItem(item['codigoC']))
-        self.tabela_inventario.resizeRowsToContents()
+        else:
+            params['limit'] = TAMANHO_PAGINA_TABELAS
+        header = self.tabela_inventario.horizontalHeader()
+        coluna = header.sortIndicatorSection()
+        if 0 <= coluna < len(COLUNAS_INVENTARIO) and COLUNAS_INVENTARIO[coluna].ordem_servidor:
+            params['sort'] = COLUNAS_INVENTARIO[coluna].ordem_servidor
+            params['order'] = 'desc' if header.sortIndicatorOrder() == Qt.SortOrder.DescendingOrder else 'asc'
+        return params
+    def carregar_dados_inventario(self):
+        if catalogo_local.carregado:
+            # Listagem completa (ou pesquisa) a partir do catálogo local, sem pedido ao servidor
+            self.executor.cancelar('saldos')
+            self.search_timer.stop()
+            self.modelo.definir_dados(catalogo_local.listagem(self.input_pesquisa.text()))
+            return
+        self.params_listagem = self.parametros_inventario()
+        # Uma pesquisa nova substitui a que ainda estiver em curso (o resultado desta já não interessa)
+        self.executor.executar(pedido_json, cache_condicional.get, "/api/estoque/saldos", params=self.params_listagem, chave='saldos',
+                               ao_concluir=self.dados_inventario_recebidos, ao_falhar=lambda erro: mostrar_erro_pedido(self, erro))
+    def dados_inventario_recebidos(self, resposta):
+        response, dados = resposta
+        if response.status_code == 200:
+            self.modelo.definir_dados(dados)
+        else:
+            QMessageBox.warning(self, "Erro", "Não foi possível carregar os dados do inventário.")
+    def recarregar_apos_alteracao(self):
+        if catalogo_local.carregado:
+            # A listagem vem do catálogo local: é recarregada quando a sincronização trouxer a alteração
+            signal_handler.catalogo_desatualizado.emit()
+        else:
+            self.carregar_dados_inventario()
+    def atualizar_se_visivel(self):
+        # Chamado a cada sincronização com alterações; escondido, o inventário recarrega ao voltar a ser mostrado
+        if self.isVisible():
+            self.carregar_dados_inventario()
+    def carregar_mais_inventario(self, cursor):
+        if self.executor.em_curso('saldos'):
+            # A listagem está a ser recarregada: a página seguinte já não se aplica
+            self.modelo.falha_carregamento()
+            return
+        self.executor.executar(pedido_json, api.get, "/api/estoque/saldos", params=dict(self.params_listagem, cursor=cursor), chave='saldos',
+                               ao_concluir=self.pagina_inventario_recebida, ao_falhar=self.falha_pagina_inventario)
+    def pagina_inventario_recebida(self, resposta):
+        response, dados = resposta
+        if response.status_code == 200:
+            self.modelo.acrescentar(dados)
+        else:
+            self.modelo.falha_carregamento()
+            QMessageBox.warning(self, "Erro", "Não foi possível carregar mais produtos do inventário.")
+    def falha_pagina_inventario(self, erro):
+        self.modelo.falha_carregamento()
+        mostrar_erro_pedido(self, erro)
     def ordenar_por_nome(self):
-        self.dados_exibidos.sort(key=lambda item: item['nome'].lower())
-        self.popular_tabela(self.dados_exibidos)
+        self.tabela_inventario.sortByColumn(1, Qt.SortOrder.AscendingOrder)
     def ordenar_por_quantidade(self):
-        self.dados_exibidos.sort(key=lambda item: int(item['saldo_atual']), reverse=self.sort_qtd_desc)
+        ordem = Qt.SortOrder.DescendingOrder if self.sort_qtd_desc else Qt.SortOrder.AscendingOrder
         self.sort_qtd_desc = not self.sort_qtd_desc
-        self.popular_tabela(self.dados_exibidos)
+        self.tabela_inventario.sortByColumn(3, ordem)
     def abrir_formulario_adicionar(self):
         dialog = FormularioProdutoDialog(self)
         if dialog.exec():
-            self.carregar_dados_inventario()
+            self.recarregar_apos_alteracao()
     def abrir_formulario_editar(self):
-        linha_selecionada = self.tabela_inventario.currentRow()
+        linha_selecionada = self.tabela_inventario.currentIndex().row()
         if linha_selecionada < 0:
             QMessageBox.warning(self, "Seleção", "Por favor, selecione um produto para editar.")
             return
-        item = self.tabela_inventario.item(linha_selecionada, 0)
-        produto_id = item.data(Qt.UserRole)
+        produto_id = self.modelo.valor(linha_selecionada, 'id_produto')
         dialog = FormularioProdutoDialog(self, produto_id=produto_id, row=linha_selecionada)
         dialog.produto_atualizado.connect(self.atualizar_linha_produto)
         dialog.exec()
     def atualizar_linha_produto(self, linha, dados_produto):
-        saldo_antigo = self.tabela_inventario.item(linha, 3).text()
-        item_codigo = QTableWidgetItem(dados_produto['codigo'])
-        item_codigo.setData(Qt.UserRole, dados_produto['id'])
-        self.tabela_inventario.setItem(linha, 0, item_codigo)
-        self.tabela_inventario.setItem(linha, 1, QTableWidgetItem(dados_produto['nome']))
-        self.tabela_inventario.setItem(linha, 2, QTableWidgetItem(dados_produto['descricao']))
-        saldo_item = QTableWidgetItem(saldo_antigo)
-        saldo_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.tabela_inventario.setItem(linha, 3, saldo_item)
-        preco_item = QTableWidgetItem(dados_produto['preco'])
-        preco_item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
-        self.tabela_inventario.setItem(linha, 4, preco_item)
-        self.tabela_inventario.setItem(linha, 5, QTableWidgetItem(dados_produto.get('codigoB', '')))
-        self.tabela_inventario.setItem(linha, 6, QTableWidgetItem(dados_produto.get('codigoC', '')))
-        self.tabela_inventario.resizeRowToContents(linha)
+        # O saldo não muda com a edição; os restantes campos vêm da resposta do servidor
+        self.modelo.atualizar_linha(linha, {
+            'id_produto': dados_produto['id'],
+            'codigo': dados_produto['codigo'],
+            'nome': dados_produto['nome'],
+            'descricao': dados_produto['descricao'],
+            'preco': dados_produto['preco'],
+            'codigoB': dados_produto.get('codigoB', ''),
+            'codigoC': dados_produto.get('codigoC', ''),
+        })
+        signal_handler.catalogo_desatualizado.emit()
     def excluir_produto_selecionado(self):
-        linha_selecionada = self.tabela_inventario.currentRow()
+        linha_selecionada = self.tabela_inventario.currentIndex().row()
         if linha_selecionada < 0:
             QMessageBox.warning(self, "Seleção", "Por favor, selecione um produto para excluir.")
             return
-        item_id = self.tabela_inventario.item(linha_selecionada, 0)
-        produto_id = item_id.data(Qt.UserRole)
-        nome_produto = self.tabela_inventario.item(linha_selecionada, 1).text()
+        produto_id = self.modelo.valor(linha_selecionada, 'id_produto')
+        nome_produto = self.modelo.valor(linha_selecionada, 'nome')
         resposta = QMessageBox.question(self, "Confirmar Exclusão", f"Tem a certeza de que deseja excluir o produto '{nome_produto}'?", QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
         if resposta == QMessageBox.StandardButton.Yes:
-            global access_token
-            headers = {'Authorization': f'Bearer {access_token}'}
-            try:
-                response = requests.delete(f"{API_BASE_URL}/api/produtos/{produto_id}", headers=headers)
-                if response and response.status_code == 200:
-                    QMessageBox.information(self, "Sucesso", "Produto excluído com sucesso!")
-                    self.carregar_dados_inventario()
-                else:
-                    erro = response.json().get('erro', 'Erro desconhecido.')
-                    QMessageBox.warning(self, "Erro", f"Não foi possível excluir o produto: {erro}")
-            except requests.exceptions.RequestException:
-                show_connection_error_message(self)
+            self.executor.executar(pedido_json, api.delete, f"/api/produtos/{produto_id}",
+                                   ao_concluir=self.produto_excluido, ao_falhar=lambda erro: mostrar_erro_pedido(self, erro))
+    def produto_excluido(self, resposta):
+        response, dados = resposta
+        if response.status_code == 200:
+            QMessageBox.information(self, "Sucesso", "Produto excluído com sucesso!")
+            self.recarregar_apos_alteracao()
+        else:
+            erro = (dados or {}).get('erro', 'Erro desconhecido.')
+            QMessageBox.warning(self, "Erro", f"Não foi possível excluir o produto: {erro}")
     def gerar_etiquetas_selecionadas(self):
         selected_rows = self.tabela_inventario.selectionModel().selectedRows()
         if not selected_rows:
@@ -907,35 +1180,57 @@ class InventarioWidget(QWidget):
             return
         product_ids = []
         for index in selected_rows:
-            item = self.tabela_inventario.item(index.row(), 0)
-            if item and item.data(Qt.UserRole):
-                product_ids.append(item.data(Qt.UserRole))
+            produto_id = self.modelo.valor(index.row(), 'id_produto')
+            if produto_id:
+                product_ids.append(produto_id)
         if not product_ids:
             QMessageBox.warning(self, "Erro", "Não foi possível obter os IDs dos produtos selecionados.")
             return
+        self.btn_gerar_etiquetas.setEnabled(False)
+        self.executor.executar(pedido_json, api.get, "/api/etiquetas/layouts", timeout=5, chave='etiquetas',
+                               ao_concluir=lambda resposta: self.pedir_destino_etiquetas(product_ids, resposta),
+                               ao_falhar=lambda erro: self.pedir_destino_etiquetas(product_ids, None))
+    def pedir_destino_etiquetas(self, product_ids, resposta_layouts):
+        layout = self.escolher_layout_etiquetas(resposta_layouts)
+        if not layout:
+            self.btn_gerar_etiquetas.setEnabled(True)
+            return
         caminho_salvar, _ = QFileDialog.getSaveFileName(self, "Salvar Ficheiro de Etiquetas", "etiquetas.pdf", "Ficheiros PDF (*.pdf)")
         if not caminho_salvar:
+            self.btn_gerar_etiquetas.setEnabled(True)
             return
-        global access_token
-        headers = {'Authorization': f'Bearer {access_token}'}
-        dados = {'product_ids': product_ids}
-        try:
-            msg_box = QMessageBox(QMessageBox.Icon.Information, "Aguarde", "A gerar o ficheiro de etiquetas...", buttons=QMessageBox.StandardButton.NoButton, parent=self)
-            msg_box.show()
-            QApplication.processEvents()
-            response = requests.post(f"{API_BASE_URL}/api/produtos/etiquetas", headers=headers, json=dados, stream=True)
-            msg_box.close()
-            if response and response.status_code == 200:
-                with open(caminho_salvar, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        f.write(chunk)
-                QMessageBox.information(self, "Sucesso", f"Ficheiro de etiquetas salvo com sucesso em:\n{caminho_salvar}")
-            else:
-                erro = response.json().get('erro', 'Erro desconhecido.')
-                QMessageBox.warning(self, "Erro na API", f"Não foi possível gerar as etiquetas: {erro}")
-        except requests.exceptions.RequestException:
-            msg_box.close()
-            show_connection_error_message(self)
+        dados = {'product_ids': product_ids, 'layout': layout}
+        self.btn_gerar_etiquetas.setText("🖨️ A gerar etiquetas...")
+        self.executor.executar(descarregar_para_ficheiro, api.post, "/api/produtos/etiquetas", caminho_salvar, json=dados,
+                               com_controlo=True, chave='etiquetas',
+                               ao_concluir=lambda response: self.etiquetas_geradas(response, caminho_salvar),
+                               ao_falhar=self.falha_etiquetas)
+    def etiquetas_geradas(self, response, caminho_salvar):
+        self.btn_gerar_etiquetas.setText("🖨️ Gerar Etiquetas")
+        self.btn_gerar_etiquetas.setEnabled(True)
+        if response.status_code == 200:
+            QMessageBox.information(self, "Sucesso", f"Ficheiro de etiquetas salvo com sucesso em:\n{caminho_salvar}")
+        else:
+            erro = response.json().get('erro', 'Erro desconhecido.')
+            QMessageBox.warning(self, "Erro na API", f"Não foi possível gerar as etiquetas: {erro}")
+    def falha_etiquetas(self, erro):
+        self.btn_gerar_etiquetas.setText("🖨️ Gerar Etiquetas")
+        self.btn_gerar_etiquetas.setEnabled(True)
+        mostrar_erro_pedido(self, erro)
+    def escolher_layout_etiquetas(self, resposta_layouts):
+        """Pergunta o formato das etiquetas (etiqueta única ou folha A4); devolve None se o utilizador cancelar."""
+        layouts = []
+        if resposta_layouts is not None:
+            response, dados = resposta_layouts
+            if response.status_code == 200 and dados:
+                layouts = dados
+        if len(layouts) < 2:
+            return 'individual'
+        descricoes = [layout['descricao'] for layout in layouts]
+        escolha, ok = QInputDialog.getItem(self, "Formato das Etiquetas", "Escolha o formato:", descricoes, 0, False)
+        if not ok:
+            return None
+        return layouts[descricoes.index(escolha)]['id']
 
 class GestaoEstoqueWidget(QWidget):
     def __init__(self):
@@ -971,11 +1266,22 @@ class GestaoEstoqueWidget(QWidget):
         self.btn_ver_historico.setChecked(True)
         self.historico_view.carregar_historico()
 
+COLUNAS_HISTORICO = (
+    Coluna('data_hora', "Data/Hora", chave=chave_data_hora),
+    Coluna('produto_codigo', "Cód. Produto"),
+    Coluna('produto_nome', "Nome Produto"),
+    Coluna('tipo', "Tipo"),
+    Coluna('quantidade', "Qtd. Mov."),
+    Coluna('saldo_apos', "Saldo Após"),
+    Coluna('usuario_nome', "Usuário"),
+    Coluna('motivo_saida', "Motivo da Saída"),
+)
+
 class HistoricoWidget(QWidget):
     def __init__(self):
         super().__init__()
         self.layout = QVBoxLayout(self)
-        self.dados_completos = []
+        self.params_listagem = {}
         layout_filtros = QHBoxLayout()
         self.combo_tipo = QComboBox()
         self.combo_tipo.addItems(["Todas", "Entrada", "Saida"])
@@ -983,52 +1289,59 @@ class HistoricoWidget(QWidget):
         self.btn_recarregar = QPushButton("Recarregar Histórico")
         layout_filtros.addWidget(QLabel("Filtrar por tipo:"))
         layout_filtros.addWidget(self.combo_tipo)
-        layout_filtros.addStretch(1)
+        self.input_filtro = QLineEdit()
+        self.input_filtro.setPlaceholderText("Filtrar linhas carregadas (produto, usuário ou motivo)...")
+        layout_filtros.addWidget(self.input_filtro, 1)
         layout_filtros.addWidget(self.btn_recarregar)
-        self.tabela_historico = QTableWidget()
-        self.tabela_historico.setColumnCount(8)
-        self.tabela_historico.setHorizontalHeaderLabels(["Data/Hora", "Cód. Produto", "Nome Produto", "Tipo", "Qtd. Mov.", "Saldo Após", "Usuário", "Motivo da Saída"])
-        self.tabela_historico.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
-        self.tabela_historico.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
-        self.tabela_historico.setAlternatingRowColors(True)
+        self.modelo = ModeloTabelaColunar(COLUNAS_HISTORICO, parent=self)
+        self.tabela_historico = criar_tabela_virtual(self.modelo)
+        self.executor = ExecutorPedidos(self)
         self.layout.addLayout(layout_filtros)
+        self.layout.addWidget(IndicadorCarregamento(self.executor))
         self.layout.addWidget(self.tabela_historico)
         self.btn_recarregar.clicked.connect(self.carregar_historico)
         self.combo_tipo.currentIndexChanged.connect(self.carregar_historico)
+        self.input_filtro.textChanged.connect(self.filtrar_historico)
+        self.modelo.mais_linhas_pedidas.connect(self.carregar_mais_historico)
         self.carregar_historico()
     def carregar_historico(self):
-        global access_token
         data_fim = QDate.currentDate()
         data_inicio = data_fim.addDays(-90)
-        params = {'data_inicio': data_inicio.toString("yyyy-MM-dd"), 'data_fim': data_fim.toString("yyyy-MM-dd"), 'formato': 'json'}
+        params = {'data_inicio': data_inicio.toString("yyyy-MM-dd"), 'data_fim': data_fim.toString("yyyy-MM-dd"), 'formato': 'json',
+                  'shape': 'columns', 'limit': TAMANHO_PAGINA_TABELAS}
         filtro_tipo = self.combo_tipo.currentText()
         if filtro_tipo != "Todas":
             params['tipo'] = filtro_tipo
-        headers = {'Authorization': f'Bearer {access_token}'}
-        try:
-            response = requests.get(f"{API_BASE_URL}/api/relatorios/movimentacoes", headers=headers, params=params)
-            if response and response.status_code == 200:
-                self.dados_completos = response.json()
-                self.popular_tabela(self.dados_completos)
-            else:
-                mensagem = "Não foi possível carregar o histórico."
-                if response:
-                    mensagem += f"\n(Erro: {response.status_code})"
-                QMessageBox.warning(self, "Erro", mensagem)
-        except requests.exceptions.RequestException:
-            show_connection_error_message(self)
-    def popular_tabela(self, dados):
-        self.tabela_historico.setRowCount(0)
-        self.tabela_historico.setRowCount(len(dados))
-        for linha, mov in enumerate(dados):
-            self.tabela_historico.setItem(linha, 0, QTableWidgetItem(mov['data_hora']))
-            self.tabela_historico.setItem(linha, 1, QTableWidgetItem(mov['produto_codigo']))
-            self.tabela_historico.setItem(linha, 2, QTableWidgetItem(mov['produto_nome']))
-            self.tabela_historico.setItem(linha, 3, QTableWidgetItem(mov['tipo']))
-            self.tabela_historico.setItem(linha, 4, QTableWidgetItem(str(mov['quantidade'])))
-            self.tabela_historico.setItem(linha, 5, QTableWidgetItem(str(mov.get('saldo_apos', ''))))
-            self.tabela_historico.setItem(linha, 6, QTableWidgetItem(mov['usuario_nome']))
-            self.tabela_historico.setItem(linha, 7, QTableWidgetItem(mov.get('motivo_saida', '')))
+        self.params_listagem = params
+        # Mudar o filtro a meio de um carregamento substitui o pedido anterior
+        self.executor.executar(pedido_json, api.get, "/api/relatorios/movimentacoes", params=params, chave='historico',
+                               ao_concluir=self.historico_recebido, ao_falhar=lambda erro: mostrar_erro_pedido(self, erro))
+    def historico_recebido(self, resposta):
+        response, dados = resposta
+        if response.status_code == 200:
+            self.modelo.definir_dados(dados)
+        else:
+            mensagem = "Não foi possível carregar o histórico."
+            mensagem += f"\n(Erro: {response.status_code})"
+            QMessageBox.warning(self, "Erro", mensagem)
+    def carregar_mais_historico(self, cursor):
+        if self.executor.em_curso('historico'):
+            self.modelo.falha_carregamento()
+            return
+        self.executor.executar(pedido_json, api.get, "/api/relatorios/movimentacoes", params=dict(self.params_listagem, cursor=cursor),
+                               chave='historico', ao_concluir=self.pagina_historico_recebida, ao_falhar=self.falha_pagina_historico)
+    def pagina_historico_recebida(self, resposta):
+        response, dados = resposta
+        if response.status_code == 200:
+            self.modelo.acrescentar(dados)
+        else:
+            self.modelo.falha_carregamento()
+            QMessageBox.warning(self, "Erro", f"Não foi possível carregar mais movimentações.\n(Erro: {response.status_code})")
+    def falha_pagina_historico(self, erro):
+        self.modelo.falha_carregamento()
+        mostrar_erro_pedido(self, erro)
+    def filtrar_historico(self, texto):
+        self.modelo.filtrar(texto, ('produto_codigo', 'produto_nome', 'usuario_nome', 'motivo_saida'))
 
 class RelatoriosWidget(QWidget):
     def __init__(self):
@@ -1060,6 +1373,9 @@ class RelatoriosWidget(QWidget):
         self.combo_tipo_mov.addItems(["Todas", "Entrada", "Saida"])
         self.combo_tipo_mov.setStyleSheet("font-size: 16px; padding: 8px;")
         form_layout.addRow(self.label_tipo_mov, self.combo_tipo_mov)
+        self.check_apenas_resumo = QCheckBox("Apenas resumo (sem a listagem detalhada)")
+        self.check_apenas_resumo.setToolTip("Aplica-se apenas ao PDF.")
+        form_layout.addRow("", self.check_apenas_resumo)
         layout_botoes = QHBoxLayout()
         self.btn_gerar_pdf = QPushButton("Gerar PDF")
         self.btn_gerar_pdf.setObjectName("btnNegative")
@@ -1068,9 +1384,17 @@ class RelatoriosWidget(QWidget):
         layout_botoes.addStretch(1)
         layout_botoes.addWidget(self.btn_gerar_pdf)
         layout_botoes.addWidget(self.btn_gerar_excel)
+        self.barra_progresso = QProgressBar()
+        self.barra_progresso.setVisible(False)
+        self.label_progresso = QLabel("")
+        self.acompanhador = None
+        self.caminho_salvar = None
+        self.executor = ExecutorPedidos(self)
         self.layout.addWidget(titulo)
         self.layout.addLayout(form_layout)
         self.layout.addLayout(layout_botoes)
+        self.layout.addWidget(self.barra_progresso)
+        self.layout.addWidget(self.label_progresso)
         self.layout.addStretch(1)
         self.combo_tipo_relatorio.currentIndexChanged.connect(self.atualizar_visibilidade_filtros)
         self.btn_gerar_pdf.clicked.connect(lambda: self.gerar_relatorio('pdf'))
@@ -1088,13 +1412,15 @@ class RelatoriosWidget(QWidget):
     def gerar_relatorio(self, formato):
         relatorio_selecionado = self.combo_tipo_relatorio.currentText()
         params = {'formato': formato}
+        if formato == 'pdf' and self.check_apenas_resumo.isChecked():
+            params['resumo'] = 1
         endpoint = ""
         nome_arquivo_base = ""
         if relatorio_selecionado == "Inventário Atual":
-            endpoint = f"{API_BASE_URL}/api/relatorios/inventario"
+            endpoint = "/api/tarefas/relatorios/inventario"
             nome_arquivo_base = "relatorio_inventario"
         else:
-            endpoint = f"{API_BASE_URL}/api/relatorios/movimentacoes"
+            endpoint = "/api/tarefas/relatorios/movimentacoes"
             nome_arquivo_base = "relatorio_movimentacoes"
             params['data_inicio'] = self.input_data_inicio.date().toString("yyyy-MM-dd")
             params['data_fim'] = self.input_data_fim.date().toString("yyyy-MM-dd")
@@ -1105,19 +1431,60 @@ class RelatoriosWidget(QWidget):
         caminho_salvar, _ = QFileDialog.getSaveFileName(self, "Salvar Relatório", f"{nome_arquivo_base}{extensao}", f"Arquivos {formato.upper()} (*{extensao})")
         if not caminho_salvar:
             return
-        try:
-            global access_token
-            headers = {'Authorization': f'Bearer {access_token}'}
-            response = requests.get(endpoint, headers=headers, params=params, stream=True)
-            if response.status_code == 200:
-                with open(caminho_salvar, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        f.write(chunk)
-                QMessageBox.information(self, "Sucesso", f"Relatório salvo com sucesso em:\n{caminho_salvar}")
-            else:
-                QMessageBox.warning(self, "Erro", f"A API retornou um erro: {response.status_code}")
-        except requests.exceptions.RequestException:
-            show_connection_error_message(self)
+        # O relatório é gerado no servidor em segundo plano; o ficheiro é descarregado no fim
+        self.caminho_salvar = caminho_salvar
+        self.definir_em_geracao(True)
+        self.executor.executar(api.post, endpoint, params=params, timeout=10,
+                               ao_concluir=self.tarefa_criada, ao_falhar=self.falha_pedido)
+    def tarefa_criada(self, response):
+        if response.status_code == 202:
+            self.acompanhador = AcompanhadorTarefa(response.json()['id_tarefa'], self)
+            self.acompanhador.progresso.connect(self.atualizar_progresso)
+            self.acompanhador.concluida.connect(self.descarregar_relatorio)
+            self.acompanhador.falhou.connect(self.geracao_falhou)
+            self.acompanhador.iniciar()
+        else:
+            self.definir_em_geracao(False)
+            QMessageBox.warning(self, "Erro", f"A API retornou um erro: {response.status_code}")
+    def falha_pedido(self, erro):
+        self.definir_em_geracao(False)
+        mostrar_erro_pedido(self, erro)
+    def definir_em_geracao(self, em_geracao):
+        self.btn_gerar_pdf.setEnabled(not em_geracao)
+        self.btn_gerar_excel.setEnabled(not em_geracao)
+        self.barra_progresso.setRange(0, 100)
+        self.barra_progresso.setValue(0)
+        self.barra_progresso.setVisible(em_geracao)
+        self.label_progresso.setText("A gerar o relatório..." if em_geracao else "")
+        if not em_geracao and self.acompanhador:
+            self.acompanhador.deleteLater()
+            self.acompanhador = None
+    def atualizar_progresso(self, percentual, mensagem):
+        self.barra_progresso.setValue(percentual)
+        if mensagem:
+            self.label_progresso.setText(mensagem)
+    def descarregar_relatorio(self, estado):
+        self.label_progresso.setText("A descarregar o relatório...")
+        self.executor.executar(descarregar_para_ficheiro, api.get, f"/api/tarefas/{estado['id_tarefa']}/resultado",
+                               self.caminho_salvar, timeout=30, com_controlo=True,
+                               ao_concluir=self.relatorio_descarregado, ao_progresso=self.progresso_descarga,
+                               ao_falhar=self.falha_pedido)
+    def progresso_descarga(self, percentual, mensagem):
+        if percentual < 0:
+            self.barra_progresso.setRange(0, 0)  # Tamanho desconhecido: barra indeterminada
+        else:
+            self.barra_progresso.setRange(0, 100)
+            self.barra_progresso.setValue(percentual)
+        self.label_progresso.setText(f"A descarregar o relatório... {mensagem}")
+    def relatorio_descarregado(self, response):
+        self.definir_em_geracao(False)
+        if response.status_code == 200:
+            QMessageBox.information(self, "Sucesso", f"Relatório salvo com sucesso em:\n{self.caminho_salvar}")
+        else:
+            QMessageBox.warning(self, "Erro", f"A API retornou um erro: {response.status_code}")
+    def geracao_falhou(self, mensagem):
+        self.definir_em_geracao(False)
+        QMessageBox.warning(self, "Erro", f"Não foi possível gerar o relatório:\n{mensagem}")
 
 class FornecedoresWidget(QWidget):
     def __init__(self):
@@ -1147,23 +1514,21 @@ class FornecedoresWidget(QWidget):
         self.btn_adicionar.clicked.connect(self.abrir_formulario_adicionar)
         self.btn_editar.clicked.connect(self.abrir_formulario_editar)
         self.btn_excluir.clicked.connect(self.excluir_fornecedor_selecionado)
+        self.executor = ExecutorPedidos(self)
         self.carregar_fornecedores()
     def carregar_fornecedores(self):
-        global access_token
-        headers = {'Authorization': f'Bearer {access_token}'}
-        try:
-            response = requests.get(f"{API_BASE_URL}/api/fornecedores", headers=headers)
-            if response.status_code == 200:
-                fornecedores = response.json()
-                self.tabela_fornecedores.setRowCount(len(fornecedores))
-                for linha, forn in enumerate(fornecedores):
-                    item_nome = QTableWidgetItem(forn['nome'])
-                    item_nome.setData(Qt.UserRole, forn['id'])
-                    self.tabela_fornecedores.setItem(linha, 0, item_nome)
-            else:
-                QMessageBox.warning(self, "Erro", "Não foi possível carregar os fornecedores.")
-        except requests.exceptions.RequestException:
-            show_connection_error_message(self)
+        self.executor.executar(pedido_json, cache_condicional.get, "/api/fornecedores", chave='lista',
+                               ao_concluir=self.fornecedores_recebidos, ao_falhar=lambda erro: mostrar_erro_pedido(self, erro))
+    def fornecedores_recebidos(self, resposta):
+        response, fornecedores = resposta
+        if response.status_code == 200:
+            self.tabela_fornecedores.setRowCount(len(fornecedores))
+            for linha, forn in enumerate(fornecedores):
+                item_nome = QTableWidgetItem(forn['nome'])
+                item_nome.setData(Qt.UserRole, forn['id'])
+                self.tabela_fornecedores.setItem(linha, 0, item_nome)
+        else:
+            QMessageBox.warning(self, "Erro", "Não foi possível carregar os fornecedores.")
     def abrir_formulario_adicionar(self):
         dialog = FormularioFornecedorDialog(self)
         if dialog.exec():
@@ -1188,17 +1553,15 @@ class FornecedoresWidget(QWidget):
         nome_fornecedor = item.text()
         resposta = QMessageBox.question(self, "Confirmar Exclusão", f"Tem a certeza de que deseja excluir o fornecedor '{nome_fornecedor}'?", QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
         if resposta == QMessageBox.StandardButton.Yes:
-            global access_token
-            headers = {'Authorization': f'Bearer {access_token}'}
-            try:
-                response = requests.delete(f"{API_BASE_URL}/api/fornecedores/{fornecedor_id}", headers=headers)
-                if response.status_code == 200:
-                    QMessageBox.information(self, "Sucesso", "Fornecedor excluído com sucesso!")
-                    self.carregar_fornecedores()
-                else:
-                    QMessageBox.warning(self, "Erro", f"Não foi possível excluir: {response.json().get('erro')}")
-            except requests.exceptions.RequestException:
-                show_connection_error_message(self)
+            self.executor.executar(pedido_json, api.delete, f"/api/fornecedores/{fornecedor_id}",
+                                   ao_concluir=self.fornecedor_excluido, ao_falhar=lambda erro: mostrar_erro_pedido(self, erro))
+    def fornecedor_excluido(self, resposta):
+        response, dados = resposta
+        if response.status_code == 200:
+            QMessageBox.information(self, "Sucesso", "Fornecedor excluído com sucesso!")
+            self.carregar_fornecedores()
+        else:
+            QMessageBox.warning(self, "Erro", f"Não foi possível excluir: {(dados or {}).get('erro')}")
 
 class NaturezasWidget(QWidget):
     def __init__(self):
@@ -1228,23 +1591,21 @@ class NaturezasWidget(QWidget):
         self.btn_adicionar.clicked.connect(self.abrir_formulario_adicionar)
         self.btn_editar.clicked.connect(self.abrir_formulario_editar)
         self.btn_excluir.clicked.connect(self.excluir_natureza_selecionada)
+        self.executor = ExecutorPedidos(self)
         self.carregar_naturezas()
     def carregar_naturezas(self):
-        global access_token
-        headers = {'Authorization': f'Bearer {access_token}'}
-        try:
-            response = requests.get(f"{API_BASE_URL}/api/naturezas", headers=headers)
-            if response.status_code == 200:
-                naturezas = response.json()
-                self.tabela_naturezas.setRowCount(len(naturezas))
-                for linha, nat in enumerate(naturezas):
-                    item_nome = QTableWidgetItem(nat['nome'])
-                    item_nome.setData(Qt.UserRole, nat['id'])
-                    self.tabela_naturezas.setItem(linha, 0, item_nome)
-            else:
-                QMessageBox.warning(self, "Erro", "Não foi possível carregar as naturezas.")
-        except requests.exceptions.RequestException:
-            show_connection_error_message(self)
+        self.executor.executar(pedido_json, cache_condicional.get, "/api/naturezas", chave='lista',
+                               ao_concluir=self.naturezas_recebidas, ao_falhar=lambda erro: mostrar_erro_pedido(self, erro))
+    def naturezas_recebidas(self, resposta):
+        response, naturezas = resposta
+        if response.status_code == 200:
+            self.tabela_naturezas.setRowCount(len(naturezas))
+            for linha, nat in enumerate(naturezas):
+                item_nome = QTableWidgetItem(nat['nome'])
+                item_nome.setData(Qt.UserRole, nat['id'])
+                self.tabela_naturezas.setItem(linha, 0, item_nome)
+        else:
+            QMessageBox.warning(self, "Erro", "Não foi possível carregar as naturezas.")
     def abrir_formulario_adicionar(self):
         dialog = FormularioNaturezaDialog(self)
         if dialog.exec():
@@ -1269,17 +1630,148 @@ class NaturezasWidget(QWidget):
         nome_natureza = item.text()
         resposta = QMessageBox.question(self, "Confirmar Exclusão", f"Tem a certeza de que deseja excluir a natureza '{nome_natureza}'?", QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
         if resposta == QMessageBox.StandardButton.Yes:
-            global access_token
-            headers = {'Authorization': f'Bearer {access_token}'}
-            try:
-                response = requests.delete(f"{API_BASE_URL}/api/naturezas/{natureza_id}", headers=headers)
-                if response.status_code == 200:
-                    QMessageBox.information(self, "Sucesso", "Natureza excluída com sucesso!")
-                    self.carregar_naturezas()
-                else:
-                    QMessageBox.warning(self, "Erro", f"Não foi possível excluir: {response.json().get('erro')}")
-            except requests.exceptions.RequestException:
-                show_connection_error_message(self)
+            self.executor.executar(pedido_json, api.delete, f"/api/naturezas/{natureza_id}",
+                                   ao_concluir=self.natureza_excluida, ao_falhar=lambda erro: mostrar_erro_pedido(self, erro))
+    def natureza_excluida(self, resposta):
+        response, dados = resposta
+        if response.status_code == 200:
+            QMessageBox.information(self, "Sucesso", "Natureza excluída com sucesso!")
+            self.carregar_naturezas()
+        else:
+            QMessageBox.warning(self, "Erro", f"Não foi possível excluir: {(dados or {}).get('erro')}")
+
+class CarrinhoMovimentacoes(QWidget):
+    """
+    Carrinho do modo carrinho das entradas/saídas rápidas: junta várias linhas e regista-as
+    de uma só vez em /api/estoque/lote (uma receção de fornecedor, uma lista de picking).
+    """
+    lote_registado = Signal()
+    def __init__(self, tipo):
+        super().__init__()
+        self.tipo = tipo
+        self.linhas = []
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        colunas = ["Código", "Produto", "Quantidade"] + (["Motivo da Saída"] if tipo == 'Saida' else []) + ["Resultado"]
+        self.coluna_resultado = len(colunas) - 1
+        self.tabela = QTableWidget()
+        self.tabela.setColumnCount(len(colunas))
+        self.tabela.setHorizontalHeaderLabels(colunas)
+        self.tabela.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.tabela.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.tabela.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
+        self.check_parcial = QCheckBox("Registar apenas as linhas possíveis (as restantes ficam no carrinho)")
+        self.check_parcial.setVisible(tipo == 'Saida')
+        self.btn_remover = QPushButton("Remover Linha")
+        self.btn_remover.setObjectName("btnNeutral")
+        self.btn_limpar = QPushButton("Limpar Carrinho")
+        self.btn_limpar.setObjectName("btnNeutral")
+        self.btn_confirmar = QPushButton()
+        self.btn_confirmar.setObjectName("btnPositive" if tipo == 'Entrada' else "btnNegative")
+        layout_botoes = QHBoxLayout()
+        layout_botoes.addWidget(self.btn_remover)
+        layout_botoes.addWidget(self.btn_limpar)
+        layout_botoes.addStretch(1)
+        layout_botoes.addWidget(self.btn_confirmar)
+        layout.addWidget(self.tabela)
+        layout.addWidget(self.check_parcial)
+        layout.addLayout(layout_botoes)
+        self.btn_remover.clicked.connect(self.remover_linha)
+        self.btn_limpar.clicked.connect(self.limpar)
+        self.btn_confirmar.clicked.connect(self.confirmar)
+        self.executor = ExecutorPedidos(self)
+        self.enviadas = []
+        self.atualizar_tabela()
+    def adicionar(self, id_produto, codigo, nome, quantidade, motivo_saida=None):
+        # O mesmo produto (com o mesmo motivo) acumula na mesma linha
+        for linha in self.linhas:
+            if linha['id_produto'] == id_produto and linha.get('motivo_saida') == motivo_saida:
+                linha['quantidade'] += quantidade
+                linha.pop('erro', None)
+                break
+        else:
+            self.linhas.append({'id_produto': id_produto, 'codigo': codigo, 'nome': nome,
+                                'quantidade': quantidade, 'motivo_saida': motivo_saida})
+        self.atualizar_tabela()
+    def remover_linha(self):
+        indices = sorted({indice.row() for indice in self.tabela.selectedIndexes()}, reverse=True)
+        for indice in indices:
+            del self.linhas[indice]
+        self.atualizar_tabela()
+    def limpar(self):
+        if self.linhas and QMessageBox.question(self, "Limpar Carrinho", "Remover todas as linhas do carrinho?") == QMessageBox.StandardButton.Yes:
+            self.linhas = []
+            self.atualizar_tabela()
+    def atualizar_tabela(self):
+        # As linhas em envio aparecem primeiro, seguidas das lidas entretanto
+        todas = self.enviadas + self.linhas
+        self.tabela.setRowCount(len(todas))
+        for i, linha in enumerate(todas):
+            valores = [linha['codigo'], linha['nome'], str(linha['quantidade'])]
+            if self.tipo == 'Saida':
+                valores.append(linha['motivo_saida'])
+            valores.append(linha.get('erro', ''))
+            for coluna, valor in enumerate(valores):
+                item = QTableWidgetItem(valor)
+                if linha.get('erro'):
+                    item.setForeground(QColor("#dc3545"))
+                self.tabela.setItem(i, coluna, item)
+        total = sum(linha['quantidade'] for linha in todas)
+        acao = "Entradas" if self.tipo == 'Entrada' else "Saídas"
+        if self.enviadas:
+            self.btn_confirmar.setText(f"A registar {len(self.enviadas)} linhas...")
+        else:
+            self.btn_confirmar.setText(f"Registar {acao} ({len(self.linhas)} linhas, {total} un.)")
+        # Enquanto o lote está a ser registado, as linhas enviadas não podem ser alteradas
+        livre = bool(self.linhas) and not self.enviadas
+        self.btn_confirmar.setEnabled(livre)
+        self.btn_remover.setEnabled(livre)
+        self.btn_limpar.setEnabled(livre)
+    def confirmar(self):
+        if not self.linhas:
+            return
+        modo = 'melhor_esforco' if self.check_parcial.isChecked() else 'tudo_ou_nada'
+        dados = {'modo': modo, 'linhas': [
+            {'id_produto': l['id_produto'], 'tipo': self.tipo, 'quantidade': l['quantidade'], 'motivo_saida': l['motivo_saida']}
+            for l in self.linhas
+        ]}
+        # As leituras feitas durante o envio juntam-se ao carrinho como linhas novas
+        self.enviadas = self.linhas
+        self.linhas = []
+        self.atualizar_tabela()
+        self.executor.executar(pedido_json, api.post, "/api/estoque/lote", json=dados, timeout=60,
+                               ao_concluir=self.lote_respondido, ao_falhar=self.lote_falhou)
+    def lote_respondido(self, resposta):
+        response, corpo = resposta
+        enviadas, self.enviadas = self.enviadas, []
+        if corpo is None or 'resultados' not in corpo:
+            self.linhas = enviadas + self.linhas
+            self.atualizar_tabela()
+            if corpo is None:
+                QMessageBox.warning(self, "Erro", f"Resposta inválida do servidor (código {response.status_code}).")
+            else:
+                QMessageBox.warning(self, "Erro", f"Não foi possível registar o carrinho: {corpo.get('erro', 'Erro desconhecido.')}")
+            return
+        # As linhas aplicadas saem do carrinho; as recusadas ficam, com o motivo a vermelho
+        restantes = []
+        for linha, resultado in zip(enviadas, corpo['resultados']):
+            if resultado.get('aplicada'):
+                continue
+            linha['erro'] = resultado.get('erro', '')
+            restantes.append(linha)
+        self.linhas = restantes + self.linhas
+        self.atualizar_tabela()
+        if corpo.get('aplicadas'):
+            self.lote_registado.emit()
+            QMessageBox.information(self, "Sucesso", corpo.get('mensagem', 'Carrinho registado com sucesso!'))
+        else:
+            QMessageBox.warning(self, "Carrinho não registado",
+                                f"{corpo.get('erro', 'Erro desconhecido.')}\nCorrija ou remova as linhas assinaladas e tente novamente.")
+    def lote_falhou(self, erro):
+        self.linhas = self.enviadas + self.linhas
+        self.enviadas = []
+        self.atualizar_tabela()
+        mostrar_erro_pedido(self, erro)
 
 class EntradaRapidaWidget(QWidget):
     estoque_atualizado = Signal()
@@ -1287,6 +1779,7 @@ class EntradaRapidaWidget(QWidget):
         super().__init__()
         self.layout = QVBoxLayout(self)
         self.produto_encontrado_id = None
+        self.produto_encontrado_nome = ""
         self.titulo = QLabel("Entrada Rápida de Estoque")
         self.titulo.setStyleSheet("font-size: 24px; font-weight: bold; margin-bottom: 10px;")
         form_layout = QFormLayout()
@@ -1307,64 +1800,99 @@ class EntradaRapidaWidget(QWidget):
         form_layout.addRow("Quantidade a Adicionar:", self.input_quantidade)
         self.btn_registrar = QPushButton("Registar Entrada")
         self.btn_registrar.setObjectName("btnPositive")
+        self.check_carrinho = QCheckBox("Modo carrinho (juntar vários produtos e registar tudo de uma vez)")
+        self.carrinho = CarrinhoMovimentacoes('Entrada')
+        self.carrinho.setVisible(False)
         self.layout.addWidget(self.titulo)
+        self.layout.addWidget(self.check_carrinho)
         self.layout.addLayout(form_layout)
         self.layout.addWidget(self.btn_registrar, 0, Qt.AlignmentFlag.AlignRight)
+        self.layout.addWidget(self.carrinho, 1)
         self.layout.addStretch(1)
         self.btn_verificar.clicked.connect(self.verificar_produto)
         self.input_codigo.returnPressed.connect(self.verificar_produto) 
         self.btn_registrar.clicked.connect(self.registrar_entrada)
         self.input_quantidade.returnPressed.connect(self.btn_registrar.click)
+        self.check_carrinho.toggled.connect(self.alternar_modo_carrinho)
+        self.carrinho.lote_registado.connect(self.estoque_atualizado.emit)
+        self.executor = ExecutorPedidos(self)
         self.resetar_formulario()
+    def alternar_modo_carrinho(self, ativo):
+        self.carrinho.setVisible(ativo)
+        self.btn_registrar.setText("Adicionar ao Carrinho" if ativo else "Registar Entrada")
+        self.input_codigo.setFocus()
     def verificar_produto(self):
         codigo_produto = self.input_codigo.text().strip()
         if not codigo_produto:
             QMessageBox.warning(self, "Atenção", "O campo de código não pode estar vazio.")
             return
-        global access_token
-        headers = {'Authorization': f'Bearer {access_token}'}
-        try:
-            response = requests.get(f"{API_BASE_URL}/api/produtos/codigo/{codigo_produto}", headers=headers)
-            if response and response.status_code == 200:
-                dados_produto = response.json()
-                self.produto_encontrado_id = dados_produto['id']
-                nome = dados_produto['nome']
-                self.label_nome_produto.setText(f"{nome}")
-                self.label_nome_produto.setStyleSheet("font-size: 16px; font-weight: bold; color: #28a745;")
-                self.input_quantidade.setEnabled(True)
-                self.btn_registrar.setEnabled(True)
-                self.input_quantidade.setFocus()
-            else:
-                self.label_nome_produto.setText("Produto não encontrado!")
-                self.label_nome_produto.setStyleSheet("font-size: 16px; font-weight: bold; color: #dc3545;")
-                self.produto_encontrado_id = None
-                self.input_quantidade.clear()
-                self.input_quantidade.setEnabled(False)
-                self.btn_registrar.setEnabled(False)
-                self.input_codigo.selectAll()
-                self.input_codigo.setFocus()
-        except requests.exceptions.RequestException:
-            show_connection_error_message(self)
+        produto = catalogo_local.por_codigo(codigo_produto, apenas_principal=True)
+        if produto:
+            # Código conhecido no catálogo local: não é preciso perguntar ao servidor
+            self.executor.cancelar('produto')
+            self.mostrar_produto(produto['id_produto'], produto['nome'])
+            return
+        self.label_nome_produto.setText("A verificar...")
+        self.executor.executar(pedido_json, api.get, f"/api/produtos/codigo/{codigo_produto}", chave='produto',
+                               ao_concluir=self.produto_verificado, ao_falhar=self.falha_verificacao)
+    def produto_verificado(self, resposta):
+        response, dados_produto = resposta
+        if response.status_code == 200:
+            self.mostrar_produto(dados_produto['id'], dados_produto['nome'])
+        else:
+            self.label_nome_produto.setText("Produto não encontrado!")
+            self.label_nome_produto.setStyleSheet("font-size: 16px; font-weight: bold; color: #dc3545;")
+            self.produto_encontrado_id = None
+            self.input_quantidade.clear()
+            self.input_quantidade.setEnabled(False)
+            self.btn_registrar.setEnabled(False)
+            self.input_codigo.selectAll()
+            self.input_codigo.setFocus()
+    def mostrar_produto(self, id_produto, nome):
+        self.produto_encontrado_id = id_produto
+        self.produto_encontrado_nome = nome
+        self.label_nome_produto.setText(f"{nome}")
+        self.label_nome_produto.setStyleSheet("font-size: 16px; font-weight: bold; color: #28a745;")
+        self.input_quantidade.setEnabled(True)
+        self.btn_registrar.setEnabled(True)
+        self.input_quantidade.setFocus()
     def registrar_entrada(self):
         quantidade = self.input_quantidade.text()
         if not self.produto_encontrado_id or not quantidade or int(quantidade) <= 0:
             QMessageBox.warning(self, "Dados Inválidos", "Verifique o produto e insira uma quantidade válida maior que zero.")
             return
-        global access_token
-        headers = {'Authorization': f'Bearer {access_token}'}
-        dados = {"id_produto": self.produto_encontrado_id, "quantidade": int(quantidade)}
-        try:
-            response = requests.post(f"{API_BASE_URL}/api/estoque/entrada", headers=headers, json=dados)
-            if response and response.status_code == 201:
-                self.estoque_atualizado.emit()
-                QMessageBox.information(self, "Sucesso", "Entrada de estoque registada com sucesso!")
-                self.resetar_formulario()
-            else:
-                erro = response.json().get('erro', 'Erro desconhecido.')
-                QMessageBox.warning(self, "Erro", f"Não foi possível registar a entrada: {erro}")
-        except requests.exceptions.RequestException:
-            show_connection_error_message(self)
+        if self.check_carrinho.isChecked():
+            self.carrinho.adicionar(self.produto_encontrado_id, self.input_codigo.text().strip(),
+                                    self.produto_encontrado_nome, int(quantidade))
+            self.resetar_formulario()
+            return
+        self.btn_registrar.setEnabled(False)
+        # Sem ligação ao servidor a entrada fica na fila local e é enviada mais tarde
+        self.executor.executar(fila_movimentacoes.registar, api, self.produto_encontrado_id, 'Entrada', int(quantidade),
+                               codigo=self.input_codigo.text().strip(), nome=self.produto_encontrado_nome,
+                               ao_concluir=self.entrada_registada, ao_falhar=self.falha_registo)
+    def entrada_registada(self, resposta):
+        response, dados = resposta
+        if response is None:
+            avisar_movimentacao_em_fila(self, "A entrada")
+            self.resetar_formulario()
+        elif response.status_code == 201:
+            catalogo_local.atualizar_saldo(self.produto_encontrado_id, dados.get('novo_saldo'))
+            self.estoque_atualizado.emit()
+            QMessageBox.information(self, "Sucesso", "Entrada de estoque registada com sucesso!")
+            self.resetar_formulario()
+        else:
+            self.btn_registrar.setEnabled(True)
+            erro = (dados or {}).get('erro', 'Erro desconhecido.')
+            QMessageBox.warning(self, "Erro", f"Não foi possível registar a entrada: {erro}")
+    def falha_verificacao(self, erro):
+        self.label_nome_produto.setText("Aguardando verificação...")
+        mostrar_erro_pedido(self, erro)
+    def falha_registo(self, erro):
+        self.btn_registrar.setEnabled(True)
+        mostrar_erro_pedido(self, erro)
     def resetar_formulario(self):
+        self.executor.cancelar('produto')
         self.produto_encontrado_id = None
         self.input_codigo.clear()
         self.input_quantidade.clear()
@@ -1380,6 +1908,7 @@ class SaidaRapidaWidget(QWidget):
         super().__init__()
         self.layout = QVBoxLayout(self)
         self.produto_encontrado_id = None
+        self.produto_encontrado_nome = ""
         self.titulo = QLabel("Saída Rápida de Estoque")
         self.titulo.setStyleSheet("font-size: 24px; font-weight: bold; margin-bottom: 10px;")
         self.input_codigo = QLineEdit()
@@ -1403,44 +1932,63 @@ class SaidaRapidaWidget(QWidget):
         form_layout.addRow("Produto Encontrado:", self.label_nome_produto)
         form_layout.addRow("Quantidade a Retirar:", self.input_quantidade)
         form_layout.addRow("Motivo da Saída:", self.input_motivo)
+        self.check_carrinho = QCheckBox("Modo carrinho (lista de picking: juntar vários produtos e registar tudo de uma vez)")
+        self.carrinho = CarrinhoMovimentacoes('Saida')
+        self.carrinho.setVisible(False)
         self.layout.addWidget(self.titulo)
+        self.layout.addWidget(self.check_carrinho)
         self.layout.addLayout(form_layout)
         self.layout.addWidget(self.btn_registrar, 0, Qt.AlignmentFlag.AlignRight)
+        self.layout.addWidget(self.carrinho, 1)
         self.layout.addStretch(1)
         self.btn_verificar.clicked.connect(self.verificar_produto)
         self.input_codigo.returnPressed.connect(self.verificar_produto)
         self.btn_registrar.clicked.connect(self.registrar_saida)
         self.input_motivo.returnPressed.connect(self.btn_registrar.click)
+        self.check_carrinho.toggled.connect(self.alternar_modo_carrinho)
+        self.carrinho.lote_registado.connect(self.estoque_atualizado.emit)
+        self.executor = ExecutorPedidos(self)
         self.resetar_formulario()
+    def alternar_modo_carrinho(self, ativo):
+        self.carrinho.setVisible(ativo)
+        self.btn_registrar.setText("Adicionar ao Carrinho" if ativo else "Registar Saída")
+        self.input_codigo.setFocus()
     def verificar_produto(self):
         codigo_produto = self.input_codigo.text().strip()
         if not codigo_produto: return
-        global access_token
-        headers = {'Authorization': f'Bearer {access_token}'}
-        try:
-            response = requests.get(f"{API_BASE_URL}/api/produtos/codigo/{codigo_produto}", headers=headers)
-            if response and response.status_code == 200:
-                dados_produto = response.json()
-                self.produto_encontrado_id = dados_produto['id']
-                self.label_nome_produto.setText(dados_produto['nome'])
-                self.label_nome_produto.setStyleSheet("font-size: 16px; font-weight: bold; color: #28a745;")
-                self.input_quantidade.setEnabled(True)
-                self.input_motivo.setEnabled(True)
-                self.btn_registrar.setEnabled(True)
-                self.input_quantidade.setFocus()
-            else:
-                self.label_nome_produto.setText("Produto não encontrado!")
-                self.label_nome_produto.setStyleSheet("font-size: 16px; font-weight: bold; color: #dc3545;")
-                self.produto_encontrado_id = None
-                self.input_quantidade.clear()
-                self.input_motivo.clear()
-                self.input_quantidade.setEnabled(False)
-                self.input_motivo.setEnabled(False)
-                self.btn_registrar.setEnabled(False)
-                self.input_codigo.selectAll()
-                self.input_codigo.setFocus()
-        except requests.exceptions.RequestException:
-            show_connection_error_message(self)
+        produto = catalogo_local.por_codigo(codigo_produto, apenas_principal=True)
+        if produto:
+            # Código conhecido no catálogo local: não é preciso perguntar ao servidor
+            self.executor.cancelar('produto')
+            self.mostrar_produto(produto['id_produto'], produto['nome'])
+            return
+        self.label_nome_produto.setText("A verificar...")
+        self.executor.executar(pedido_json, api.get, f"/api/produtos/codigo/{codigo_produto}", chave='produto',
+                               ao_concluir=self.produto_verificado, ao_falhar=self.falha_verificacao)
+    def produto_verificado(self, resposta):
+        response, dados_produto = resposta
+        if response.status_code == 200:
+            self.mostrar_produto(dados_produto['id'], dados_produto['nome'])
+        else:
+            self.label_nome_produto.setText("Produto não encontrado!")
+            self.label_nome_produto.setStyleSheet("font-size: 16px; font-weight: bold; color: #dc3545;")
+            self.produto_encontrado_id = None
+            self.input_quantidade.clear()
+            self.input_motivo.clear()
+            self.input_quantidade.setEnabled(False)
+            self.input_motivo.setEnabled(False)
+            self.btn_registrar.setEnabled(False)
+            self.input_codigo.selectAll()
+            self.input_codigo.setFocus()
+    def mostrar_produto(self, id_produto, nome):
+        self.produto_encontrado_id = id_produto
+        self.produto_encontrado_nome = nome
+        self.label_nome_produto.setText(nome)
+        self.label_nome_produto.setStyleSheet("font-size: 16px; font-weight: bold; color: #28a745;")
+        self.input_quantidade.setEnabled(True)
+        self.input_motivo.setEnabled(True)
+        self.btn_registrar.setEnabled(True)
+        self.input_quantidade.setFocus()
     def registrar_saida(self):
         quantidade = self.input_quantidade.text()
         motivo = self.input_motivo.text().strip()
@@ -1450,21 +1998,40 @@ class SaidaRapidaWidget(QWidget):
         if not motivo:
             QMessageBox.warning(self, "Dados Inválidos", "O campo 'Motivo da Saída' é obrigatório.")
             return
-        global access_token
-        headers = {'Authorization': f'Bearer {access_token}'}
-        dados = {"id_produto": self.produto_encontrado_id, "quantidade": int(quantidade), "motivo_saida": motivo}
-        try:
-            response = requests.post(f"{API_BASE_URL}/api/estoque/saida", headers=headers, json=dados)
-            if response and response.status_code == 201:
-                self.estoque_atualizado.emit()
-                QMessageBox.information(self, "Sucesso", "Saída de estoque registada com sucesso!")
-                self.resetar_formulario()
-            else:
-                erro = response.json().get('erro', 'Erro desconhecido.')
-                QMessageBox.warning(self, "Erro", f"Não foi possível registar a saída: {erro}")
-        except requests.exceptions.RequestException:
-            show_connection_error_message(self)
+        if self.check_carrinho.isChecked():
+            self.carrinho.adicionar(self.produto_encontrado_id, self.input_codigo.text().strip(),
+                                    self.produto_encontrado_nome, int(quantidade), motivo)
+            self.resetar_formulario()
+            # Numa lista de picking o motivo costuma ser o mesmo para todas as linhas
+            self.input_motivo.setText(motivo)
+            return
+        self.btn_registrar.setEnabled(False)
+        # Sem ligação ao servidor a saída fica na fila local e é enviada mais tarde
+        self.executor.executar(fila_movimentacoes.registar, api, self.produto_encontrado_id, 'Saida', int(quantidade), motivo,
+                               codigo=self.input_codigo.text().strip(), nome=self.produto_encontrado_nome,
+                               ao_concluir=self.saida_registada, ao_falhar=self.falha_registo)
+    def saida_registada(self, resposta):
+        response, dados = resposta
+        if response is None:
+            avisar_movimentacao_em_fila(self, "A saída")
+            self.resetar_formulario()
+        elif response.status_code == 201:
+            catalogo_local.atualizar_saldo(self.produto_encontrado_id, dados.get('novo_saldo'))
+            self.estoque_atualizado.emit()
+            QMessageBox.information(self, "Sucesso", "Saída de estoque registada com sucesso!")
+            self.resetar_formulario()
+        else:
+            self.btn_registrar.setEnabled(True)
+            erro = (dados or {}).get('erro', 'Erro desconhecido.')
+            QMessageBox.warning(self, "Erro", f"Não foi possível registar a saída: {erro}")
+    def falha_verificacao(self, erro):
+        self.label_nome_produto.setText("Aguardando verificação...")
+        mostrar_erro_pedido(self, erro)
+    def falha_registo(self, erro):
+        self.btn_registrar.setEnabled(True)
+        mostrar_erro_pedido(self, erro)
     def resetar_formulario(self):
+        self.executor.cancelar('produto')
         self.produto_encontrado_id = None
         self.input_codigo.clear()
         self.input_quantidade.clear()
@@ -1506,27 +2073,25 @@ class UsuariosWidget(QWidget):
         self.btn_adicionar.clicked.connect(self.abrir_formulario_adicionar)
         self.btn_editar.clicked.connect(self.abrir_formulario_editar)
         self.btn_desativar.clicked.connect(self.desativar_usuario_selecionado)
+        self.executor = ExecutorPedidos(self)
         self.carregar_usuarios()
     def carregar_usuarios(self):
-        global access_token
-        headers = {'Authorization': f'Bearer {access_token}'}
-        try:
-            response = requests.get(f"{API_BASE_URL}/api/usuarios", headers=headers)
-            if response.status_code == 200:
-                usuarios = response.json()
-                self.tabela_usuarios.setRowCount(len(usuarios))
-                for linha, user in enumerate(usuarios):
-                    item_nome = QTableWidgetItem(user['nome'])
-                    item_nome.setData(Qt.UserRole, user['id'])
-                    status = "Ativo" if user['ativo'] else "Inativo"
-                    self.tabela_usuarios.setItem(linha, 0, item_nome)
-                    self.tabela_usuarios.setItem(linha, 1, QTableWidgetItem(user['login']))
-                    self.tabela_usuarios.setItem(linha, 2, QTableWidgetItem(user['permissao']))
-                    self.tabela_usuarios.setItem(linha, 3, QTableWidgetItem(status))
-            else:
-                QMessageBox.warning(self, "Erro", "Não foi possível carregar os usuários.")
-        except requests.exceptions.RequestException:
-            show_connection_error_message(self)
+        self.executor.executar(pedido_json, api.get, "/api/usuarios", chave='lista',
+                               ao_concluir=self.usuarios_recebidos, ao_falhar=lambda erro: mostrar_erro_pedido(self, erro))
+    def usuarios_recebidos(self, resposta):
+        response, usuarios = resposta
+        if response.status_code == 200:
+            self.tabela_usuarios.setRowCount(len(usuarios))
+            for linha, user in enumerate(usuarios):
+                item_nome = QTableWidgetItem(user['nome'])
+                item_nome.setData(Qt.UserRole, user['id'])
+                status = "Ativo" if user['ativo'] else "Inativo"
+                self.tabela_usuarios.setItem(linha, 0, item_nome)
+                self.tabela_usuarios.setItem(linha, 1, QTableWidgetItem(user['login']))
+                self.tabela_usuarios.setItem(linha, 2, QTableWidgetItem(user['permissao']))
+                self.tabela_usuarios.setItem(linha, 3, QTableWidgetItem(status))
+        else:
+            QMessageBox.warning(self, "Erro", "Não foi possível carregar os usuários.")
     def abrir_formulario_adicionar(self):
         dialog = FormularioUsuarioDialog(self)
         if dialog.exec():
@@ -1553,24 +2118,20 @@ class UsuariosWidget(QWidget):
         acao = "desativar" if status_atual == "Ativo" else "reativar"
         resposta = QMessageBox.question(self, f"Confirmar Ação", f"Tem certeza que deseja {acao} o usuário '{nome_usuario}'?", QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
         if resposta == QMessageBox.StandardButton.Yes:
-            global access_token
-            headers = {'Authorization': f'Bearer {access_token}'}
-            try:
-                response = requests.delete(f"{API_BASE_URL}/api/usuarios/{usuario_id}", headers=headers)
-                if response.status_code == 200:
-                    QMessageBox.information(self, "Sucesso", response.json()['mensagem'])
-                    self.carregar_usuarios()
-                else:
-                    mensagem_erro = f"O servidor retornou um erro: {response.status_code}."
-                    try:
-                        detalhe_erro = response.json().get('erro')
-                        if detalhe_erro:
-                            mensagem_erro += f"\nDetalhe: {detalhe_erro}"
-                    except requests.exceptions.JSONDecodeError:
-                        mensagem_erro += f"\nResposta: {response.text}"
-                    QMessageBox.warning(self, "Erro", mensagem_erro)
-            except requests.exceptions.RequestException:
-                show_connection_error_message(self)
+            self.executor.executar(pedido_json, api.delete, f"/api/usuarios/{usuario_id}",
+                                   ao_concluir=self.usuario_alterado, ao_falhar=lambda erro: mostrar_erro_pedido(self, erro))
+    def usuario_alterado(self, resposta):
+        response, dados = resposta
+        if response.status_code == 200:
+            QMessageBox.information(self, "Sucesso", dados['mensagem'])
+            self.carregar_usuarios()
+        else:
+            mensagem_erro = f"O servidor retornou um erro: {response.status_code}."
+            if dados is None:
+                mensagem_erro += f"\nResposta: {response.text}"
+            elif dados.get('erro'):
+                mensagem_erro += f"\nDetalhe: {dados['erro']}"
+            QMessageBox.warning(self, "Erro", mensagem_erro)
 
 class TerminalWidget(QWidget):
     def __init__(self):
@@ -1584,6 +2145,8 @@ class TerminalWidget(QWidget):
         self.barcode_timer.setInterval(200)
         self.barcode_timer.timeout.connect(self.processar_codigo)
         self.produto_atual = None
+        self.ultima_latencia_ms = None
+        self.executor = ExecutorPedidos(self)
         main_panel = QFrame()
         main_panel.setObjectName("terminalMainPanel")
         main_panel_layout = QVBoxLayout(main_panel)
@@ -1636,23 +2199,50 @@ class TerminalWidget(QWidget):
         self.barcode_buffer = ""
         if not codigo:
             return
+        inicio = time.perf_counter()
+        produto = catalogo_local.por_codigo(codigo)
+        if produto:
+            # Código conhecido no catálogo local: o produto aparece logo, sem esperar pela rede.
+            # O saldo local pode estar um ciclo de sincronização atrasado, por isso é confirmado em segundo plano.
+            self.produto_atual = produto
+            self.atualizar_display()
+            self.registrar_latencia(codigo, inicio)
+            self.executor.executar(pedido_json, api.get, f"/api/produtos/lookup/{quote(codigo, safe='')}", timeout=5, chave='leitura',
+                                   ao_concluir=lambda resposta: self.leitura_confirmada(resposta, produto['id_produto']))
+            return
         self.label_nome.setText("A procurar...")
-        QApplication.processEvents()
-        global access_token
-        headers = {'Authorization': f'Bearer {access_token}'}
-        try:
-            response = requests.get(f"{API_BASE_URL}/api/estoque/saldos?search={codigo}", headers=headers)
-            if response and response.status_code == 200:
-                resultados = response.json()
-                if resultados:
-                    self.produto_atual = resultados[0]
-                    self.atualizar_display()
-                else:
-                    self.produto_nao_encontrado()
-            else:
-                self.produto_nao_encontrado()
-        except requests.exceptions.RequestException:
-            self.produto_nao_encontrado("Erro de conexão.")
+        # Pesquisa exata por Codigo, CodigoB ou CodigoC (já traz o saldo).
+        # Uma leitura nova substitui a anterior, se esta ainda não tiver resposta.
+        self.executor.executar(pedido_json, api.get, f"/api/produtos/lookup/{quote(codigo, safe='')}", timeout=5, chave='leitura',
+                               ao_concluir=lambda resposta: self.leitura_recebida(resposta, codigo, inicio),
+                               ao_falhar=lambda erro: self.leitura_falhou(codigo, inicio))
+    def leitura_recebida(self, resposta, codigo, inicio):
+        response, dados = resposta
+        if response.status_code == 200:
+            self.produto_atual = dados
+            self.atualizar_display()
+        else:
+            self.produto_nao_encontrado()
+        self.registrar_latencia(codigo, inicio)
+    def leitura_confirmada(self, resposta, id_produto):
+        response, dados = resposta
+        if response.status_code != 200 or not self.produto_atual or self.produto_atual['id_produto'] != id_produto:
+            return
+        campos_mostrados = ('nome', 'saldo_atual', 'descricao', 'codigo')
+        if any(dados.get(campo) != self.produto_atual.get(campo) for campo in campos_mostrados):
+            self.produto_atual = dados
+            self.atualizar_display()
+            catalogo_local.atualizar_produto(dados)
+    def leitura_falhou(self, codigo, inicio):
+        self.produto_nao_encontrado("Erro de conexão.")
+        self.registrar_latencia(codigo, inicio)
+    def registrar_latencia(self, codigo, inicio):
+        """Mede o tempo entre a leitura e o ecrã atualizado, e avisa quando passa do orçamento."""
+        self.ultima_latencia_ms = (time.perf_counter() - inicio) * 1000
+        self.label_codigo.setToolTip(f"Leitura processada em {self.ultima_latencia_ms:.0f} ms")
+        if self.ultima_latencia_ms > ORCAMENTO_LEITURA_MS:
+            print(f"AVISO: leitura do código '{codigo}' demorou {self.ultima_latencia_ms:.0f} ms "
+                  f"(orçamento: {ORCAMENTO_LEITURA_MS} ms).")
     def atualizar_display(self):
         self.label_nome.setText(self.produto_atual.get('nome', 'N/A'))
         self.label_qtd_valor.setText(str(self.produto_atual.get('saldo_atual', '--')))
@@ -1822,9 +2412,21 @@ class JanelaPrincipal(QMainWindow):
             self.tela_dashboard.ir_para_entrada_rapida.connect(self.mostrar_tela_entrada_rapida)
             self.tela_dashboard.ir_para_saida_rapida.connect(self.mostrar_tela_saida_rapida)
             self.tela_dashboard.ir_para_terminal.connect(self.mostrar_tela_terminal) 
-            self.tela_entrada_rapida.estoque_atualizado.connect(self.tela_gestao_estoque.inventario_view.carregar_dados_inventario)
-            self.tela_saida_rapida.estoque_atualizado.connect(self.tela_gestao_estoque.inventario_view.carregar_dados_inventario)
-            self.tela_importacao.produtos_importados_sucesso.connect(self.tela_gestao_estoque.inventario_view.carregar_dados_inventario)
+            inventario = self.tela_gestao_estoque.inventario_view
+            self.tela_entrada_rapida.estoque_atualizado.connect(inventario.recarregar_apos_alteracao)
+            self.tela_saida_rapida.estoque_atualizado.connect(inventario.recarregar_apos_alteracao)
+            self.tela_importacao.produtos_importados_sucesso.connect(inventario.recarregar_apos_alteracao)
+            self.sincronizacao_catalogo = SincronizacaoCatalogo(self)
+            self.sincronizacao_catalogo.catalogo_atualizado.connect(inventario.atualizar_se_visivel)
+            signal_handler.catalogo_desatualizado.connect(self.sincronizacao_catalogo.sincronizar_agora)
+            self.envio_fila = EnvioFilaMovimentacoes(self)
+            self.label_fila = QLabel()
+            self.label_fila.hide()
+            self.statusBar().addPermanentWidget(self.label_fila)
+            self.envio_fila.fila_alterada.connect(self.mostrar_estado_fila)
+            self.envio_fila.movimentacoes_enviadas.connect(lambda enviadas: inventario.recarregar_apos_alteracao())
+            self.envio_fila.movimentacoes_recusadas.connect(self.mostrar_movimentacoes_recusadas)
+            signal_handler.movimentacoes_em_fila.connect(self.envio_fila.enviar_agora)
             signal_handler.fornecedores_atualizados.connect(self.tela_fornecedores.carregar_fornecedores)
             signal_handler.naturezas_atualizadas.connect(self.tela_naturezas.carregar_naturezas)
             self.statusBar().showMessage("Pronto.")
@@ -1839,6 +2441,9 @@ class JanelaPrincipal(QMainWindow):
         nome_usuario = self.dados_usuario.get('nome', 'N/A')
         permissao_usuario = self.dados_usuario.get('permissao', 'N/A')
         self.statusBar().showMessage(f"Usuário: {nome_usuario} | Permissão: {permissao_usuario}")
+        self.sincronizacao_catalogo.iniciar()
+        fila_movimentacoes.definir_usuario(self.dados_usuario.get('id'))
+        self.envio_fila.iniciar()
         if self.dados_usuario.get('permissao') == 'Administrador':
             if self.tela_usuarios is None:
                 self.tela_usuarios = UsuariosWidget()
@@ -1848,6 +2453,16 @@ class JanelaPrincipal(QMainWindow):
             self.menu_cadastros.addAction(self.acao_usuarios)
         else:
             self.btn_usuarios.hide()
+    def mostrar_estado_fila(self, por_enviar):
+        self.label_fila.setText(f"⏳ {por_enviar} movimentação(ões) por enviar")
+        self.label_fila.setVisible(por_enviar > 0)
+    def mostrar_movimentacoes_recusadas(self, recusadas):
+        linhas = [f"• {m['tipo']} de {m['quantidade']} — {m['codigo'] or m['id_produto']} {m['nome'] or ''}: {m['erro']}"
+                  for m in recusadas]
+        QMessageBox.warning(self, "Movimentações Recusadas",
+                            "As seguintes movimentações, registadas sem ligação ao servidor, foram recusadas "
+                            "e não foram gravadas:\n\n" + "\n".join(linhas))
+        fila_movimentacoes.descartar([m['chave'] for m in recusadas])
     def mostrar_tela_usuarios(self):
         if self.tela_usuarios:
             self.stacked_widget.setCurrentWidget(self.tela_usuarios)
@@ -2046,6 +2661,7 @@ class DashboardWidget(QWidget):
         self.btn_atalho_entrada.clicked.connect(self.ir_para_entrada_rapida.emit)
         self.btn_atalho_saida.clicked.connect(self.ir_para_saida_rapida.emit)
         self.btn_atalho_terminal.clicked.connect(self.ir_para_terminal.emit)
+        self.executor = ExecutorPedidos(self)
     def atualizar_mensagem_boas_vindas(self, nome_utilizador):
         primeiro_nome = nome_utilizador.split(" ")[0]
         curiosidade = random.choice(self.lista_curiosidades)
@@ -2055,18 +2671,15 @@ class DashboardWidget(QWidget):
         self.atualizar_mensagem_boas_vindas(nome_utilizador)
         self.carregar_kpis()
     def carregar_kpis(self):
-        global access_token
-        headers = {'Authorization': f'Bearer {access_token}'}
-        try:
-            response = requests.get(f"{API_BASE_URL}/api/dashboard/kpis", headers=headers, timeout=5)
-            if response and response.status_code == 200:
-                dados = response.json()
-                self.card_produtos.set_valor(dados.get('total_produtos', 0))
-                self.card_fornecedores.set_valor(dados.get('total_fornecedores', 0))
-                valor_formatado = f"R$ {dados.get('valor_total_estoque', 0):.2f}".replace('.', ',')
-                self.card_valor_estoque.set_valor(valor_formatado)
-        except requests.exceptions.RequestException:
-            show_connection_error_message(self)
+        self.executor.executar(pedido_json, api.get, "/api/dashboard/kpis", timeout=5, chave='kpis',
+                               ao_concluir=self.kpis_recebidos, ao_falhar=lambda erro: mostrar_erro_pedido(self, erro))
+    def kpis_recebidos(self, resposta):
+        response, dados = resposta
+        if response.status_code == 200:
+            self.card_produtos.set_valor(dados.get('total_produtos', 0))
+            self.card_fornecedores.set_valor(dados.get('total_fornecedores', 0))
+            valor_formatado = f"R$ {dados.get('valor_total_estoque', 0):.2f}".replace('.', ',')
+            self.card_valor_estoque.set_valor(valor_formatado)
 
 # ==============================================================================
 # 6. CLASSE DA JANELA DE LOGIN
@@ -2076,6 +2689,7 @@ class AppManager:
     def __init__(self):
         self.login_window = None
         self.main_window = None
+        self.executor = ExecutorPedidos()
     def start(self):
         self.show_login_window()
     def show_login_window(self):
@@ -2089,12 +2703,29 @@ class AppManager:
         self.main_window.mostrar_tela_dashboard()
         self.main_window.logoff_requested.connect(self.handle_logoff)
         self.login_window.close()
-        check_for_updates()
+        check_for_updates(self.executor)
     def handle_logoff(self):
         if self.main_window:
+            # Respostas que ainda cheguem já não devem atualizar (nem abrir mensagens sobre) a janela fechada
+            self.main_window.sincronizacao_catalogo.parar()
+            signal_handler.catalogo_desatualizado.disconnect(self.main_window.sincronizacao_catalogo.sincronizar_agora)
+            self.main_window.envio_fila.parar()
+            signal_handler.movimentacoes_em_fila.disconnect(self.main_window.envio_fila.enviar_agora)
+            for executor in self.main_window.findChildren(ExecutorPedidos):
+                executor.cancelar_todos()
             self.main_window.close()
         self.show_login_window()
 
+def autenticar(dados):
+    """Corre em segundo plano: login e dados do utilizador. Devolve (response do login, token ou None, dados do utilizador)."""
+    response = api.post("/api/login", json=dados, timeout=10)
+    if response.status_code != 200:
+        return response, None, None
+    token = response.json()['access_token']
+    response_me = api.get("/api/usuario/me", headers={'Authorization': f'Bearer {token}'})
+    dados_usuario_logado = response_me.json() if response_me.status_code == 200 else {'nome': 'Desconhecido', 'permissao': 'Usuario'}
+    return response, token, dados_usuario_logado
+
 class JanelaLogin(QMainWindow):
     """Uma tela de login profissional em ecrã completo, inspirada no design moderno."""
     login_successful = Signal(dict)
@@ -2177,6 +2808,7 @@ class JanelaLogin(QMainWindow):
         # Conexões
         self.botao_login.clicked.connect(self.fazer_login)
         self.input_senha.returnPressed.connect(self.botao_login.click)
+        self.executor = ExecutorPedidos(self)
 
     def showEvent(self, event):
         """Mostra a janela maximizada quando ela é exibida."""
@@ -2184,7 +2816,6 @@ class JanelaLogin(QMainWindow):
         super().showEvent(event)
 
     def fazer_login(self):
-        global access_token
         login = self.input_login.text()
         senha = self.input_senha.text()
 
@@ -2192,28 +2823,32 @@ class JanelaLogin(QMainWindow):
             QMessageBox.warning(self, "Erro de Entrada", "Os campos de login e senha não podem estar vazios.")
             return
 
-        url = f"{API_BASE_URL}/api/login"
         dados = {"login": login, "senha": senha}
+        self.definir_a_entrar(True)
+        self.executor.executar(autenticar, dados, ao_concluir=self.login_respondido, ao_falhar=self.login_falhou)
 
-        try:
-            response = requests.post(url, json=dados, timeout=10)
-            if response and response.status_code == 200:
-                access_token = response.json()['access_token']
-                print("Login bem-sucedido! Token guardado.")
-                
-                headers = {'Authorization': f'Bearer {access_token}'}
-                url_me = f"{API_BASE_URL}/api/usuario/me"
-                response_me = requests.get(url_me, headers=headers)
-                
-                dados_usuario_logado = response_me.json() if response_me.status_code == 200 else {'nome': 'Desconhecido', 'permissao': 'Usuario'}
-                
-                self.login_successful.emit(dados_usuario_logado)
-                self.close()
-            else:
+    def definir_a_entrar(self, a_entrar):
+        self.botao_login.setEnabled(not a_entrar)
+        self.botao_login.setText("A entrar..." if a_entrar else "Entrar")
+
+    def login_respondido(self, resultado):
+        self.definir_a_entrar(False)
+        response, token, dados_usuario_logado = resultado
+        if token:
+            api.definir_token(token)
+            print("Login bem-sucedido! Token guardado.")
+            self.login_successful.emit(dados_usuario_logado)
+            self.close()
+        else:
+            try:
                 erro_msg = response.json().get('erro', 'Credenciais inválidas.')
-                QMessageBox.warning(self, "Falha no Login", erro_msg)
-        except requests.exceptions.RequestException:
-            show_connection_error_message(self)
+            except ValueError:
+                erro_msg = 'Credenciais inválidas.'
+            QMessageBox.warning(self, "Falha no Login", erro_msg)
+
+    def login_falhou(self, erro):
+        self.definir_a_entrar(False)
+        mostrar_erro_pedido(self, erro)
 
 
 # ==============================================================================
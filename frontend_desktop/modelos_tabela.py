@@ -0,0 +1,211 @@
+# ficheiro: modelos_tabela.py
+# Modelos das tabelas grandes do cliente desktop (inventário e histórico).
+#
+# Os dados chegam da API no formato colunar (?shape=columns) e ficam guardados tal como
+# vieram: uma lista de valores por coluna. Não há um objeto por célula; o texto de cada
+# célula só é produzido quando a vista a desenha, pelo que o custo de mostrar a tabela
+# depende das linhas visíveis e não do total. A ordenação e o filtro reorganizam apenas
+# uma lista de índices. As listagens paginadas carregam a página seguinte (fetchMore)
+# quando a vista chega ao fim das linhas já recebidas.
+from collections import namedtuple
+
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex, Signal
+
+
+def chave_padrao(valor):
+    """Chave de ordenação: números pelo valor, texto sem distinguir maiúsculas, vazios no fim."""
+    if valor is None:
+        return (1, 0, '')
+    if isinstance(valor, (int, float)):
+        return (0, valor, '')
+    return (0, 0, str(valor).casefold())
+
+
+def chave_data_hora(valor):
+    """Ordena datas no formato dd/mm/aaaa hh:mm:ss (como as devolve o relatório)."""
+    if not valor:
+        return ''
+    return valor[6:10] + valor[3:5] + valor[0:2] + valor[10:]
+
+
+def formatar_preco(valor):
+    try:
+        return f"{float(valor):.2f}"
+    except (TypeError, ValueError):
+        return str(valor)
+
+
+# campo: nome da coluna na resposta da API; ordem_servidor: valor de ?sort que ordena por
+# esta coluna no servidor (None se o servidor não ordenar por ela)
+Coluna = namedtuple('Coluna', 'campo titulo alinhamento formatar chave ordem_servidor',
+                    defaults=(None, str, chave_padrao, None))
+
+
+class ModeloTabelaColunar(QAbstractTableModel):
+    """
+    Modelo só de leitura sobre uma listagem colunar da API.
+    Com next_cursor na resposta, emite mais_linhas_pedidas(cursor) quando a vista precisa de
+    mais linhas; o ecrã faz o pedido e entrega a página com acrescentar().
+    Enquanto houver páginas por carregar, ordenar por uma coluna com ordem_servidor emite
+    ordenacao_pedida(sort, order) em vez de ordenar só as linhas já carregadas.
+    """
+    mais_linhas_pedidas = Signal(str)
+    ordenacao_pedida = Signal(str, str)
+
+    def __init__(self, colunas, campo_id=None, parent=None):
+        super().__init__(parent)
+        self.colunas = list(colunas)
+        self.campo_id = campo_id
+        self.proximo_cursor = None
+        self.a_carregar = False
+        self._dados = {}
+        self._total = 0
+        self._filtradas = []  # índices das linhas que passam o filtro, pela ordem de chegada
+        self._ordem = []      # índices das linhas visíveis, pela ordem mostrada
+        self._ordenacao = None  # (coluna, ordem) da ordenação local
+        self._filtro = ('', ())
+
+    # --- Interface do QAbstractTableModel ---
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._ordem)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.colunas)
+
+    def headerData(self, secao, orientacao, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientacao == Qt.Orientation.Horizontal:
+            return self.colunas[secao].titulo
+        return str(secao + 1)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        coluna = self.colunas[index.column()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            valor = self.valor(index.row(), coluna.campo)
+            return '' if valor is None else coluna.formatar(valor)
+        if role == Qt.ItemDataRole.TextAlignmentRole:
+            return coluna.alinhamento
+        if role == Qt.ItemDataRole.UserRole and self.campo_id:
+            return self.valor(index.row(), self.campo_id)
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.proximo_cursor is not None and not self.a_carregar
+
+    def fetchMore(self, parent=QModelIndex()):
+        if self.canFetchMore(parent):
+            self.a_carregar = True
+            self.mais_linhas_pedidas.emit(self.proximo_cursor)
+
+    def sort(self, coluna, ordem=Qt.SortOrder.AscendingOrder):
+        if coluna >= 0 and self.proximo_cursor is not None and self.colunas[coluna].ordem_servidor:
+            # Só uma parte das linhas está carregada: é o servidor que ordena e a listagem recomeça
+            self._ordenacao = None
+            direcao = 'desc' if ordem == Qt.SortOrder.DescendingOrder else 'asc'
+            self.ordenacao_pedida.emit(self.colunas[coluna].ordem_servidor, direcao)
+            return
+        self._ordenacao = (coluna, ordem) if coluna >= 0 else None
+        self.layoutAboutToBeChanged.emit()
+        antigos = self.persistentIndexList()
+        origem = [self._ordem[indice.row()] for indice in antigos]
+        self._ordem = self._ordenar(self._filtradas)
+        if antigos:
+            posicao = {linha: pos for pos, linha in enumerate(self._ordem)}
+            self.changePersistentIndexList(
+                antigos, [self.index(posicao[linha], indice.column()) for linha, indice in zip(origem, antigos)])
+        self.layoutChanged.emit()
+
+    # --- Dados ---
+    def definir_dados(self, corpo):
+        """Substitui o conteúdo pela resposta colunar (primeira página ou listagem completa)."""
+        self.beginResetModel()
+        self._dados = dict(zip(corpo['colunas'], corpo['valores']))
+        self._total = len(corpo['valores'][0]) if corpo['valores'] else 0
+        self.proximo_cursor = corpo.get('next_cursor')
+        self.a_carregar = False
+        if self.proximo_cursor is not None and self._ordenacao and self.colunas[self._ordenacao[0]].ordem_servidor:
+            self._ordenacao = None  # a listagem paginada já vem ordenada pelo servidor
+        self._aplicar_filtro_e_ordem()
+        self.endResetModel()
+
+    def acrescentar(self, corpo):
+        """Junta uma página à listagem carregada."""
+        inicio = self._total
+        novas = len(corpo['valores'][0]) if corpo['valores'] else 0
+        self.proximo_cursor = corpo.get('next_cursor')
+        self.a_carregar = False
+        if not novas:
+            return
+        if self._ordenacao or self._filtro[0]:
+            # As linhas novas ficam entre as já mostradas: mais simples recalcular tudo
+            self.beginResetModel()
+            self._juntar_colunas(corpo, novas)
+            self._aplicar_filtro_e_ordem()
+            self.endResetModel()
+        else:
+            self.beginInsertRows(QModelIndex(), inicio, inicio + novas - 1)
+            self._juntar_colunas(corpo, novas)
+            self._filtradas.extend(range(inicio, self._total))
+            self._ordem = self._filtradas
+            self.endInsertRows()
+
+    def falha_carregamento(self):
+        """A página pedida não chegou: permite voltar a pedi-la."""
+        self.a_carregar = False
+
+    def limpar(self):
+        self.definir_dados({'colunas': [], 'valores': []})
+
+    def valor(self, linha, campo):
+        """Valor de um campo na linha (da vista), tal como veio da API."""
+        valores = self._dados.get(campo)
+        if valores is None:
+            return None
+        return valores[self._ordem[linha]]
+
+    def atualizar_linha(self, linha, valores):
+        """Altera campos de uma linha (ex: depois de editar o produto) e redesenha-a."""
+        origem = self._ordem[linha]
+        for campo, valor in valores.items():
+            self._dados.setdefault(campo, [None] * self._total)[origem] = valor
+        self.dataChanged.emit(self.index(linha, 0), self.index(linha, len(self.colunas) - 1))
+
+    def filtrar(self, texto, campos=None):
+        """Mostra só as linhas carregadas em que algum dos campos contém o texto."""
+        campos = tuple(campos or (coluna.campo for coluna in self.colunas))
+        self.beginResetModel()
+        self._filtro = (texto.casefold(), campos)
+        self._aplicar_filtro_e_ordem()
+        self.endResetModel()
+
+    def _juntar_colunas(self, corpo, novas):
+        recebidas = dict(zip(corpo['colunas'], corpo['valores']))
+        for campo in set(self._dados) | set(recebidas):
+            self._dados.setdefault(campo, [None] * self._total).extend(recebidas.get(campo) or [None] * novas)
+        self._total += novas
+
+    def _aplicar_filtro_e_ordem(self):
+        texto, campos = self._filtro
+        if texto:
+            listas = [self._dados[campo] for campo in campos if campo in self._dados]
+            self._filtradas = [
+                i for i in range(self._total)
+                if any(valores[i] is not None and texto in str(valores[i]).casefold() for valores in listas)
+            ]
+        else:
+            self._filtradas = list(range(self._total))
+        self._ordem = self._ordenar(self._filtradas)
+
+    def _ordenar(self, linhas):
+        if not self._ordenacao:
+            return linhas
+        coluna, ordem = self._ordenacao
+        valores = self._dados.get(self.colunas[coluna].campo)
+        if valores is None:
+            return linhas
+        chave = self.colunas[coluna].chave
+        chaves = [chave(valor) for valor in valores]
+        return sorted(linhas, key=chaves.__getitem__, reverse=ordem == Qt.SortOrder.DescendingOrder)
@@ -2,25 +2,37 @@ import sys
 import os
 import threading
 import traceback
-from waitress import serve
-from PySide6.QtWidgets import QApplication, QMessageBox
+import multiprocessing
 
 # --- Configuração de Caminho ---
+# Também nos processos filhos do gerador de etiquetas, que importam o módulo etiquetas do backend
 backend_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend'))
 sys.path.insert(0, backend_path)
 
-# --- Imports do Nosso Projeto ---
-from app import app
-from main_ui import AppManager, resource_path
-
 # --- Função para Rodar o Servidor ---
 def run_server():
     """Inicia o servidor Flask usando Waitress em uma porta específica."""
     print("Iniciando servidor Flask em segundo plano...")
-    serve(app, host='0.0.0.0', port=5000)
+    try:
+        preparar_banco()
+    except Exception as e:
+        print(f"AVISO: Não foi possível preparar as tabelas de saldo: {e}")
+    # O número de threads acompanha o tamanho do pool de ligações (ver ESTOQUE_SERVIDOR_THREADS em app.py)
+    serve(app, host='0.0.0.0', port=5000, threads=SERVIDOR_THREADS)
 
 # --- Bloco de Execução Principal ---
 if __name__ == "__main__":
+    # Necessário no executável do PyInstaller: o gerador de etiquetas do servidor usa processos filhos
+    multiprocessing.freeze_support()
+
+    # --- Imports do Nosso Projeto ---
+    # Só no processo principal: cada processo filho volta a importar este módulo (como __mp_main__)
+    # e não precisa do servidor nem da interface
+    from waitress import serve
+    from PySide6.QtWidgets import QApplication, QMessageBox
+    from app import app, preparar_banco, SERVIDOR_THREADS
+    from main_ui import AppManager, resource_path
+
     # Bloco de depuração global para apanhar qualquer erro que impeça a aplicação de iniciar
     try:
         # 1. Inicia o servidor em uma thread separada